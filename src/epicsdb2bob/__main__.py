@@ -1,19 +1,46 @@
 """Interface for ``python -m epicsdb2bob``."""
 
+import json
 import logging
 import os
 import sys
-from argparse import ArgumentParser
+import time
+from argparse import ArgumentParser, ArgumentTypeError, Namespace
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 from . import __version__
-from .bobfile_gen import generate_bobfile_for_db, generate_bobfile_for_substitution
-from .config import EPICSDB2BOBConfig
-from .palettes import BUILTIN_PALETTES
-from .parser import find_epics_dbs_and_templates, find_epics_subs
+
+# Only the standard library is imported at module level so that --version and
+# argument parsing stay cheap when a process is spawned for every file, e.g. by
+# make. Modules depending on phoebusgen, yaml or epicsdbtools are imported by
+# the functions that need them.
+
+if TYPE_CHECKING:
+    from epicsdbtools import Database
+
+    from .archive import ScreenArchive
+    from .artifacts import ArtifactCache
+    from .config import ConfigSnapshot
+    from .fingerprints import ScreenFingerprints
+    from .index import IndexEntry
+    from .layout import LayoutStats, ScreenLayout
+    from .macro_inference import InferredScreen
+    from .plan import ScreenPlan
+    from .profiling import MemoryProfiler
+    from .pv_index import PVIndex
+    from .pv_manifest import PVManifest
+    from .shard import ShardManifest
+    from .substitutions import Substitution
+    from .variants import MacroSet
+    from .writer import ParallelWriter
 
 __all__ = ["main"]
 
+CONFIG_FILE_NAME = ".epicsdb2bob.yml"
+
 logging.basicConfig()
 
 logger = logging.getLogger("epicsdb2bob")
@@ -65,24 +92,19 @@ logger.setLevel(logging.INFO)
 logger.propagate = False
 
 
-def main() -> None:
-    """Argument parser for the CLI."""
-    parser = ArgumentParser()
-    parser.add_argument(
-        "-v",
-        "--version",
-        action="version",
-        version=__version__,
-    )
+def shard_spec(value: str) -> tuple[int, int]:
+    from .shard import parse_shard_spec
 
-    parser.add_argument(
-        "input_path",
-        type=str,
-        help="Path to location in which to search for EPICS database template files",
-    )
-    parser.add_argument(
-        "output_path", type=str, help="Output location for generated screens."
-    )
+    try:
+        return parse_shard_spec(value)
+    except ValueError as e:
+        raise ArgumentTypeError(str(e)) from e
+
+
+def add_screen_arguments(parser: ArgumentParser) -> None:
+    """
+    Add the arguments controlling how screens are generated, shared by all modes.
+    """
     parser.add_argument(
         "-d", "--debug", action="store_true", help="Enable debug logging"
     )
@@ -124,11 +146,11 @@ def main() -> None:
         default=[],
         help="Dirs to search for addtl .bob files for generating substitution screens.",
     )
+    # Choices are checked after parsing, listing them would import phoebusgen
     parser.add_argument(
         "--palette",
         type=str,
         default="default",
-        choices=BUILTIN_PALETTES.keys(),
         help="Color palette to use.",
     )
     parser.add_argument(
@@ -138,17 +160,76 @@ def main() -> None:
         default="launcher",
         help="Level at which to apply macros when generating screens.",
     )
+    parser.add_argument(
+        "--output_formats",
+        type=str,
+        nargs="+",
+        help="Display formats to write screens in: bob, opi and/or ui. Default bob.",
+    )
+    parser.add_argument(
+        "--fast_scan",
+        action="store_true",
+        default=None,
+        help="Use the fast-path scanner, falling back to epicsdbtools when needed.",
+    )
+    parser.add_argument(
+        "--use_widget_classes",
+        action="store_true",
+        default=None,
+        help="Reference styles from a generated widget class file.",
+    )
+    parser.add_argument(
+        "--patch",
+        action="store_true",
+        help="Patch existing .bob screens of databases with the changes to their "
+        "records, keeping manual edits, instead of regenerating them.",
+    )
+    parser.add_argument(
+        "--chunk_workers",
+        type=int,
+        default=0,
+        help="Number of worker processes serializing the widgets of large .bob "
+        "screens in chunks, so that a single large database uses several cores.",
+    )
+    parser.add_argument(
+        "--chunk_size",
+        type=int,
+        help="Widgets per chunk, for screens with more widgets than this. "
+        "Default 5000.",
+    )
 
-    args = parser.parse_args()
-    logger.info(f"epicsdb2bob version {__version__}")
+
+def load_config(parser: ArgumentParser, args: Namespace) -> "ConfigSnapshot":
+    """
+    Build the configuration from .epicsdb2bob.yml if present, or from the arguments,
+    and freeze it for the generators.
+    """
+    from .config import EPICSDB2BOBConfig
+    from .palettes import BUILTIN_PALETTES
+
+    if args.palette not in BUILTIN_PALETTES:
+        parser.error(
+            f"argument --palette: invalid choice: '{args.palette}' "
+            f"(choose from {', '.join(BUILTIN_PALETTES)})"
+        )
+
+    if getattr(args, "output_formats", None):
+        from .emitters import EMITTERS
+
+        unknown = [fmt for fmt in args.output_formats if fmt not in EMITTERS]
+        if unknown:
+            parser.error(
+                f"argument --output_formats: invalid choice: {unknown} "
+                f"(choose from {', '.join(EMITTERS)})"
+            )
 
     logger.setLevel(logging.INFO)
     if args.debug:
         logger.setLevel(logging.DEBUG)
 
-    if os.path.exists(".epicsdb2bob.yml"):
+    if os.path.exists(CONFIG_FILE_NAME):
         config: EPICSDB2BOBConfig = EPICSDB2BOBConfig.from_yaml(
-            Path(".epicsdb2bob.yml"), vars(args)
+            Path(CONFIG_FILE_NAME), vars(args)
         )
 
         if config.debug:
@@ -156,50 +237,1229 @@ def main() -> None:
             import epicsdbtools.log.logger as epicsdbtools_logger
 
             epicsdbtools_logger.setLevel(logging.DEBUG)
-        logger.debug("Loaded configuration from .epicsdb2bob.yml")
+        logger.debug(f"Loaded configuration from {CONFIG_FILE_NAME}")
     else:
-        config = EPICSDB2BOBConfig()
+        config = EPICSDB2BOBConfig.from_args(vars(args))
         logger.debug("No configuration file found, using defaults.")
-        for key, value in vars(args).items():
-            if value is not None:
-                setattr(config, key, value)
+    return config.snapshot()
+
+
+def parse_macros(macros: list[str] | None) -> dict[str, str]:
+    return (
+        {macro.split("=")[0]: macro.split("=")[1] for macro in macros} if macros else {}
+    )
+
+
+def merge_main(argv: list[str]) -> None:
+    """Merge screen dimension manifests written by sharded runs."""
+    from .shard import MERGED_MANIFEST_NAME, ShardManifest, merge_manifests
+
+    parser = ArgumentParser(prog="epicsdb2bob merge", description=merge_main.__doc__)
+    parser.add_argument("manifests", type=str, nargs="+", help="Manifests to merge.")
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=str,
+        default=MERGED_MANIFEST_NAME,
+        help="Path to write the merged manifest to.",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        merged = merge_manifests(ShardManifest.read(path) for path in args.manifests)
+    except (OSError, ValueError, KeyError) as e:
+        sys.exit(f"Failed to merge manifests: {e}")
+    merged.write(args.output)
+    logger.info(
+        f"Merged {len(args.manifests)} manifests with {len(merged.screens)} screens "
+        f"into {args.output}"
+    )
+
+
+def gen_main(argv: list[str]) -> None:
+    """
+    Generate the screen for a single database or substitution file, and write a
+    gcc-style dependency file for make to include.
+    """
+    parser = ArgumentParser(prog="epicsdb2bob gen", description=gen_main.__doc__)
+    parser.add_argument(
+        "input_file", type=str, help="Database, template or substitution file."
+    )
+    parser.add_argument(
+        "-o", "--output", type=str, required=True, help="Screen file to write."
+    )
+    parser.add_argument(
+        "-I",
+        "--include_dir",
+        dest="include_dirs",
+        type=str,
+        action="append",
+        default=[],
+        help="Directory to search for included templates, may be repeated.",
+    )
+    parser.add_argument(
+        "--depfile",
+        type=str,
+        help="Dependency file to write. Defaults to the output with a .d extension.",
+    )
+    add_screen_arguments(parser)
+    args = parser.parse_args(argv)
+    config = load_config(parser, args)
+
+    from .bobfile_gen import layout_database, layout_substitution, template_to_bob
+    from .depfile import (
+        find_included_templates,
+        get_default_depfile_path,
+        write_depfile,
+    )
+    from .discovery import InputKind, discover_files
+    from .emitters import EMITTERS
+    from .layout import ScreenLayout
+    from .parser import load_epics_db, load_epics_sub
+    from .patch import PatchNotPossible, patch_screen_file
+    from .writer import ParallelWriter
+
+    input_file = Path(args.input_file)
+    output_file = Path(args.output)
+    output_format = output_file.suffix.lstrip(".")
+    if output_format not in EMITTERS:
+        parser.error(f"output must end in one of: .{', .'.join(EMITTERS)}")
+    dependencies = [input_file]
+    if os.path.exists(CONFIG_FILE_NAME):
+        dependencies.append(Path(CONFIG_FILE_NAME))
+
+    layout: ScreenLayout | None = None
+    if input_file.suffix == ".substitutions":
+        substitution = load_epics_sub(input_file)
+        if substitution is None:
+            sys.exit(f"Failed to parse {input_file} as an EPICS subs file")
+        name = os.path.splitext(input_file.name)[0]
+
+        # Screens generated for other files of the same build land next to ours,
+        # so those referenced are looked up there rather than scanning the output
+        # tree in every process of a parallel build
+        referenced = {template_to_bob(template) for template in substitution}
+        found_bobfiles = {
+            file_name: output_file.parent / file_name
+            for file_name in referenced
+            if (output_file.parent / file_name).is_file()
+        }
+        if referenced - found_bobfiles.keys() and config.bobfile_search_path:
+            discovered = discover_files(
+                {
+                    Path(path): frozenset({InputKind.SCREEN})
+                    for path in config.bobfile_search_path
+                },
+                ignore_globs=list(config.ignore_globs),
+                max_depth=config.max_scan_depth,
+                max_workers=config.scan_workers,
+            )
+            for path in discovered.screens:
+                if path.name in referenced:
+                    found_bobfiles.setdefault(path.name, path)
+        layout = layout_substitution(name, substitution, found_bobfiles, config)
+        dependencies.extend(
+            found_bobfiles[file_name]
+            for file_name in layout.get_embedded_files()
+            if file_name in found_bobfiles
+        )
+    else:
+        try:
+            database = load_epics_db(input_file, config.fast_scan)
+        except StopIteration:
+            sys.exit(f"Failed to parse {input_file} as an EPICS database")
+        name = input_file.name.split(".")[0]
+        macros = parse_macros(args.macros)
+        if args.patch and output_format == "bob" and output_file.exists():
+            try:
+                patch_screen_file(output_file, name, database, macros, config)
+                # Newer than its inputs even if nothing changed, for make
+                os.utime(output_file)
+            except PatchNotPossible as e:
+                logger.info(f"Regenerating {output_file}, it can't be patched: {e}")
+                layout = layout_database(name, database, macros, config)
+        else:
+            layout = layout_database(name, database, macros, config)
+        dependencies.extend(
+            find_included_templates(
+                input_file, database, [Path(path) for path in args.include_dirs]
+            )
+        )
+
+    if layout is not None:
+        with ParallelWriter(
+            0, chunk_workers=args.chunk_workers, chunk_size=args.chunk_size
+        ) as writer:
+            writer.submit(layout, output_file.with_suffix(""), [output_format])
+        logger.info(f"Wrote {output_file}")
+    write_depfile(
+        args.depfile or get_default_depfile_path(output_file),
+        output_file,
+        dependencies,
+    )
+
+
+def analyze_main(argv: list[str]) -> None:
+    """
+    Report the complexity of screens and flag those likely to load slowly in Phoebus.
+    """
+    from .analysis import AnalysisThresholds
+
+    defaults = AnalysisThresholds()
+    parser = ArgumentParser(
+        prog="epicsdb2bob analyze", description=analyze_main.__doc__
+    )
+    parser.add_argument(
+        "paths", type=str, nargs="+", help="Screens, or directories of screens."
+    )
+    parser.add_argument(
+        "-b",
+        "--bobfile_search_path",
+        type=str,
+        nargs="+",
+        default=[],
+        help="Dirs with screens that may be embedded, catalogued but not reported.",
+    )
+    for name, help_text in [
+        ("max_widgets", "Widgets, including those of embedded displays."),
+        ("max_pvs", "PVs, including those of embedded displays."),
+        ("max_embed_depth", "Levels of nested embedded displays."),
+        ("max_embed_fanout", "Embedded display widgets directly on the screen."),
+        ("max_bytes", "Size of the screen file."),
+        ("max_area", "Screen width times height in pixels."),
+    ]:
+        parser.add_argument(
+            f"--{name}",
+            type=int,
+            default=getattr(defaults, name),
+            help=f"{help_text} Default: {getattr(defaults, name)}",
+        )
+    parser.add_argument(
+        "--format",
+        type=str,
+        choices=["text", "json"],
+        default="text",
+        help="Output format.",
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of processes used to parse screens.",
+    )
+    parser.add_argument(
+        "--fail_over_budget",
+        action="store_true",
+        help="Exit with an error if any screen is over a threshold, e.g. in CI.",
+    )
+    args = parser.parse_args(argv)
+
+    from .analysis import analyze_screens, format_analysis
+
+    thresholds = AnalysisThresholds(
+        max_widgets=args.max_widgets,
+        max_pvs=args.max_pvs,
+        max_embed_depth=args.max_embed_depth,
+        max_embed_fanout=args.max_embed_fanout,
+        max_bytes=args.max_bytes,
+        max_area=args.max_area,
+    )
+    results = analyze_screens(
+        args.paths, thresholds, args.bobfile_search_path, args.workers
+    )
+    print(format_analysis(results, args.format))
+
+    over_budget = [metrics.path for metrics in results if metrics.violations]
+    if over_budget and args.fail_over_budget:
+        sys.exit(f"{len(over_budget)} screens are over budget: {over_budget}")
+
+
+def ledger_main(argv: list[str]) -> None:
+    """
+    List runs recorded in the ledger, or compare two of them and highlight
+    regressions in their timings.
+    """
+    parser = ArgumentParser(prog="epicsdb2bob ledger", description=ledger_main.__doc__)
+    parser.add_argument(
+        "--ledger",
+        type=str,
+        help="Ledger to read. Defaults to the one in the XDG data directory.",
+    )
+    parser.add_argument(
+        "--input",
+        type=str,
+        help="Only consider runs generating screens for this input path.",
+    )
+    parser.add_argument(
+        "-n", "--limit", type=int, default=20, help="Number of recent runs to list."
+    )
+    parser.add_argument(
+        "--compare",
+        type=int,
+        nargs="*",
+        metavar="RUN",
+        help="Compare a baseline run with a later one. Defaults to the last two.",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Fractional increase in a timing that counts as a regression.",
+    )
+    parser.add_argument(
+        "--min_seconds",
+        type=float,
+        default=0.01,
+        help="Smallest increase in seconds of a timing that counts as a regression.",
+    )
+    parser.add_argument(
+        "--fail_on_regression",
+        action="store_true",
+        help="Exit with an error if the comparison finds a regression, e.g. in CI.",
+    )
+    args = parser.parse_args(argv)
+
+    from .ledger import (
+        RunLedger,
+        compare_runs,
+        default_ledger_path,
+        format_comparison,
+        format_runs,
+    )
+
+    input_path = os.path.abspath(args.input) if args.input else None
+    with RunLedger(args.ledger or default_ledger_path()) as ledger:
+        if args.compare is None:
+            print(format_runs(ledger.get_runs(args.limit, input_path)))
+            return
+        if len(args.compare) == 2:
+            try:
+                runs = [ledger.get_run(run_id) for run_id in args.compare]
+            except KeyError as e:
+                sys.exit(str(e.args[0]))
+        elif not args.compare:
+            runs = ledger.get_runs(2, input_path)
+            if len(runs) < 2:
+                sys.exit("The ledger needs at least two runs to compare")
+        else:
+            parser.error("argument --compare: expected no runs or two runs")
+
+    changes = compare_runs(runs[0], runs[1], args.threshold, args.min_seconds)
+    print(format_comparison(runs[0], runs[1], changes))
+    regressions = [change.metric for change in changes if change.regression]
+    if regressions and args.fail_on_regression:
+        sys.exit(f"Regressions in {', '.join(regressions)}")
+
+
+SUBCOMMANDS = {
+    "analyze": analyze_main,
+    "gen": gen_main,
+    "ledger": ledger_main,
+    "merge": merge_main,
+}
+
+
+@dataclass
+class GenerationRun:
+    """
+    Outputs of a run of the CLI, and what the screens it generates share.
+    """
+
+    args: Namespace
+    config: "ConfigSnapshot"
+    profiler: "MemoryProfiler"
+    writer: "ParallelWriter"
+    pv_index: "PVIndex"
+    archive: "ScreenArchive | None" = None
+    artifacts: "ArtifactCache | None" = None
+    screen_fingerprints: "ScreenFingerprints | None" = None
+    pv_manifest: "PVManifest | None" = None
+    shard_manifest: "ShardManifest | None" = None
+    build_index: bool = False
+    # Screens generated or found so far, by file name
+    written_bobfiles: dict[str, Path] = field(default_factory=dict)
+    # Dimensions of screens generated during this run or by other shards, so
+    # that substitution screens don't need to read them back from disk.
+    screen_sizes: dict[str, tuple[int, int]] = field(default_factory=dict)
+    # Macros to open the shared screens of reused databases with, by file name
+    reused_macros: dict[str, dict[str, str]] = field(default_factory=dict)
+    index_entries: "list[IndexEntry]" = field(default_factory=list)
+    plans: "list[ScreenPlan]" = field(default_factory=list)
+    patched_files: list[str] = field(default_factory=list)
+    screen_count: int = 0
+
+    def fetch_artifact(
+        self, screen_name: str, source: str | None
+    ) -> tuple[int, int] | None:
+        """
+        Write a screen from the artifact store, returning its size if it was there.
+        """
+        if self.artifacts is None or source is None or self.args.plan:
+            return None
+        fetched = self.artifacts.load_screen(
+            screen_name, source, self.config.output_formats
+        )
+        if fetched is None:
+            return None
+        height, width, files = fetched
+        self.writer.submit_files(
+            os.path.join(self.args.output_path, screen_name),
+            files,
+            height,
+            width,
+            source,
+        )
+        if self.screen_fingerprints is not None:
+            self.screen_fingerprints.record(
+                f"{screen_name}.bob", self.config.screen_fingerprint
+            )
+        return (height, width)
+
+    def write_layout(
+        self, layout: "ScreenLayout", screen_name: str, source: str | None
+    ) -> None:
+        with self.profiler.phase("write"):
+            self.writer.submit(
+                layout,
+                os.path.join(self.args.output_path, screen_name),
+                self.config.output_formats,
+                source,
+            )
+        if self.screen_fingerprints is not None:
+            self.screen_fingerprints.record(
+                f"{screen_name}.bob", self.config.screen_fingerprint, layout
+            )
+
+    def add_screen(self, screen_name: str, size: tuple[int, int]) -> str:
+        """
+        Record a screen of this run, returning its file name.
+        """
+        file_name = f"{screen_name}.bob"
+        self.screen_sizes[file_name] = size
+        self.screen_count += 1
+        if self.shard_manifest:
+            self.shard_manifest.add_screen(file_name, *size)
+        self.written_bobfiles[file_name] = Path(
+            os.path.join(self.args.output_path, file_name)
+        )
+        return file_name
+
+
+def add_reused_database(
+    run: GenerationRun,
+    name: str,
+    database: "Database",
+    inferred: "InferredScreen",
+    macros: dict[str, str],
+    directory: tuple[str, ...],
+) -> None:
+    """
+    Show a database with the shared screen of another under its own macros.
+    """
+    from .index import IndexEntry
+
+    shared_file = f"{inferred.screen}.bob"
+    if run.build_index:
+        run.index_entries.append(
+            IndexEntry(
+                directory, name, shared_file, f"{len(database)} records", macros=macros
+            )
+        )
+    # Substitution screens open the shared screen for it instead
+    run.written_bobfiles[f"{name}.bob"] = run.written_bobfiles[shared_file]
+    run.screen_sizes[f"{name}.bob"] = run.screen_sizes[shared_file]
+    run.reused_macros[f"{name}.bob"] = macros
+    if run.pv_manifest is not None:
+        run.pv_manifest.add_shown_with(inferred.screen, macros)
+
+
+def generate_screens_for_database(
+    run: GenerationRun,
+    name: str,
+    database: "Database",
+    database_path: Path,
+    variants: "list[MacroSet]",
+    from_macro_sets: bool,
+    inferred: "InferredScreen | None",
+    directory: tuple[str, ...],
+    stats: "LayoutStats",
+) -> None:
+    """
+    Generate the screen of a database for each of its variants, reusing those
+    from a previous archive or the artifact store, or patching them in place.
+    Unless variants come from macro sets there is only one, and its macros are
+    applied as the screen is laid out.
+    """
+    from .archive import get_database_source
+    from .bobfile_gen import get_external_readbacks, layout_database
+    from .index import IndexEntry
+    from .patch import PatchNotPossible, patch_screen_file
+    from .plan import plan_database_screen
+    from .variants import apply_macro_set
+
+    config = run.config
+    # Laid out on first use, as screens unchanged since a previous archive are
+    # copied from it instead
+    base_layout = None
+    readbacks = None
+    for variant in variants:
+        screen_name = f"{name}_{variant.name}" if variant.name else name
+        full_output_path = os.path.join(run.args.output_path, f"{screen_name}.bob")
+        source = None
+        size = None
+        if run.archive is not None or run.artifacts is not None:
+            if readbacks is None:
+                readbacks = get_external_readbacks(
+                    name, database, config, config.record_filter, run.pv_index
+                )
+            source = get_database_source(
+                config.screen_fingerprint, database_path, variant.macros, readbacks
+            )
+        if run.archive is not None and source is not None:
+            size = run.archive.reuse(screen_name, config.output_formats, source)
+        elif run.args.patch and not run.args.plan and os.path.exists(full_output_path):
+            try:
+                with run.profiler.phase("patch"):
+                    recorded = (
+                        run.screen_fingerprints.get(f"{screen_name}.bob")
+                        if run.screen_fingerprints is not None
+                        else None
+                    )
+                    patched = patch_screen_file(
+                        full_output_path,
+                        name,
+                        database,
+                        variant.macros,
+                        config,
+                        config.record_filter,
+                        run.pv_index,
+                        stats,
+                        recorded.config if recorded is not None else None,
+                    )
+                size = (patched.height, patched.width)
+                if patched.changed:
+                    run.patched_files.append(full_output_path)
+                if run.screen_fingerprints is not None and (
+                    patched.changed or recorded is None
+                ):
+                    run.screen_fingerprints.record(
+                        f"{screen_name}.bob", config.screen_fingerprint
+                    )
+            except PatchNotPossible as e:
+                logger.info(
+                    f"Regenerating {full_output_path}, it can't be patched: {e}"
+                )
+        if size is None:
+            size = run.fetch_artifact(screen_name, source)
+
+        # Screens not laid out for writing are still laid out for their PVs
+        if size is None or run.pv_manifest is not None:
+            if base_layout is None:
+                with run.profiler.phase("generate", items=len(database)):
+                    base_layout = layout_database(
+                        name,
+                        database,
+                        {} if from_macro_sets else variant.macros,
+                        config,
+                        config.record_filter,
+                        run.pv_index,
+                        stats,
+                    )
+                if inferred is not None and inferred.macros and not base_layout.macros:
+                    # Opened on its own, it shows the PVs of this database, and
+                    # those of others under their macros
+                    base_layout.macros = dict(variant.macros)
+            layout = (
+                apply_macro_set(base_layout, variant.macros, config)
+                if from_macro_sets
+                else base_layout
+            )
+            if run.pv_manifest is not None:
+                run.pv_manifest.add_layout(layout, screen_name)
+            if size is None:
+                size = (layout.height, layout.width)
+                if run.args.plan:
+                    run.plans.append(
+                        plan_database_screen(
+                            screen_name,
+                            database,
+                            layout,
+                            full_output_path,
+                            config,
+                            config.record_filter,
+                            run.screen_fingerprints,
+                        )
+                    )
+                else:
+                    run.write_layout(layout, screen_name, source)
+
+        file_name = run.add_screen(screen_name, size)
+        if run.build_index:
+            run.index_entries.append(
+                IndexEntry(
+                    directory,
+                    screen_name,
+                    file_name,
+                    f"{len(database)} records",
+                    macros=variant.macros if inferred is not None else None,
+                )
+            )
+
+
+def generate_screen_for_substitution(
+    run: GenerationRun,
+    substitution_file: Path,
+    epics_sub: "Substitution",
+    stats: "LayoutStats",
+) -> None:
+    """
+    Generate the screen of a substitutions file, embedding or linking to the
+    screens of its templates, unless it can be reused from a previous archive or
+    the artifact store.
+    """
+    from .archive import get_substitution_source
+    from .bobfile_gen import layout_substitution, template_to_bob
+    from .cache import hash_file_contents
+    from .index import IndexEntry, get_input_directory
+    from .plan import plan_substitution_screen
+
+    config = run.config
+    substitution = os.path.splitext(substitution_file.name)[0]
+    if run.shard_manifest:
+        unsized = [
+            template
+            for template in epics_sub
+            if template_to_bob(template) not in run.screen_sizes
+            and template_to_bob(template) not in run.written_bobfiles
+        ]
+        if unsized:
+            logger.warning(
+                f"Sizes of {unsized} for {substitution} are unknown on this shard, "
+                "pass the merged manifest with --manifest to embed them."
+            )
+
+    full_output_path = os.path.join(run.args.output_path, f"{substitution}.bob")
+    source = None
+    size = None
+    if run.archive is not None or run.artifacts is not None:
+        # Sizes of generated template screens, or contents of existing ones
+        embedded = {
+            template_to_bob(template): json.dumps(
+                run.screen_sizes[template_to_bob(template)]
+            )
+            if template_to_bob(template) in run.screen_sizes
+            else hash_file_contents(run.written_bobfiles[template_to_bob(template)])
+            for template in epics_sub
+            if template_to_bob(template) in run.written_bobfiles
+        }
+        # Shared screens of reused databases, and the macros for them
+        for file_name in embedded.keys() & run.reused_macros.keys():
+            embedded[file_name] += json.dumps(
+                [run.written_bobfiles[file_name].name, run.reused_macros[file_name]]
+            )
+        source = get_substitution_source(
+            config.screen_fingerprint, substitution_file, embedded
+        )
+    if run.archive is not None and source is not None:
+        size = run.archive.reuse(substitution, config.output_formats, source)
+    if size is None:
+        size = run.fetch_artifact(substitution, source)
+
+    if size is None or run.pv_manifest is not None:
+        with run.profiler.phase("generate"):
+            layout = layout_substitution(
+                substitution,
+                epics_sub,
+                run.written_bobfiles,
+                config,
+                run.screen_sizes,
+                stats,
+                run.reused_macros,
+            )
+        if run.pv_manifest is not None:
+            run.pv_manifest.add_layout(layout)
+        if size is None:
+            size = (layout.height, layout.width)
+            if run.args.plan:
+                run.plans.append(
+                    plan_substitution_screen(
+                        substitution,
+                        epics_sub,
+                        layout,
+                        full_output_path,
+                        run.screen_fingerprints,
+                    )
+                )
+            else:
+                run.write_layout(layout, substitution, source)
+
+    file_name = run.add_screen(substitution, size)
+    if run.build_index:
+        run.index_entries.append(
+            IndexEntry(
+                get_input_directory(substitution_file, run.args.input_path),
+                substitution,
+                file_name,
+                f"{sum(len(instances) for instances in epics_sub.values())}"
+                f" instances of {len(epics_sub)} templates",
+                epics_sub,
+            )
+        )
+
+
+def main() -> None:
+    """Argument parser for the CLI."""
+    if len(sys.argv) > 1 and sys.argv[1] in SUBCOMMANDS:
+        SUBCOMMANDS[sys.argv[1]](sys.argv[2:])
+        return
+
+    parser = ArgumentParser(
+        epilog=f"Subcommands, run with -h for details: {', '.join(SUBCOMMANDS)}"
+    )
+    parser.add_argument(
+        "-v",
+        "--version",
+        action="version",
+        version=__version__,
+    )
+
+    parser.add_argument(
+        "input_path",
+        type=str,
+        help="Path to location in which to search for EPICS database template files",
+    )
+    parser.add_argument(
+        "output_path",
+        type=str,
+        help="Output location for generated screens, a directory or an archive "
+        "ending in .zip, .tar, .tar.gz or .tgz.",
+    )
+    add_screen_arguments(parser)
+    parser.add_argument(
+        "--cache_dir",
+        dest="parse_cache_dir",
+        type=str,
+        help="Directory in which to cache parsed databases. Defaults to XDG cache.",
+    )
+    parser.add_argument(
+        "--no_cache",
+        dest="use_parse_cache",
+        action="store_false",
+        help="Always reparse databases instead of using the parse cache.",
+    )
+    parser.add_argument(
+        "--artifact_store",
+        type=str,
+        default=os.environ.get("EPICSDB2BOB_ARTIFACT_STORE"),
+        help="Directory, or http(s) URL accepting GET and PUT, of a store of parsed "
+        "databases and rendered screens shared between runs. Defaults to "
+        "$EPICSDB2BOB_ARTIFACT_STORE.",
+    )
+    parser.add_argument(
+        "--ignore",
+        type=str,
+        nargs="+",
+        default=[],
+        help="Additional file or directory name globs to skip when searching.",
+    )
+    parser.add_argument(
+        "--max_depth",
+        dest="max_scan_depth",
+        type=int,
+        help="Maximum directory depth to descend to when searching for inputs.",
+    )
+    parser.add_argument(
+        "--scan_workers",
+        type=int,
+        help="Number of threads used to scan directories for inputs.",
+    )
+    parser.add_argument(
+        "--parse_timeout",
+        type=float,
+        help="Seconds allowed to parse each file. Parses files in worker processes "
+        "and quarantines those that take longer.",
+    )
+    parser.add_argument(
+        "--parse_memory",
+        type=int,
+        help="MiB of memory allowed to parse each file. Parses files in worker "
+        "processes and quarantines those that need more.",
+    )
+    parser.add_argument(
+        "--parse_workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of worker processes parsing files under the limits above.",
+    )
+    parser.add_argument(
+        "--retry_quarantined",
+        action="store_true",
+        help="Parse files quarantined by earlier runs again, even if unchanged.",
+    )
+    parser.add_argument(
+        "--profile_memory",
+        action="store_true",
+        help="Trace memory use of parsing, generation and writing, and report it.",
+    )
+    parser.add_argument(
+        "--shard",
+        type=shard_spec,
+        help="Only generate screens assigned to shard i of N, given as i/N.",
+    )
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        nargs="+",
+        default=[],
+        help="Screen dimension manifests, used to size embeds of other shards.",
+    )
+    parser.add_argument(
+        "--macro_sets",
+        type=str,
+        help="CSV or YAML table of macro sets, one screen variant per database each.",
+    )
+    parser.add_argument(
+        "--infer_macros",
+        type=str,
+        nargs="*",
+        metavar="NAME",
+        help="Infer macros, named P and R unless given, for the prefix shared by "
+        "the record names of each database, and share one screen between "
+        "databases that only differ in it.",
+    )
+    parser.add_argument(
+        "--write_workers",
+        type=int,
+        default=4,
+        help="Number of threads serializing and writing screens.",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Copy screens generated from unchanged inputs from the existing archive.",
+    )
+    parser.add_argument(
+        "--index",
+        action="store_true",
+        help="Also generate index screens launching every screen, by directory.",
+    )
+    parser.add_argument(
+        "--progress",
+        type=str,
+        choices=["auto", "tty", "log", "none"],
+        default="auto",
+        help="Progress reporting: a status line on a terminal, periodic log lines, "
+        "or none. Defaults to a status line when stderr is a terminal.",
+    )
+    parser.add_argument(
+        "--ledger",
+        type=str,
+        nargs="?",
+        const="",
+        help="Record timings and sizes of this run in a SQLite ledger, by default "
+        "in the XDG data directory. Compare runs with the ledger subcommand.",
+    )
+    parser.add_argument(
+        "--prometheus_textfile",
+        type=str,
+        help="Write metrics of this run to a node exporter textfile collector file.",
+    )
+    parser.add_argument(
+        "--pv_manifest",
+        type=str,
+        nargs="?",
+        const="",
+        help="List the PVs shown on each screen, with their widget and record types, "
+        "in a JSON Lines file, or CSV if the path ends in .csv. Defaults to "
+        "pvs.jsonl in the output directory or archive.",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Report the screens that would be generated without writing them.",
+    )
+    parser.add_argument(
+        "--plan_format",
+        type=str,
+        choices=["text", "json"],
+        default="text",
+        help="Output format for --plan.",
+    )
+
+    args = parser.parse_args()
+    started = datetime.now(UTC)
+    start_time = time.perf_counter()
+    logger.info(f"epicsdb2bob version {__version__}")
+    config = load_config(parser, args)
+
+    from .archive import ScreenArchive, is_archive_path
+    from .artifacts import ArtifactCache, open_artifact_store
+    from .bobfile_gen import get_external_readbacks
+    from .cache import ParseCache
+    from .classes import WIDGET_CLASS_FILE_NAME, generate_widget_class_file
+    from .discovery import discover_inputs
+    from .emitters import screen_to_bytes
+    from .fingerprints import ScreenFingerprints
+    from .index import get_input_directory, layout_indexes
+    from .isolation import IsolatedParser, ParseLimits, Quarantine
+    from .ledger import (
+        RunLedger,
+        RunRecord,
+        default_ledger_path,
+        write_prometheus_textfile,
+    )
+    from .macro_inference import (
+        DEFAULT_MACRO_NAMES,
+        InferredScreen,
+        format_inferred_macros,
+        group_reusable_databases,
+    )
+    from .parser import load_epics_dbs_and_templates, load_epics_sub
+    from .plan import format_plan
+    from .profiling import MemoryProfiler
+    from .progress import ProgressReporter
+    from .pv_index import PVIndex
+    from .pv_manifest import PV_MANIFEST_FILE_NAME, PVManifest
+    from .shard import ShardManifest, assign_shards, get_shard_manifest_name
+    from .variants import MacroSet, load_macro_sets
+    from .writer import ParallelWriter
+
+    archive_output = is_archive_path(args.output_path)
+    if archive_output and args.shard:
+        parser.error("argument --shard: sharded runs cannot write to an archive")
+    if args.incremental and not archive_output:
+        parser.error("argument --incremental: output path must be an archive")
+    if args.patch and (archive_output or tuple(config.output_formats) != ("bob",)):
+        parser.error("argument --patch: only .bob screens in a directory are patched")
+    if args.infer_macros is not None and args.macro_sets:
+        parser.error("argument --infer_macros: not allowed with --macro_sets")
+
+    profiler = MemoryProfiler(enabled=args.profile_memory)
+    profiler.start()
+
+    with profiler.phase("discover"):
+        discovered = discover_inputs(
+            args.input_path,
+            config.bobfile_search_path,
+            ignore_globs=[*config.ignore_globs, *args.ignore],
+            max_depth=config.max_scan_depth,
+            max_workers=config.scan_workers,
+        )
 
     written_bobfiles: dict[str, Path] = {}
+    for full_path in discovered.screens:
+        logger.info(f"Found additional bob/opi file: {full_path}")
+        written_bobfiles[full_path.name] = full_path
 
-    for bobfile_dir in config.bobfile_search_path:
-        for dirpath, _, filenames in os.walk(bobfile_dir):
-            for filename in filenames:
-                if filename.endswith((".bob", ".opi")):
-                    full_path = Path(os.path.join(dirpath, filename))
-                    logger.info(f"Found additional bob/opi file: {full_path}")
-                    written_bobfiles[filename] = full_path
+    macros = parse_macros(args.macros)
+    # Each database is laid out once, its variants only differ in their macros.
+    # The unnamed variant is the generic screen substitutions screens refer to.
+    macro_sets = load_macro_sets(args.macro_sets) if args.macro_sets else None
+    variants = [MacroSet("", macros)]
+    if macro_sets is not None:
+        variants.extend(
+            MacroSet(macro_set.name, {**macros, **macro_set.macros})
+            for macro_set in macro_sets
+        )
+    record_filter = config.record_filter
 
-    macros = (
-        {macro.split("=")[0]: macro.split("=")[1] for macro in args.macros}
-        if args.macros
-        else {}
+    artifacts = None
+    if args.artifact_store:
+        artifacts = ArtifactCache(open_artifact_store(args.artifact_store))
+    # Plans leave the caches as they are, as they leave the output
+    parse_cache = (
+        ParseCache(
+            config.parse_cache_dir,
+            artifacts.store if artifacts else None,
+            read_only=args.plan,
+        )
+        if config.use_parse_cache
+        else None
     )
+    quarantine = Quarantine(
+        config.parse_cache_dir, skip=not args.retry_quarantined, read_only=args.plan
+    )
+    isolated_parser = None
+    if args.parse_timeout is not None or args.parse_memory is not None:
+        isolated_parser = IsolatedParser(
+            ParseLimits(
+                args.parse_timeout,
+                args.parse_memory * 1024 * 1024 if args.parse_memory else None,
+            ),
+            args.parse_workers,
+            config.fast_scan,
+        )
+    with profiler.phase("parse", snapshot=True):
+        databases = load_epics_dbs_and_templates(
+            discovered.databases,
+            parse_cache,
+            config.fast_scan,
+            isolated_parser,
+            quarantine,
+        )
+    with profiler.phase("index"):
+        pv_index = PVIndex.build(databases)
+    pv_index.report_duplicates()
 
-    databases = find_epics_dbs_and_templates(args.input_path, macros)
-    for name in databases:
-        screen = generate_bobfile_for_db(name, databases[name], macros, config)
+    class_file = None
+    if config.use_widget_classes and not args.plan:
+        class_file = generate_widget_class_file(config)
+        class_file_path = os.path.join(args.output_path, WIDGET_CLASS_FILE_NAME)
+        if not archive_output:
+            class_file.write_screen(class_file_path)
+        logger.info(
+            f"Wrote widget class file {class_file_path}. Add it to the Phoebus "
+            "org.csstudio.display.builder.model/class_files preference to apply it."
+        )
 
-        full_output_path = os.path.join(args.output_path, f"{name}.bob")
-        screen.write_screen(full_output_path)
-        written_bobfiles[os.path.basename(full_output_path)] = Path(full_output_path)
+    # Dimensions of screens generated by other shards
+    screen_sizes: dict[str, tuple[int, int]] = {}
+    for manifest_path in args.manifest:
+        screen_sizes.update(ShardManifest.read(manifest_path).screens)
 
-    substitutions = find_epics_subs(args.input_path)
+    shard_manifest = None
+    database_shards: dict[str, int] = {}
+    substitution_shards: dict[str, int] = {}
+    if args.shard:
+        shard_index, shard_count = args.shard
+        shard_manifest = ShardManifest(shard_count, shard_index)
+        # Substitutions files are sharded with the screens they embed
+        substitution_templates: dict[str, list[str]] = {}
+        with profiler.phase("parse"):
+            for substitution_file in discovered.substitutions:
+                epics_sub = load_epics_sub(
+                    substitution_file, isolated_parser, quarantine
+                )
+                substitution_templates[os.path.splitext(substitution_file.name)[0]] = (
+                    list(epics_sub) if epics_sub is not None else []
+                )
+        database_shards, substitution_shards = assign_shards(
+            databases, substitution_templates, shard_count
+        )
+        logger.info(f"Generating screens for shard {shard_index} of {shard_count}")
 
-    for substitution in substitutions:
-        screen = generate_bobfile_for_substitution(
-            substitution,
-            substitutions[substitution],
-            written_bobfiles,
+    build_index = args.index and not args.plan
+    if build_index and shard_manifest:
+        logger.warning("Index screens are not generated for sharded runs")
+        build_index = False
+    database_directories = {
+        path.name.split(".")[0]: get_input_directory(path, args.input_path)
+        for path in discovered.databases
+    }
+
+    database_paths = {path.name.split(".")[0]: path for path in discovered.databases}
+    archive = None
+    writer = None
+    try:
+        if archive_output and not args.plan:
+            archive = ScreenArchive(
+                args.output_path,
+                args.output_path if args.incremental else None,
+                config.fingerprint,
+            )
+            if class_file is not None:
+                archive.add_file(WIDGET_CLASS_FILE_NAME, screen_to_bytes(class_file))
+
+        # Inputs whose screens are generated by this run
+        database_names = [
+            name
+            for name in databases
+            if not shard_manifest or database_shards[name] == shard_manifest.shard_index
+        ]
+        substitution_files = [
+            substitution_file
+            for substitution_file in discovered.substitutions
+            if not shard_manifest
+            or substitution_shards[os.path.splitext(substitution_file.name)[0]]
+            == shard_manifest.shard_index
+        ]
+        progress = ProgressReporter(
+            len(database_names) + len(substitution_files), args.progress
+        )
+
+        inferred_screens: dict[str, InferredScreen] = {}
+        if args.infer_macros is not None:
+            with profiler.phase("infer"):
+                inferred_screens = group_reusable_databases(
+                    {name: databases[name] for name in database_names},
+                    args.infer_macros or DEFAULT_MACRO_NAMES,
+                    {
+                        name: get_external_readbacks(
+                            name, databases[name], config, record_filter, pv_index
+                        )
+                        for name in database_names
+                    },
+                )
+            logger.info(format_inferred_macros(inferred_screens))
+
+        # Layouts screens in the output directory were written from, for plans
+        screen_fingerprints = (
+            ScreenFingerprints(args.output_path) if not archive_output else None
+        )
+
+        # Write inline when profiling, so that writes are attributed to their phase
+        writer = ParallelWriter(
+            0 if profiler.enabled else args.write_workers,
+            archive,
+            artifacts,
+            args.chunk_workers,
+            args.chunk_size,
+        )
+        generation = GenerationRun(
+            args,
             config,
+            profiler,
+            writer,
+            pv_index,
+            archive,
+            artifacts,
+            screen_fingerprints,
+            PVManifest() if args.pv_manifest is not None else None,
+            shard_manifest,
+            build_index,
+            written_bobfiles,
+            screen_sizes,
+        )
+
+        for name in database_names:
+            with progress.track(name) as stats:
+                inferred = inferred_screens.get(name)
+                directory = database_directories.get(name, ())
+                if inferred is not None and inferred.reused:
+                    add_reused_database(
+                        generation,
+                        name,
+                        databases[name],
+                        inferred,
+                        {**inferred.macros, **macros},
+                        directory,
+                    )
+                    continue
+                database_variants = variants
+                if inferred is not None and inferred.macros:
+                    database_variants = [MacroSet("", {**inferred.macros, **macros})]
+                generate_screens_for_database(
+                    generation,
+                    name,
+                    databases[name],
+                    database_paths[name],
+                    database_variants,
+                    macro_sets is not None,
+                    inferred,
+                    directory,
+                    stats,
+                )
+
+        # Substitutions files are parsed one at a time as their screens are generated
+        for substitution_file in substitution_files:
+            with progress.track(substitution_file.name) as stats:
+                with profiler.phase("parse"):
+                    epics_sub = load_epics_sub(
+                        substitution_file, isolated_parser, quarantine
+                    )
+                if epics_sub is not None:
+                    generate_screen_for_substitution(
+                        generation, substitution_file, epics_sub, stats
+                    )
+
+        if build_index:
+            with profiler.phase("generate"):
+                try:
+                    index_layouts = layout_indexes(generation.index_entries, config)
+                except ValueError as e:
+                    sys.exit(f"Failed to generate index screens: {e}")
+            with profiler.phase("write"):
+                for index_name, layout in index_layouts.items():
+                    writer.submit(
+                        layout,
+                        os.path.join(args.output_path, index_name),
+                        config.output_formats,
+                    )
+                    if screen_fingerprints is not None:
+                        screen_fingerprints.record(
+                            f"{index_name}.bob", config.screen_fingerprint, layout
+                        )
+            generation.screen_count += len(index_layouts)
+
+        with profiler.phase("write"):
+            written = writer.close() + generation.patched_files
+            if screen_fingerprints is not None and not args.plan:
+                screen_fingerprints.write()
+            if generation.pv_manifest is not None and not args.plan:
+                if archive is not None and not args.pv_manifest:
+                    archive.add_file(
+                        PV_MANIFEST_FILE_NAME, generation.pv_manifest.to_bytes()
+                    )
+                else:
+                    pv_manifest_path = args.pv_manifest or os.path.join(
+                        args.output_path, PV_MANIFEST_FILE_NAME
+                    )
+                    generation.pv_manifest.write(pv_manifest_path)
+                    written.append(pv_manifest_path)
+            if archive is not None:
+                archive.close()
+    except BaseException:
+        # Leave neither a partial archive nor running workers behind
+        if writer is not None:
+            writer.abort()
+        if archive is not None:
+            archive.abort()
+        raise
+    progress.close()
+    logger.info(f"Generation summary:\n{progress.summary()}")
+    if isolated_parser is not None:
+        isolated_parser.close()
+    if quarantine.reported:
+        logger.warning(quarantine.report())
+    if artifacts is not None:
+        logger.info(artifacts.summary())
+
+    if (args.ledger is not None or args.prometheus_textfile) and not args.plan:
+        if archive is not None:
+            files_written = len(archive.members)
+            bytes_written = archive.path.stat().st_size
+        else:
+            files_written = len(written)
+            bytes_written = sum(os.path.getsize(path) for path in written)
+        run = RunRecord(
+            started.isoformat(timespec="seconds"),
+            __version__,
+            config.fingerprint,
+            os.path.abspath(args.input_path),
+            os.path.abspath(args.output_path),
+            time.perf_counter() - start_time,
+            input_files=len(discovered.databases) + len(discovered.substitutions),
+            screens=generation.screen_count,
+            files_written=files_written,
+            bytes_written=bytes_written,
+            records=progress.totals.records,
+            instances=progress.totals.instances,
+            widgets=progress.totals.widgets,
+            phases=dict(profiler.timings),
         )
-        full_output_path = os.path.join(args.output_path, f"{substitution}.bob")
-        screen.write_screen(full_output_path)
-        written_bobfiles[os.path.basename(full_output_path)] = Path(full_output_path)
+        if args.ledger is not None:
+            ledger_path = args.ledger or default_ledger_path()
+            with RunLedger(ledger_path) as ledger:
+                run_id = ledger.record(run)
+            logger.info(f"Recorded run {run_id} in ledger {ledger_path}")
+        if args.prometheus_textfile:
+            write_prometheus_textfile(run, args.prometheus_textfile)
+
+    if shard_manifest and not args.plan:
+        manifest_path = os.path.join(
+            args.output_path,
+            get_shard_manifest_name(*args.shard),
+        )
+        shard_manifest.write(manifest_path)
+        logger.info(f"Wrote shard manifest {manifest_path}")
+
+    if args.plan:
+        print(format_plan(generation.plans, args.plan_format))
+
+    if profiler.enabled:
+        logger.info(f"Memory profile:\n{profiler.report()}")
+        profiler.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,252 @@
+import json
+import logging
+import os
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+from xml.etree import ElementTree as ET
+
+from .discovery import InputKind, discover_files
+
+logger = logging.getLogger("epicsdb2bob")
+
+# Elements holding PV names, on widgets as well as in rules, scripts and actions
+PV_TAGS = ("pv_name", "pv")
+
+
+@dataclass
+class AnalysisThresholds:
+    """Limits above which a screen is flagged as a load time risk."""
+
+    max_widgets: int = 2000
+    max_pvs: int = 1000
+    max_embed_depth: int = 3
+    max_embed_fanout: int = 50
+    max_bytes: int = 4 * 1024 * 1024
+    max_area: int = 3840 * 2160
+
+
+@dataclass
+class ScreenFileInfo:
+    """What can be learned about a screen from its own file."""
+
+    path: str
+    widget_count: int
+    pvs: frozenset[str]
+    embeds: list[str]  # File names of embedded displays, one per embed widget
+    byte_size: int
+    width: int
+    height: int
+
+
+@dataclass
+class ScreenMetrics:
+    path: str
+    widget_count: int
+    pv_count: int
+    # Widgets and PVs once embedded displays are loaded, counting every instance
+    total_widget_count: int
+    total_pv_count: int
+    embed_depth: int
+    embed_fanout: int
+    byte_size: int
+    width: int
+    height: int
+    violations: list[str] = field(default_factory=list)
+
+    @property
+    def area(self) -> int:
+        return self.width * self.height
+
+    def to_dict(self) -> dict[str, Any]:
+        data = asdict(self)
+        data["area"] = self.area
+        return data
+
+
+def _get_int(root: ET.Element, tag: str) -> int:
+    element = root.find(tag)
+    try:
+        return int(element.text) if element is not None and element.text else 0
+    except ValueError:
+        return 0
+
+
+def read_screen_file_info(path: str | Path) -> ScreenFileInfo:
+    root = ET.parse(path).getroot()
+    widget_count = 0
+    embeds = []
+    for widget in root.iter("widget"):
+        widget_count += 1
+        if widget.get("type") == "embedded":
+            file_element = widget.find("file")
+            if file_element is not None and file_element.text:
+                embeds.append(os.path.basename(file_element.text.strip()))
+    pvs = frozenset(
+        element.text.strip()
+        for element in root.iter()
+        if element.tag in PV_TAGS and element.text and element.text.strip()
+    )
+    return ScreenFileInfo(
+        path=str(path),
+        widget_count=widget_count,
+        pvs=pvs,
+        embeds=embeds,
+        byte_size=os.path.getsize(path),
+        width=_get_int(root, "width"),
+        height=_get_int(root, "height"),
+    )
+
+
+def _read_all(paths: list[Path], workers: int) -> dict[str, ScreenFileInfo]:
+    infos: dict[str, ScreenFileInfo] = {}
+    if workers <= 1 or len(paths) <= 1:
+        results: Iterable[ScreenFileInfo | None] = map(_read_or_none, paths)
+        for path, info in zip(paths, results, strict=True):
+            if info is not None:
+                infos[str(path)] = info
+        return infos
+
+    chunksize = max(1, len(paths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(_read_or_none, paths, chunksize=chunksize)
+        for path, info in zip(paths, results, strict=True):
+            if info is not None:
+                infos[str(path)] = info
+    return infos
+
+
+def _read_or_none(path: Path) -> ScreenFileInfo | None:
+    try:
+        return read_screen_file_info(path)
+    except (ET.ParseError, OSError) as e:
+        logger.warning(f"Failed to read screen {path}: {e}")
+        return None
+
+
+def check_thresholds(metrics: ScreenMetrics, thresholds: AnalysisThresholds) -> None:
+    checks = [
+        ("widgets", metrics.total_widget_count, thresholds.max_widgets),
+        ("PVs", metrics.total_pv_count, thresholds.max_pvs),
+        ("embed depth", metrics.embed_depth, thresholds.max_embed_depth),
+        ("embed fan-out", metrics.embed_fanout, thresholds.max_embed_fanout),
+        ("bytes", metrics.byte_size, thresholds.max_bytes),
+        ("area", metrics.area, thresholds.max_area),
+    ]
+    metrics.violations = [
+        f"{name} {value} > {limit}" for name, value, limit in checks if value > limit
+    ]
+
+
+def analyze_screens(
+    paths: Iterable[str | Path],
+    thresholds: AnalysisThresholds | None = None,
+    search_path: Iterable[str | Path] = (),
+    workers: int = os.cpu_count() or 1,
+) -> list[ScreenMetrics]:
+    """
+    Measure screens and flag those over the thresholds.
+
+    Paths may be screen files or directories to search for them. Embedded displays
+    are resolved by file name among all screens found, including those next to
+    the given files and under the search path, which are catalogued but not
+    reported on. Files are parsed in parallel across processes.
+    """
+    thresholds = thresholds or AnalysisThresholds()
+    screen_kinds = frozenset({InputKind.SCREEN})
+    roots: dict[Path, frozenset[InputKind]] = {}
+    reported: list[Path] = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            roots[path] = screen_kinds
+        else:
+            reported.append(path)
+    if roots:
+        reported.extend(discover_files(roots).screens)
+
+    catalogue: list[Path] = []
+    sibling_dirs = {path.parent: screen_kinds for path in reported} if reported else {}
+    if sibling_dirs:
+        catalogue.extend(discover_files(sibling_dirs, max_depth=0).screens)
+    search_roots = {Path(path): screen_kinds for path in search_path}
+    if search_roots:
+        catalogue.extend(discover_files(search_roots).screens)
+
+    infos = _read_all(list(dict.fromkeys([*reported, *catalogue])), workers)
+    by_name: dict[str, ScreenFileInfo] = {}
+    # Reported screens take precedence over catalogued ones of the same name
+    for path in [*catalogue, *reported]:
+        if str(path) in infos:
+            by_name[path.name] = infos[str(path)]
+
+    totals: dict[str, tuple[int, int, int]] = {}
+
+    def get_totals(
+        info: ScreenFileInfo, stack: tuple[str, ...]
+    ) -> tuple[int, int, int]:
+        # Widget count, PV count and embed depth including nested embeds
+        if info.path in totals:
+            return totals[info.path]
+        widgets, pvs, depth = info.widget_count, len(info.pvs), 0
+        for embed in info.embeds:
+            child = by_name.get(embed)
+            if child is None:
+                continue
+            if child.path in stack:
+                logger.warning(f"Screen {info.path} recursively embeds {embed}")
+                continue
+            child_widgets, child_pvs, child_depth = get_totals(
+                child, (*stack, info.path)
+            )
+            widgets += child_widgets
+            pvs += child_pvs
+            depth = max(depth, child_depth + 1)
+        totals[info.path] = (widgets, pvs, depth)
+        return totals[info.path]
+
+    results = []
+    for path in reported:
+        info = infos.get(str(path))
+        if info is None:
+            continue
+        total_widgets, total_pvs, depth = get_totals(info, ())
+        metrics = ScreenMetrics(
+            path=info.path,
+            widget_count=info.widget_count,
+            pv_count=len(info.pvs),
+            total_widget_count=total_widgets,
+            total_pv_count=total_pvs,
+            embed_depth=depth,
+            embed_fanout=len(info.embeds),
+            byte_size=info.byte_size,
+            width=info.width,
+            height=info.height,
+        )
+        check_thresholds(metrics, thresholds)
+        results.append(metrics)
+    return results
+
+
+def format_analysis(results: list[ScreenMetrics], output_format: str = "text") -> str:
+    if output_format == "json":
+        return json.dumps([metrics.to_dict() for metrics in results], indent=2)
+
+    lines = [
+        f"{'Screen':<40} {'Widgets':>8} {'PVs':>6} {'Total W':>8} {'Total PV':>8} "
+        f"{'Depth':>5} {'Fan-out':>7} {'Bytes':>9} {'Size':>11}"
+    ]
+    for metrics in results:
+        lines.append(
+            f"{os.path.basename(metrics.path):<40} {metrics.widget_count:>8} "
+            f"{metrics.pv_count:>6} {metrics.total_widget_count:>8} "
+            f"{metrics.total_pv_count:>8} {metrics.embed_depth:>5} "
+            f"{metrics.embed_fanout:>7} {metrics.byte_size:>9} "
+            f"{f'{metrics.width}x{metrics.height}':>11}"
+        )
+        if metrics.violations:
+            lines.append(f"    over budget: {', '.join(metrics.violations)}")
+    flagged = sum(1 for metrics in results if metrics.violations)
+    lines.append(f"{len(results)} screens analyzed, {flagged} over budget")
+    return "\n".join(lines)
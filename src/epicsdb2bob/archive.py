@@ -0,0 +1,288 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import tarfile
+import threading
+import time
+import zipfile
+from collections.abc import Iterable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Literal
+
+from epicsdbtools import Record
+
+from . import __version__
+from .cache import hash_file_contents
+from .emitters import SERIALIZERS
+from .layout import ScreenLayout
+
+logger = logging.getLogger("epicsdb2bob")
+
+ARCHIVE_MANIFEST_NAME = "manifest.json"
+ARCHIVE_MANIFEST_VERSION = 1
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz")
+
+
+@dataclass
+class ArchiveMember:
+    """Manifest entry of a file in an archive."""
+
+    sha256: str
+    height: int = 0
+    width: int = 0
+    # Digest of the inputs a screen was generated from, if it can be reused
+    source: str | None = None
+
+
+def is_archive_path(path: str | Path) -> bool:
+    return str(path).endswith(ARCHIVE_SUFFIXES)
+
+
+def source_digest(*parts: str) -> str:
+    """
+    Digest of the inputs of a screen and the epicsdb2bob version generating it,
+    used to find unchanged screens in a previous archive.
+    """
+    digest = hashlib.sha256()
+    for part in (__version__, *parts):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class _ArchiveFile:
+    """Reads or writes members of a zip or tar file."""
+
+    def __init__(self, path: str | Path, mode: Literal["r", "w"]) -> None:
+        self._file: zipfile.ZipFile | tarfile.TarFile
+        if str(path).endswith(".zip"):
+            self._file = zipfile.ZipFile(path, mode, compression=zipfile.ZIP_DEFLATED)
+        elif mode == "r":
+            self._file = tarfile.open(path, "r:*")
+        else:
+            compressed = str(path).endswith((".tar.gz", ".tgz"))
+            self._file = tarfile.open(path, "w:gz" if compressed else "w")
+
+    def read(self, name: str) -> bytes:
+        if isinstance(self._file, zipfile.ZipFile):
+            return self._file.read(name)
+        member = self._file.extractfile(name)
+        if member is None:
+            raise KeyError(name)
+        return member.read()
+
+    def write(self, name: str, data: bytes) -> None:
+        if isinstance(self._file, zipfile.ZipFile):
+            self._file.writestr(name, data)
+            return
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        info.mode = 0o644
+        self._file.addfile(info, io.BytesIO(data))
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def read_archive_manifest(path: str | Path) -> dict[str, ArchiveMember]:
+    archive = _ArchiveFile(path, "r")
+    try:
+        manifest = json.loads(archive.read(ARCHIVE_MANIFEST_NAME))
+    finally:
+        archive.close()
+    return {
+        name: ArchiveMember(**member) for name, member in manifest["members"].items()
+    }
+
+
+class ScreenArchive:
+    """
+    Streams screens into a single zip or tar archive, with a manifest of the
+    name, hash and dimensions of every member, instead of writing a file for each.
+    The archive is written next to its path and moved into place when closed.
+
+    Given a previous archive, members whose screens were generated from the same
+    inputs are copied from it instead of being laid out and serialized again.
+    """
+
+    def __init__(
+        self, path: str | Path, previous: str | Path | None = None, fingerprint=""
+    ) -> None:
+        self.path = Path(path)
+        self.fingerprint = fingerprint
+        self._members: dict[str, ArchiveMember] = {}
+        self._lock = threading.Lock()
+        self._previous: _ArchiveFile | None = None
+        self._previous_members: dict[str, ArchiveMember] = {}
+        if previous is not None and Path(previous).exists():
+            try:
+                self._previous_members = read_archive_manifest(previous)
+                self._previous = _ArchiveFile(previous, "r")
+            except (KeyError, ValueError, OSError, zipfile.BadZipFile) as e:
+                logger.warning(f"Not reusing screens from {previous}: {e}")
+        self._temp_path = self.path.with_name(f".tmp-{self.path.name}")
+        self._archive = _ArchiveFile(self._temp_path, "w")
+
+    def _write(self, file_name: str, data: bytes, member: ArchiveMember) -> None:
+        with self._lock:
+            if file_name in self._members:
+                raise ValueError(f"{file_name} is already in {self.path}")
+            self._archive.write(file_name, data)
+            self._members[file_name] = member
+
+    def add_file(self, file_name: str, data: bytes) -> None:
+        """
+        Add a file that is not a screen, such as a widget class file.
+        """
+        self._write(file_name, data, ArchiveMember(hashlib.sha256(data).hexdigest()))
+
+    def add(
+        self,
+        name: str,
+        layout: ScreenLayout,
+        formats: Iterable[str],
+        source: str | None = None,
+    ) -> list[str]:
+        """
+        Serialize a layout in each format and add it to the archive. Returns the
+        names of the members added.
+        """
+        files = {
+            output_format: SERIALIZERS[output_format](layout)
+            for output_format in formats
+        }
+        return self.add_serialized(name, files, layout.height, layout.width, source)
+
+    def add_serialized(
+        self,
+        name: str,
+        files: dict[str, bytes],
+        height: int,
+        width: int,
+        source: str | None = None,
+    ) -> list[str]:
+        """
+        Add a screen already serialized in each format, by format.
+        """
+        added = []
+        for output_format, data in files.items():
+            file_name = f"{name}.{output_format}"
+            member = ArchiveMember(
+                hashlib.sha256(data).hexdigest(), height, width, source
+            )
+            self._write(file_name, data, member)
+            added.append(file_name)
+        return added
+
+    def reuse(
+        self, name: str, formats: Iterable[str], source: str
+    ) -> tuple[int, int] | None:
+        """
+        Copy a screen from the previous archive if it was generated from the same
+        inputs in every format. Returns its height and width if it was.
+        """
+        if self._previous is None:
+            return None
+        file_names = [f"{name}.{output_format}" for output_format in formats]
+        previous = []
+        for file_name in file_names:
+            member = self._previous_members.get(file_name)
+            if member is None or member.source != source:
+                return None
+            previous.append(member)
+        for file_name, member in zip(file_names, previous, strict=True):
+            self._write(file_name, self._previous.read(file_name), member)
+        logger.debug(f"Reused {name} from previous archive")
+        return previous[0].height, previous[0].width
+
+    @property
+    def members(self) -> dict[str, ArchiveMember]:
+        return dict(self._members)
+
+    def close(self) -> None:
+        """
+        Write the manifest and move the archive into place.
+        """
+        manifest = {
+            "version": ARCHIVE_MANIFEST_VERSION,
+            "fingerprint": self.fingerprint,
+            "members": {
+                name: asdict(member) for name, member in sorted(self._members.items())
+            },
+        }
+        self._archive.write(
+            ARCHIVE_MANIFEST_NAME, json.dumps(manifest, indent=2).encode()
+        )
+        self._archive.close()
+        if self._previous is not None:
+            self._previous.close()
+        os.replace(self._temp_path, self.path)
+        reused = sum(
+            1
+            for name, member in self._members.items()
+            if member.source is not None and self._previous_members.get(name) == member
+        )
+        logger.info(
+            f"Wrote {len(self._members)} files to {self.path}, {reused} unchanged"
+        )
+
+    def abort(self) -> None:
+        """
+        Discard the archive, leaving any previous one in place.
+        """
+        self._archive.close()
+        if self._previous is not None:
+            self._previous.close()
+        self._temp_path.unlink(missing_ok=True)
+
+    def __enter__(self) -> "ScreenArchive":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if exc_info[0] is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def get_database_source(
+    fingerprint: str,
+    database_path: str | Path,
+    macros: dict[str, str],
+    readbacks: Iterable[Record],
+) -> str:
+    """
+    Source digest of a database screen: the config, the database file, the macros
+    of its variant and the readbacks it pairs with from other databases.
+    """
+    return source_digest(
+        fingerprint,
+        hash_file_contents(database_path),
+        json.dumps(macros, sort_keys=True),
+        *(
+            json.dumps(
+                [readback.name, readback.rtyp, readback.fields],
+                sort_keys=True,
+                default=str,
+            )
+            for readback in readbacks
+        ),
+    )
+
+
+def get_substitution_source(
+    fingerprint: str, substitution_path: str | Path, embedded: dict[str, str]
+) -> str:
+    """
+    Source digest of a substitution screen: the config, the substitutions file and
+    the state of the template screens it refers to, by file name.
+    """
+    return source_digest(
+        fingerprint,
+        hash_file_contents(substitution_path),
+        json.dumps(embedded, sort_keys=True),
+    )
@@ -0,0 +1,216 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+from abc import ABC, abstractmethod
+from collections.abc import Iterable
+from pathlib import Path
+
+from . import __version__
+
+logger = logging.getLogger("epicsdb2bob")
+
+# Bump whenever the layout of stored screens changes in an incompatible way
+ARTIFACT_FORMAT_VERSION = 1
+ARTIFACT_TOKEN_ENV = "EPICSDB2BOB_ARTIFACT_TOKEN"
+
+
+class ArtifactStore(ABC):
+    """
+    Content-addressed store of artifacts, by hex digest key. Backends treat any
+    failure to read as a miss and any failure to write as harmless, so that an
+    unavailable store only costs the time to generate artifacts again.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> bytes | None: ...
+
+    @abstractmethod
+    def put(self, key: str, data: bytes) -> None: ...
+
+    def discard(self, key: str) -> None:
+        """
+        Drop an entry found to be unreadable, if the store allows it. Stores that
+        don't leave it in place.
+        """
+        return None
+
+
+class DirectoryStore(ArtifactStore):
+    """Entries as files in a local or shared directory, fanned out by key."""
+
+    def __init__(self, root: str | Path, suffix: str = "") -> None:
+        self.root = Path(root)
+        self.suffix = suffix
+
+    def __str__(self) -> str:
+        return str(self.root)
+
+    def path_for(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}{self.suffix}"
+
+    def get(self, key: str) -> bytes | None:
+        try:
+            return self.path_for(key).read_bytes()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"Failed to read {self.path_for(key)}: {e}")
+            return None
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self.path_for(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Written to a temporary file first, so that concurrent runs never
+            # see a partially written entry
+            with tempfile.NamedTemporaryFile("wb", dir=path.parent, delete=False) as f:
+                f.write(data)
+            # Readable by other users sharing the directory
+            os.chmod(f.name, 0o644)
+            os.replace(f.name, path)
+        except OSError as e:
+            logger.warning(f"Failed to write {path}: {e}")
+
+    def discard(self, key: str) -> None:
+        self.path_for(key).unlink(missing_ok=True)
+
+
+class HTTPStore(ArtifactStore):
+    """
+    Entries at URLs below a base URL, read with GET and written with PUT, as
+    served by most object stores and caching proxies. After the first error that
+    is not a missing entry, the store is no longer used for the rest of the run.
+    """
+
+    def __init__(
+        self, url: str, timeout: float = 10.0, token: str | None = None
+    ) -> None:
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self.available = True
+
+    def __str__(self) -> str:
+        return self.url
+
+    def _request(self, key: str, method: str, data: bytes | None = None) -> bytes:
+        request = urllib.request.Request(
+            f"{self.url}/{key}", data=data, headers=self.headers, method=method
+        )
+        if data is not None:
+            request.add_header("Content-Type", "application/octet-stream")
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return response.read()
+
+    def _disable(self, e: Exception) -> None:
+        if self.available:
+            logger.warning(f"Not using artifact store {self.url} for this run: {e}")
+        self.available = False
+
+    def get(self, key: str) -> bytes | None:
+        if not self.available:
+            return None
+        try:
+            return self._request(key, "GET")
+        except urllib.error.HTTPError as e:
+            if e.code != 404:
+                self._disable(e)
+            return None
+        except (OSError, ValueError) as e:
+            self._disable(e)
+            return None
+
+    def put(self, key: str, data: bytes) -> None:
+        if not self.available:
+            return
+        try:
+            self._request(key, "PUT", data)
+        except (OSError, ValueError) as e:
+            self._disable(e)
+
+
+def open_artifact_store(location: str) -> ArtifactStore:
+    """
+    Open the store at an http(s) URL, authenticated with the token in the
+    EPICSDB2BOB_ARTIFACT_TOKEN environment variable if set, or in a directory.
+    """
+    if location.startswith(("http://", "https://")):
+        return HTTPStore(location, token=os.environ.get(ARTIFACT_TOKEN_ENV))
+    return DirectoryStore(location.removeprefix("file://"))
+
+
+class ArtifactCache:
+    """
+    Rendered screens in a shared artifact store, so that CI agents generating the
+    same commit fetch each other's screens instead of generating them again. Each
+    format of a screen is keyed by its name, which appears in the screen, the
+    source digest of its inputs and the epicsdb2bob version.
+    """
+
+    def __init__(self, store: ArtifactStore, version: str = __version__) -> None:
+        self.store = store
+        self.version = version
+        self.fetched = 0
+        self.stored = 0
+        self._lock = threading.Lock()
+
+    def screen_key(self, name: str, source: str, output_format: str) -> str:
+        key = json.dumps(
+            [
+                "screen",
+                ARTIFACT_FORMAT_VERSION,
+                self.version,
+                name,
+                source,
+                output_format,
+            ]
+        )
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def load_screen(
+        self, name: str, source: str, formats: Iterable[str]
+    ) -> tuple[int, int, dict[str, bytes]] | None:
+        """
+        Fetch a screen in each format, returning its height, width and the file
+        contents by format, or None unless all of them are stored.
+        """
+        height = width = 0
+        files: dict[str, bytes] = {}
+        for output_format in formats:
+            data = self.store.get(self.screen_key(name, source, output_format))
+            if data is None:
+                return None
+            try:
+                entry = json.loads(data)
+                height, width = entry["height"], entry["width"]
+                files[output_format] = entry["data"].encode()
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                logger.warning(f"Discarding unreadable screen in {self.store}: {e}")
+                self.store.discard(self.screen_key(name, source, output_format))
+                return None
+        with self._lock:
+            self.fetched += 1
+        return height, width, files
+
+    def store_screen(
+        self, name: str, source: str, files: dict[str, bytes], height: int, width: int
+    ) -> None:
+        for output_format, data in files.items():
+            entry = {"height": height, "width": width, "data": data.decode()}
+            self.store.put(
+                self.screen_key(name, source, output_format),
+                json.dumps(entry).encode(),
+            )
+        with self._lock:
+            self.stored += 1
+
+    def summary(self) -> str:
+        return (
+            f"Artifact store {self.store}: {self.fetched} screens fetched, "
+            f"{self.stored} stored"
+        )
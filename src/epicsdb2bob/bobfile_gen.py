@@ -1,5 +1,6 @@
 import logging
 import os
+from collections import Counter
 from pathlib import Path
 from typing import Any
 from uuid import uuid4
@@ -7,12 +8,7 @@ from xml.etree import ElementTree as ET
 
 from epicsdbtools import Database, Record
 from phoebusgen.screen import Screen
-from phoebusgen.widget import (
-    ActionButton,
-    EmbeddedDisplay,
-    Label,
-    Rectangle,
-)
+from phoebusgen.widget import Label, Rectangle
 from phoebusgen.widget.properties import (
     _BackgroundColor as HasBackgroundColor,
 )
@@ -22,19 +18,24 @@ from phoebusgen.widget.properties import (
 from phoebusgen.widget.properties import (
     _ForegroundColor as HasForegroundColor,
 )
-from phoebusgen.widget.properties import (
-    _HorizontalAlignment as HasHorizontalAlignment,
-)
 from phoebusgen.widget.widget import _Widget as Widget
 
 from .config import (
+    AnyConfig,
     EmbedLevel,
-    EPICSDB2BOBConfig,
     HorizontalAlignment,
     MacroSetLevel,
     TitleBarFormat,
+    VerticalAlignment,
+    resolve_config,
 )
-from .palettes import BLACK, WHITE
+from .emitters import to_bob_screen, to_bob_widget, to_bob_widget_of
+from .filters import RecordFilter, select_records
+from .layout import LayoutStats, OpenDisplayAction, ScreenLayout, WidgetSpec
+from .palettes import BLACK
+from .pv_index import PVIndex
+from .pv_manifest import PVManifest
+from .variants import macroize_pv_name
 
 logger = logging.getLogger("epicsdb2bob")
 
@@ -53,54 +54,75 @@ def template_to_bob(template: str) -> str:
     return os.path.splitext(os.path.basename(template))[0] + ".bob"
 
 
-def align_widget_horizontally(
-    widget: HasHorizontalAlignment, alignment: HorizontalAlignment
+def get_widget_class_name(widget_type: type[Widget]) -> str:
+    """
+    Get the name of the Phoebus widget class holding styles for a widget type.
+    """
+    return f"EPICSDB2BOB_{widget_type.__name__.upper()}"
+
+
+def style_widget(widget: Widget, widget_type: type[Widget], config: AnyConfig) -> None:
+    """
+    Apply palette colors and font size to a widget.
+    """
+    if isinstance(widget, HasForegroundColor):
+        widget.foreground_color(*config.palette.get_widget_fg(widget_type))
+
+    if isinstance(widget, HasBackgroundColor):
+        widget.background_color(*config.palette.get_widget_bg(widget_type))
+
+    if isinstance(widget, HasFontSize):
+        widget.font_size(config.font_size)
+
+
+def style_widget_spec(
+    spec: WidgetSpec, widget_type: type[Widget], config: AnyConfig
 ) -> None:
-    if alignment == HorizontalAlignment.LEFT:
-        widget.horizontal_alignment_left()
-    elif alignment == HorizontalAlignment.CENTER:
-        widget.horizontal_alignment_center()
-    elif alignment == HorizontalAlignment.RIGHT:
-        widget.horizontal_alignment_right()
+    """
+    Set palette colors and font size on a widget spec, and its widget class if
+    screens reference them.
+    """
+    spec.foreground_color = config.palette.get_widget_fg(widget_type)
+    spec.background_color = config.palette.get_widget_bg(widget_type)
+    spec.font_size = config.font_size
+    if config.use_widget_classes:
+        spec.widget_class = get_widget_class_name(widget_type)
 
 
-def add_label_for_record(
-    record: Record, start_x: int, start_y: int, config: EPICSDB2BOBConfig
-) -> Label:
+def layout_label_for_record(
+    record: Record, start_x: int, start_y: int, config: AnyConfig
+) -> WidgetSpec:
     description = record.fields.get("DESC", record.name.rsplit(")")[-1])  #  type: ignore
-    label = Label(
+    label = WidgetSpec(
+        "Label",
         short_uuid(),
-        description,
         start_x,
         start_y,
         config.default_widget_width,
         config.default_widget_height,
+        text=description,
+        horizontal_alignment=config.label_alignment,
     )
-
-    label.foreground_color(*config.palette.get_widget_fg(Label))
-    label.background_color(*config.palette.get_widget_bg(Label))
-    label.font_size(config.font_size)
-    align_widget_horizontally(label, config.label_alignment)
-
+    style_widget_spec(label, Label, config)
     return label
 
 
-def add_widget_for_record(
+def layout_widgets_for_record(
     record: Record,
     start_x: int,
     start_y: int,
     macros: dict[str, str],
-    config: EPICSDB2BOBConfig,
+    config: AnyConfig,
     readback_record: Record | None = None,
     with_label: bool = True,
-) -> list[Widget]:
+) -> list[WidgetSpec]:
     widget_type = config.rtyp_to_widget_map[str(record.rtyp)]
 
-    widgets_to_add: list[Widget] = []
+    widgets_to_add: list[WidgetSpec] = []
     current_x = start_x
 
     if with_label:
-        widgets_to_add.append(add_label_for_record(record, start_x, start_y, config))
+        widgets_to_add.append(layout_label_for_record(record, start_x, start_y, config))
         current_x += (
             config.widget_widths.get(Label, config.default_widget_width)
             + config.widget_offset
@@ -108,26 +130,19 @@ def add_widget_for_record(
 
     pv_name = record.name if record.name is not None else ""
     if config.macro_set_level != MacroSetLevel.WIDGET:
-        for macro_name, macro_value in macros.items():
-            pv_name = pv_name.replace(macro_value, f"$({macro_name})")
+        pv_name = macroize_pv_name(pv_name, macros)
 
-    widget = widget_type(
+    widget = WidgetSpec(
+        widget_type.__name__,
         short_uuid(),
-        str(pv_name),
         current_x,
         start_y,
         config.widget_widths.get(widget_type, config.default_widget_width),
         config.default_widget_height,
+        pv_name=str(pv_name),
+        record_type=str(record.rtyp),
     )
-
-    if isinstance(widget, HasForegroundColor):
-        widget.foreground_color(*config.palette.get_widget_fg(widget_type))
-
-    if isinstance(widget, HasBackgroundColor):
-        widget.background_color(*config.palette.get_widget_bg(widget_type))
-
-    if isinstance(widget, HasFontSize):
-        widget.font_size(config.font_size)
+    style_widget_spec(widget, widget_type, config)
 
     widgets_to_add.append(widget)
     current_x += (
@@ -137,7 +152,7 @@ def add_widget_for_record(
 
     if readback_record:
         widgets_to_add.extend(
-            add_widget_for_record(
+            layout_widgets_for_record(
                 readback_record,
                 current_x,
                 start_y,
@@ -150,84 +165,124 @@ def add_widget_for_record(
     return widgets_to_add
 
 
-def add_title_bar(
-    name: str, config: EPICSDB2BOBConfig, title_bar_width: int
-) -> Label | None:
+def layout_title_bar(
+    name: str, config: AnyConfig, title_bar_width: int
+) -> WidgetSpec | None:
     if config.title_bar_format == TitleBarFormat.NONE:
         return None
 
-    title_bar = Label(
+    title_bar = WidgetSpec(
+        "Label",
         short_uuid(),
-        name,
         config.widget_offset
         if config.title_bar_format == TitleBarFormat.MINIMAL
         else 0,
         0,
         title_bar_width,
-        config.title_bar_heights[config.title_bar_format],
+        config.title_bar_height,
+        text=name,
+        foreground_color=config.palette.title_bar_fg,
+        background_color=config.palette.title_bar_bg,
+        vertical_alignment=VerticalAlignment.MIDDLE,
+        transparent=False,
     )
-    title_bar.foreground_color(*WHITE)
     if config.title_bar_format == TitleBarFormat.FULL:
-        title_bar.font_size(config.font_size * 2)
-        title_bar.horizontal_alignment_center()
+        title_bar.font_size = config.font_size * 2
+        title_bar.horizontal_alignment = HorizontalAlignment.CENTER
     elif config.title_bar_format == TitleBarFormat.MINIMAL:
-        title_bar.auto_size()
-        title_bar.font_size(config.font_size + 2)
-        title_bar.border_width(2)
-        title_bar.border_color(*BLACK)
-
-    title_bar.background_color(*config.palette.title_bar_bg)
-    title_bar.foreground_color(*config.palette.title_bar_fg)
-    title_bar.transparent(False)
-    title_bar.vertical_alignment_middle()
+        title_bar.auto_size = True
+        title_bar.font_size = config.font_size + 2
+        title_bar.border_width = 2
+        title_bar.border_color = BLACK
     return title_bar
 
 
-def add_border(config: EPICSDB2BOBConfig) -> Rectangle | None:
+def layout_border(config: AnyConfig) -> WidgetSpec | None:
     if config.title_bar_format != TitleBarFormat.MINIMAL:
         return None
 
-    border = Rectangle(
+    return WidgetSpec(
+        "Rectangle",
         short_uuid(),
         0,
-        int(config.title_bar_heights[config.title_bar_format] / 2) + 1,
+        int(config.title_bar_height / 2) + 1,
         0,
         0,
+        transparent=True,
+        line_width=2,
+        line_color=BLACK,
     )
-    border.transparent(True)
-    border.line_width(2)
-    border.line_color(*BLACK)
 
-    return border
+
+def layout_dividing_line(
+    x_position: int,
+    y_position: int,
+    config: AnyConfig,
+) -> WidgetSpec:
+    return WidgetSpec(
+        "Rectangle",
+        short_uuid(),
+        x_position,
+        y_position,
+        2,
+        config.max_screen_height - y_position,
+        line_color=BLACK,
+    )
 
 
-def get_widget_start_positions(config: EPICSDB2BOBConfig) -> tuple[int, int]:
-    start_x_pos = config.widget_offset
-    start_y_pos = (
-        config.widget_offset + config.title_bar_heights[config.title_bar_format]
+def add_label_for_record(
+    record: Record, start_x: int, start_y: int, config: AnyConfig
+) -> Label:
+    return to_bob_widget_of(
+        layout_label_for_record(record, start_x, start_y, config), Label
     )
-    return start_x_pos, start_y_pos
+
+
+def add_widget_for_record(
+    record: Record,
+    start_x: int,
+    start_y: int,
+    macros: dict[str, str],
+    config: AnyConfig,
+    readback_record: Record | None = None,
+    with_label: bool = True,
+) -> list[Widget]:
+    return [
+        to_bob_widget(spec)
+        for spec in layout_widgets_for_record(
+            record, start_x, start_y, macros, config, readback_record, with_label
+        )
+    ]
+
+
+def add_title_bar(name: str, config: AnyConfig, title_bar_width: int) -> Label | None:
+    title_bar = layout_title_bar(name, config, title_bar_width)
+    return to_bob_widget_of(title_bar, Label) if title_bar else None
+
+
+def add_border(config: AnyConfig) -> Rectangle | None:
+    border = layout_border(config)
+    return to_bob_widget_of(border, Rectangle) if border else None
+
+
+def get_widget_start_positions(config: AnyConfig) -> tuple[int, int]:
+    return config.widget_start_position
 
 
 def get_next_x_position(
-    current_x: int, col_width_widgets: int, config: EPICSDB2BOBConfig
+    current_x: int, col_width_widgets: int, config: AnyConfig
 ) -> int:
-    return current_x + col_width_widgets * (
-        config.default_widget_width + config.widget_offset
-    )
+    return current_x + col_width_widgets * config.column_pitch
 
 
 def get_next_widget_position(
-    current_x, current_y: int, col_width_widgets: int, config: EPICSDB2BOBConfig
+    current_x, current_y: int, col_width_widgets: int, config: AnyConfig
 ) -> tuple[int, int]:
     new_x = current_x
-    new_y = current_y + config.default_widget_height + config.widget_offset
+    new_y = current_y + config.row_pitch
 
     # Reset to next column if we hit max height
-    if (
-        new_y
-        > config.max_screen_height - config.title_bar_heights[config.title_bar_format]
-    ):
+    if new_y > config.max_screen_height - config.title_bar_height:
         _, new_y = get_widget_start_positions(config)
         new_x = get_next_x_position(current_x, col_width_widgets, config)
 
@@ -237,19 +292,82 @@ def get_next_widget_position(
 def add_dividing_line(
     x_position: int,
     y_position: int,
-    config: EPICSDB2BOBConfig,
+    config: AnyConfig,
 ) -> Rectangle:
-    dividing_line = Rectangle(
-        short_uuid(), x_position, y_position, 2, config.max_screen_height - y_position
+    return to_bob_widget_of(
+        layout_dividing_line(x_position, y_position, config), Rectangle
     )
-    dividing_line.line_color(*BLACK)
-    return dividing_line
 
 
-def generate_bobfile_for_db(
-    name: str, database: Database, macros: dict[str, str], config: EPICSDB2BOBConfig
-) -> Screen:
-    screen = Screen(name)
+def pair_records(
+    name: str,
+    database: Database,
+    records: dict[str, Record],
+    config: AnyConfig,
+    record_filter: RecordFilter,
+    pv_index: PVIndex | None = None,
+    unsupported: Counter[str] | None = None,
+) -> list[tuple[Record, Record | None]]:
+    """
+    Get the selected records of a database that get widgets, in order, each with
+    the readback record shown next to it, if any. Readbacks not defined in the
+    database are looked up in pv_index, if given. Records of unsupported types
+    are counted in unsupported.
+    """
+    pairs: list[tuple[Record, Record | None]] = []
+    records_seen: set[str] = set()
+
+    for record in records.values():
+        logger.debug("Processing record: %s of type %s", record.name, record.rtyp)
+        if record.rtyp not in config.rtyp_to_widget_map:
+            logger.debug("Record type %s not supported, skipping.", record.rtyp)
+            if unsupported is not None:
+                unsupported[str(record.rtyp)] += 1
+        elif record.name in records_seen:
+            logger.debug("Record %s already processed, skipping.", record.name)
+        else:
+            readback_record = None
+            readback_name = str(record.name) + config.readback_suffix
+            rb = records.get(readback_name)
+            if rb is None and pv_index is not None and readback_name not in database:
+                rb = pv_index.find_record(readback_name, name)
+                if rb is not None and not record_filter(rb):
+                    rb = None
+            if rb is not None and rb.rtyp in config.rtyp_to_widget_map:
+                readback_record = rb
+                logger.debug("Found readback record: %s", rb.name)
+
+            pairs.append((record, readback_record))
+            records_seen.add(str(record.name))
+            if readback_record:
+                records_seen.add(str(readback_record.name))
+
+    return pairs
+
+
+def layout_database(
+    name: str,
+    database: Database,
+    macros: dict[str, str],
+    config: AnyConfig,
+    record_filter: RecordFilter | None = None,
+    pv_index: PVIndex | None = None,
+    stats: LayoutStats | None = None,
+) -> ScreenLayout:
+    """
+    Lay out the screen for a database, ready to be written in any display format.
+
+    Only records selected by record_filter get widgets, by default those selected
+    by the config's record rules. Readbacks not defined in the database are looked
+    up in pv_index, if given. Counts of records and widgets are added to stats.
+    """
+    config = resolve_config(config)
+    if record_filter is None:
+        record_filter = config.record_filter
+    records = select_records(database, record_filter)
+    unsupported: Counter[str] = Counter()
+
+    layout = ScreenLayout(name)
 
     start_x_pos, start_y_pos = get_widget_start_positions(config)
     current_x_pos = start_x_pos
@@ -257,58 +375,44 @@ def generate_bobfile_for_db(
 
     col_width_widgets = 2
 
-    border = add_border(config)
+    border = layout_border(config)
     if border:
-        screen.add_widget(border)
+        layout.widgets.append(border)
 
-    records_seen = []
-
-    for record in database.values():
-        logger.info(f"Processing record: {record.name} of type {record.rtyp}")
-        if record.rtyp not in config.rtyp_to_widget_map:
-            logger.warning(f"Record type {record.rtyp} not supported, skipping.")
-        else:
-            if record.name in records_seen:
-                logger.info(f"Record {record.name} already processed, skipping.")
-            else:
-                readback_record = None
-                if record.name + config.readback_suffix in database:
-                    rb = database[record.name + config.readback_suffix]
-                    if rb.rtyp in config.rtyp_to_widget_map:
-                        readback_record = rb
-                        logger.info(f"Found readback record: {rb.name}")
-
-                widgets_for_record = add_widget_for_record(
-                    record,
-                    current_x_pos,
-                    current_y_pos,
-                    macros,
-                    config,
-                    readback_record=readback_record,
-                )
-
-                col_width_widgets = max(len(widgets_for_record), col_width_widgets)
+    for record, readback_record in pair_records(
+        name, database, records, config, record_filter, pv_index, unsupported
+    ):
+        widgets_for_record = layout_widgets_for_record(
+            record,
+            current_x_pos,
+            current_y_pos,
+            macros,
+            config,
+            readback_record=readback_record,
+        )
 
-                for widget in widgets_for_record:
-                    logger.info(
-                        f"Adding {widget.__class__.__name__} widget for {record.name}"
-                    )
-                    logger.debug(f"Position: ({current_x_pos}, {current_y_pos})")
-                    screen.add_widget(widget)
+        col_width_widgets = max(len(widgets_for_record), col_width_widgets)
 
-                records_seen.append(record.name)
-                if readback_record:
-                    records_seen.append(readback_record.name)
+        for widget in widgets_for_record:
+            logger.debug(
+                "Adding %s widget for %s at (%d, %d)",
+                widget.kind,
+                record.name,
+                current_x_pos,
+                current_y_pos,
+            )
+            layout.widgets.append(widget)
 
-                current_x_pos, current_y_pos = get_next_widget_position(
-                    current_x_pos, current_y_pos, col_width_widgets, config
+        current_x_pos, current_y_pos = get_next_widget_position(
+            current_x_pos, current_y_pos, col_width_widgets, config
+        )
+        if current_y_pos == start_y_pos:
+            layout.widgets.append(
+                layout_dividing_line(
+                    current_x_pos - config.widget_offset, current_y_pos, config
                 )
-                if current_y_pos == start_y_pos:
-                    dividing_line = add_dividing_line(
-                        current_x_pos - config.widget_offset, current_y_pos, config
-                    )
-                    screen.add_widget(dividing_line)
-                    col_width_widgets = 2
+            )
+            col_width_widgets = 2
 
     screen_width = get_next_x_position(current_x_pos, col_width_widgets, config)
 
@@ -317,28 +421,77 @@ def generate_bobfile_for_db(
     else:
         screen_height = current_y_pos + config.widget_offset
 
-    title_bar = add_title_bar(name, config, screen_width - config.widget_offset)
+    title_bar = layout_title_bar(name, config, screen_width - config.widget_offset)
     if title_bar:
-        screen.add_widget(title_bar)
+        layout.widgets.append(title_bar)
 
     if config.title_bar_format == TitleBarFormat.MINIMAL and border is not None:
-        border.width(screen_width)
-        border.height(
-            screen_height - int(config.title_bar_heights[config.title_bar_format] / 2)
-        )
+        border.width = screen_width
+        border.height = screen_height - int(config.title_bar_height / 2)
 
-    screen.background_color(*config.background_color)
-
-    screen.height(screen_height)
-    screen.width(screen_width)
+    layout.background_color = config.background_color
+    layout.height = screen_height
+    layout.width = screen_width
 
     if config.macro_set_level == MacroSetLevel.SCREEN:
-        for macro in macros.items():
-            screen.macro(macro[0], macro[1])
+        layout.macros = dict(macros)
+
+    if unsupported:
+        logger.warning(
+            f"Skipped {sum(unsupported.values())} records of unsupported types in "
+            f"{name}: "
+            + ", ".join(f"{rtyp} ({count})" for rtyp, count in unsupported.items())
+        )
+    if stats is not None:
+        stats.screens += 1
+        stats.records += len(database)
+        stats.widgets += len(layout.widgets)
+        stats.filtered += len(database) - len(records)
+        stats.unsupported.update(unsupported)
+    logger.debug(f"Generated screen for database: {name}")
+
+    return layout
+
+
+def get_external_readbacks(
+    name: str,
+    database: Database,
+    config: AnyConfig,
+    record_filter: RecordFilter,
+    pv_index: PVIndex,
+) -> list[Record]:
+    """
+    Get the readback records from other databases that layout_database would pair
+    with records of this database, so the screen only changes if they do.
+    """
+    readbacks = []
+    for record in select_records(database, record_filter).values():
+        readback_name = str(record.name) + config.readback_suffix
+        if readback_name in database:
+            continue
+        readback = pv_index.find_record(readback_name, name)
+        if readback is not None and record_filter(readback):
+            readbacks.append(readback)
+    return readbacks
 
-    logger.info(f"Generated screen for database: {name}")
 
-    return screen
+def generate_bobfile_for_db(
+    name: str,
+    database: Database,
+    macros: dict[str, str],
+    config: AnyConfig,
+    record_filter: RecordFilter | None = None,
+    pv_index: PVIndex | None = None,
+    pv_manifest: PVManifest | None = None,
+) -> Screen:
+    """
+    Generate a BOB file for a database, see layout_database. Its PVs are added to
+    pv_manifest, if given.
+    """
+    layout = layout_database(name, database, macros, config, record_filter, pv_index)
+    if pv_manifest is not None:
+        pv_manifest.add_layout(layout)
+    return to_bob_screen(layout)
 
 
 def get_height_width_of_bobfile(bobfile_path: str | Path) -> tuple[int, int]:
@@ -350,43 +503,60 @@ def get_height_width_of_bobfile(bobfile_path: str | Path) -> tuple[int, int]:
         return height, width
 
 
-def generate_bobfile_for_substitution(
+def layout_substitution(
     substitution_name: str,
     substitution: dict[str, Any],
     found_bobfiles: dict[str, Path],
-    config: EPICSDB2BOBConfig,
-) -> Screen:
+    config: AnyConfig,
+    screen_sizes: dict[str, tuple[int, int]] | None = None,
+    stats: LayoutStats | None = None,
+    screen_macros: dict[str, dict[str, str]] | None = None,
+) -> ScreenLayout:
     """
-    Generate a BOB file for a substitution.
+    Lay out the screen for a substitution, ready to be written in any display format.
+
+    Sizes of screens to embed are taken from screen_sizes where available,
+    keyed by file name, and are otherwise read from the found bobfiles. Found
+    bobfiles may map the screen of a template to a file of another name, shown
+    with the macros for it in screen_macros under those of each instance. Counts
+    of instances and widgets are added to stats.
     """
-    screen = Screen(substitution_name)
-    screen.background_color(*config.background_color)
+    config = resolve_config(config)
+    screen_sizes = screen_sizes if screen_sizes is not None else {}
+    screen_macros = screen_macros or {}
+    layout = ScreenLayout(substitution_name, background_color=config.background_color)
 
     screen_width = 0
     max_col_width = 0
     hit_max_y_pos = False
 
-    current_x_pos = config.widget_offset
-    current_y_pos = (
-        config.widget_offset + config.title_bar_heights[config.title_bar_format]
-    )
-    launcher_buttons: dict[str, ActionButton] = {}
+    current_x_pos, current_y_pos = config.widget_start_position
+    launcher_buttons: dict[str, WidgetSpec] = {}
 
-    logger.info(f"Generating screen for substitution: {substitution_name}")
-    logger.debug(f"Found bobfiles: {found_bobfiles}")
+    logger.debug(f"Generating screen for substitution: {substitution_name}")
+    logger.debug("Found bobfiles: %s", found_bobfiles)
 
     for template in substitution:
         template_instances = substitution[template]
-        logger.info(f"Processing template: {template}")
+        logger.debug("Processing template: %s", template)
         for i, instance in enumerate(template_instances):
-            if template_to_bob(template) in found_bobfiles and (
+            bobfile_name = template_to_bob(template)
+            file_name = (
+                found_bobfiles[bobfile_name].name
+                if bobfile_name in found_bobfiles
+                else bobfile_name
+            )
+            macros = {**screen_macros.get(bobfile_name, {}), **instance}
+            if (bobfile_name in screen_sizes or bobfile_name in found_bobfiles) and (
                 config.embed == EmbedLevel.ALL
                 or (config.embed == EmbedLevel.SINGLE and len(template_instances) == 1)
             ):
-                logger.info(f"Embedding display for instance: {instance}")
-                embed_raw_height, embed_raw_width = get_height_width_of_bobfile(
-                    found_bobfiles[template_to_bob(template)]
-                )
+                logger.debug("Embedding display for instance: %s", instance)
+                if bobfile_name not in screen_sizes:
+                    screen_sizes[bobfile_name] = get_height_width_of_bobfile(
+                        found_bobfiles[bobfile_name]
+                    )
+                embed_raw_height, embed_raw_width = screen_sizes[bobfile_name]
                 embed_height = embed_raw_height + config.widget_offset
                 embed_width = embed_raw_width + config.widget_offset
                 if (
@@ -401,47 +571,52 @@ def generate_bobfile_for_substitution(
                     current_x_pos += max_col_width + config.widget_offset
                     max_col_width = 0
 
-                embedded_display = EmbeddedDisplay(
-                    short_uuid(),
-                    template_to_bob(template),
-                    current_x_pos,
-                    current_y_pos,
-                    embed_width,
-                    embed_height,
+                layout.widgets.append(
+                    WidgetSpec(
+                        "EmbeddedDisplay",
+                        short_uuid(),
+                        current_x_pos,
+                        current_y_pos,
+                        embed_width,
+                        embed_height,
+                        file=file_name,
+                        macros=macros,
+                    )
                 )
                 current_y_pos += embed_height + config.widget_offset
 
                 if embed_width > max_col_width:
                     max_col_width = embed_width
-                for macro in instance:
-                    embedded_display.macro(macro, instance[macro])
-                screen.add_widget(embedded_display)
 
             elif template in launcher_buttons:
-                launcher_buttons[template].action_open_display(
-                    template_to_bob(template),
-                    "tab",
-                    f"{os.path.splitext(template)[0]} {i + 1}",
-                    instance,
+                launcher_buttons[template].actions.append(
+                    OpenDisplayAction(
+                        file_name,
+                        "tab",
+                        f"{os.path.splitext(template)[0]} {i + 1}",
+                        macros,
+                    )
                 )
             else:
-                logger.info(f"Creating launcher button for template: {template}")
-                launcher_buttons[template] = ActionButton(
+                logger.debug("Creating launcher button for template: %s", template)
+                launcher_buttons[template] = WidgetSpec(
+                    "ActionButton",
                     short_uuid(),
-                    os.path.splitext(template)[0],
-                    "",
                     current_x_pos,
                     current_y_pos,
                     config.default_widget_width,
                     config.default_widget_height,
+                    text=os.path.splitext(template)[0],
+                    actions=[
+                        OpenDisplayAction(
+                            file_name,
+                            "tab",
+                            f"{os.path.splitext(template)[0]} {i + 1}",
+                            macros,
+                        )
+                    ],
                 )
-                launcher_buttons[template].action_open_display(
-                    template_to_bob(template),
-                    "tab",
-                    f"{os.path.splitext(template)[0]} {i + 1}",
-                    instance,
-                )
-                screen.add_widget(launcher_buttons[template])
+                layout.widgets.append(launcher_buttons[template])
                 current_y_pos += config.default_widget_height + config.widget_offset
 
                 if config.default_widget_width > max_col_width:
@@ -465,17 +640,42 @@ def generate_bobfile_for_substitution(
         screen_height = config.max_screen_height + config.widget_offset
     screen_width = current_x_pos + max_col_width + config.widget_offset
 
-    title_bar = add_title_bar(
+    title_bar = layout_title_bar(
         substitution_name,
         config,
         screen_width - config.widget_offset,
     )
     if title_bar:
-        screen.add_widget(title_bar)
+        layout.widgets.append(title_bar)
+
+    layout.height = screen_height
+    layout.width = screen_width
 
-    screen.height(screen_height)
-    screen.width(screen_width)
+    if stats is not None:
+        stats.screens += 1
+        stats.instances += sum(len(instances) for instances in substitution.values())
+        stats.widgets += len(layout.widgets)
+    logger.debug(f"Generated screen for substitution: {substitution_name}")
 
-    logger.info(f"Generated screen for substitution: {substitution}")
+    return layout
 
-    return screen
+
+def generate_bobfile_for_substitution(
+    substitution_name: str,
+    substitution: dict[str, Any],
+    found_bobfiles: dict[str, Path],
+    config: AnyConfig,
+    screen_sizes: dict[str, tuple[int, int]] | None = None,
+    pv_manifest: PVManifest | None = None,
+) -> Screen:
+    """
+    Generate a BOB file for a substitution, see layout_substitution. Its PVs are
+    added to pv_manifest, if given, including those of embedded screens added to
+    it before.
+    """
+    layout = layout_substitution(
+        substitution_name, substitution, found_bobfiles, config, screen_sizes
+    )
+    if pv_manifest is not None:
+        pv_manifest.add_layout(layout)
+    return to_bob_screen(layout)
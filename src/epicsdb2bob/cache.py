@@ -0,0 +1,179 @@
+import hashlib
+import json
+import logging
+import os
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+
+from epicsdbtools import Database, LoadIncludesStrategy, Record
+
+from . import __version__
+from .artifacts import ArtifactStore, DirectoryStore
+
+logger = logging.getLogger("epicsdb2bob")
+
+# Bump whenever the layout of cached entries changes in an incompatible way
+CACHE_FORMAT_VERSION = 2
+
+
+def default_cache_dir() -> Path:
+    """
+    Get the default cache location, following the XDG base directory spec.
+    """
+    xdg_cache_home = os.environ.get("XDG_CACHE_HOME")
+    base = Path(xdg_cache_home) if xdg_cache_home else Path.home() / ".cache"
+    return base / "epicsdb2bob"
+
+
+def get_epicsdbtools_version() -> str:
+    try:
+        return version("epicsdbtools")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def hash_file_contents(file_path: str | Path) -> str:
+    with open(file_path, "rb") as fp:
+        return hashlib.file_digest(fp, "sha256").hexdigest()
+
+
+def get_parse_variant(fast_scan: bool) -> str:
+    """
+    Describe the settings that change what parsing a file gives, for cache keys.
+    """
+    scanner = "fast" if fast_scan else "full"
+    # Includes are never expanded into the databases that include them
+    return f"{scanner}:includes={LoadIncludesStrategy.IGNORE.name}"
+
+
+def database_to_json(database: Database) -> bytes:
+    """
+    Serialize a parsed database as plain JSON, which unlike a pickle is safe to
+    read from a store shared with other machines.
+    """
+    return json.dumps(
+        {
+            "records": [
+                {
+                    "name": record.name,
+                    "rtyp": record.rtyp,
+                    "fields": {key: str(value) for key, value in record.fields.items()},
+                    "infos": {key: str(value) for key, value in record.infos.items()},
+                    "aliases": list(getattr(record, "aliases", [])),
+                }
+                for record in database.values()
+            ],
+            "includes": [str(name) for name in database.get_included_templates()],
+        }
+    ).encode()
+
+
+def database_from_json(data: bytes) -> Database:
+    """
+    Rebuild a database serialized by database_to_json. Raises ValueError, KeyError
+    or TypeError for anything else.
+    """
+    entry = json.loads(data)
+    database = Database()
+    for record_entry in entry["records"]:
+        record = Record()
+        record.name = str(record_entry["name"])  # type: ignore
+        record.rtyp = str(record_entry["rtyp"])  # type: ignore
+        record.fields = {  # type: ignore
+            str(key): str(value) for key, value in record_entry["fields"].items()
+        }
+        record.infos = {  # type: ignore
+            str(key): str(value) for key, value in record_entry["infos"].items()
+        }
+        record.aliases = [str(alias) for alias in record_entry["aliases"]]  # type: ignore
+        database.add_record(record)
+    for include in entry["includes"]:
+        database.add_included_template(str(include), database=None)
+    return database
+
+
+class ParseCache:
+    """
+    On-disk cache of parsed EPICS databases, keyed by file content, the parse
+    settings and the versions of epicsdb2bob and epicsdbtools. Given a shared
+    artifact store, entries missing locally are fetched from it, and new entries
+    are also stored in it. A read-only cache is looked up but never written to.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str | Path | None = None,
+        shared: ArtifactStore | None = None,
+        read_only: bool = False,
+    ):
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_dir()
+        self.read_only = read_only
+        self.parser_version = get_epicsdbtools_version()
+        self.version = __version__
+        # Keys of files looked up but not found, to store their entries under
+        self._pending_keys: dict[tuple[str, str], str] = {}
+        self._local = DirectoryStore(self.cache_dir / "databases", ".json")
+        self._stores: list[ArtifactStore] = [self._local]
+        if shared is not None:
+            self._stores.append(shared)
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+
+    def key_for(self, file_path: str | Path, variant: str = "full") -> str:
+        """
+        Compute the cache key for a file from its contents, the parse settings
+        described by variant and the versions of epicsdb2bob and its parser.
+        """
+        key = hashlib.sha256()
+        key.update(
+            f"{CACHE_FORMAT_VERSION}:{self.version}:{self.parser_version}:"
+            f"{variant}:".encode()
+        )
+        key.update(hash_file_contents(file_path).encode())
+        return key.hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self._local.path_for(key)
+
+    def load(self, file_path: str | Path, variant: str = "full") -> Database | None:
+        key = self.key_for(file_path, variant)
+        self._pending_keys.pop((str(file_path), variant), None)
+        for store in self._stores:
+            data = store.get(key)
+            if data is None:
+                continue
+            try:
+                database = database_from_json(data)
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                logger.warning(
+                    f"Discarding unreadable cache entry {key} in {store}: {e}"
+                )
+                if not self.read_only:
+                    store.discard(key)
+                continue
+            if store is not self._local:
+                if not self.read_only:
+                    self._local.put(key, data)
+                self.shared_hits += 1
+            self.hits += 1
+            logger.debug(f"Loaded {file_path} from parse cache {store}")
+            return database
+
+        self.misses += 1
+        if not self.read_only:
+            self._pending_keys[(str(file_path), variant)] = key
+        return None
+
+    def store(
+        self, file_path: str | Path, database: Database, variant: str = "full"
+    ) -> None:
+        if self.read_only:
+            return
+        # Hashed already when the file was looked up
+        key = self._pending_keys.pop((str(file_path), variant), None)
+        if key is None:
+            key = self.key_for(file_path, variant)
+        data = database_to_json(database)
+        for store in self._stores:
+            store.put(key, data)
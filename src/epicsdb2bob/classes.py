@@ -0,0 +1,78 @@
+import logging
+
+from phoebusgen.screen import Screen
+from phoebusgen.widget import Label
+from phoebusgen.widget.widget import _Widget as Widget
+
+from .bobfile_gen import get_widget_class_name, style_widget
+from .config import AnyConfig, resolve_config
+from .emitters import align_widget_horizontally, to_bob_widget
+from .layout import WidgetSpec
+
+logger = logging.getLogger("epicsdb2bob")
+
+WIDGET_CLASS_FILE_NAME = "epicsdb2bob.bcf"
+
+# Properties set by style_widget/align_widget_horizontally that classes should own
+CLASS_PROPERTIES = (
+    "foreground_color",
+    "background_color",
+    "font",
+    "horizontal_alignment",
+)
+
+
+def create_class_widget(
+    widget_type: type[Widget], y_position: int, config: AnyConfig
+) -> Widget:
+    """
+    Instantiate a widget whose name is the class name for the given widget type.
+    """
+    class_name = get_widget_class_name(widget_type)
+    return to_bob_widget(
+        WidgetSpec(
+            widget_type.__name__,
+            class_name,
+            0,
+            y_position,
+            config.widget_widths.get(widget_type, config.default_widget_width),
+            config.default_widget_height,
+            pv_name="",
+            text=class_name,
+        )
+    )
+
+
+def generate_widget_class_file(config: AnyConfig) -> Screen:
+    """
+    Generate a Phoebus widget class file holding the styles of the active palette.
+
+    Screens generated with use_widget_classes reference these classes instead of
+    carrying inline colors and fonts, so restyling only requires a new class file.
+    """
+    config = resolve_config(config)
+    class_file = Screen("Widget Classes")
+
+    widget_types = [Label] + sorted(
+        set(config.rtyp_to_widget_map.values()) - {Label},
+        key=lambda widget_type: widget_type.__name__,
+    )
+    for i, widget_type in enumerate(widget_types):
+        widget = create_class_widget(
+            widget_type,
+            i * config.row_pitch,
+            config,
+        )
+        style_widget(widget, widget_type, config)
+        if isinstance(widget, Label):
+            align_widget_horizontally(widget, config.label_alignment)
+
+        for property_name in CLASS_PROPERTIES:
+            element = widget.root.find(property_name)
+            if element is not None:
+                element.set("use_class", "true")
+
+        class_file.add_widget(widget)
+        logger.debug(f"Added widget class {get_widget_class_name(widget_type)}")
+
+    return class_file
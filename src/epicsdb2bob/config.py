@@ -1,7 +1,12 @@
+import copy
+import hashlib
 import os
-from dataclasses import dataclass, field
+from collections.abc import Mapping
+from dataclasses import dataclass, field, fields
 from enum import Enum
+from functools import cached_property
 from pathlib import Path
+from types import MappingProxyType
 from typing import Any
 
 import yaml
@@ -9,7 +14,15 @@ from phoebusgen import widget as phoebusgen_widget
 from phoebusgen.widget import LED, ChoiceButton, ComboBox, TextEntry, TextUpdate
 from phoebusgen.widget.widget import _Widget as Widget
 
-from .palettes import BUILTIN_PALETTES, Palette
+from .discovery import DEFAULT_IGNORE_GLOBS
+from .filters import (
+    DEFAULT_EXCLUDE_RECORDS,
+    RecordFilter,
+    RecordRule,
+    compile_record_filter,
+    rules_from_dicts,
+)
+from .palettes import BUILTIN_PALETTES, Color, FrozenPalette, Palette
 
 
 class EmbedLevel(str, Enum):
@@ -50,6 +63,7 @@ class MacroSetLevel(str, Enum):
     """Determines at what level macros should be set."""
 
     NONE = "none"  # No macros
+    LAUNCHER = "launcher"  # Set macros on launcher buttons only
     SCREEN = "screen"  # Set macros at the screen level
     WIDGET = "widget"  # Set macros at the widget level
 
@@ -75,11 +89,13 @@ class EPICSDB2BOBConfig:
     macro_set_level: MacroSetLevel = MacroSetLevel.SCREEN
     title_bar_format: TitleBarFormat = TitleBarFormat.MINIMAL
     rtyp_to_widget_map: dict[str, type[Widget]] = field(
-        default_factory=lambda: DEFAULT_RTYP_TO_WIDGET_MAP
+        default_factory=lambda: DEFAULT_RTYP_TO_WIDGET_MAP.copy()
     )
     readback_suffix: str = "_RBV"
     bobfile_search_path: list[Path] = field(default_factory=list)
-    palette: Palette = field(default_factory=lambda: BUILTIN_PALETTES["default"])
+    palette: Palette = field(
+        default_factory=lambda: copy.deepcopy(BUILTIN_PALETTES["default"])
+    )
     font_size: int = 16
     default_widget_width: int = 150
     default_widget_height: int = 20
@@ -96,6 +112,62 @@ class EPICSDB2BOBConfig:
     widget_widths: dict[type[Widget], int] = field(default_factory=lambda: {LED: 20})
     background_color: tuple[int, int, int] = (187, 187, 187)
     title_bar_color: tuple[int, int, int] = (218, 218, 218)
+    use_parse_cache: bool = True
+    parse_cache_dir: Path | None = None
+    fast_scan: bool = False
+    ignore_globs: list[str] = field(default_factory=lambda: list(DEFAULT_IGNORE_GLOBS))
+    max_scan_depth: int | None = None
+    scan_workers: int = 8
+    use_widget_classes: bool = False
+    # Records to generate widgets for, see filters.compile_record_filter
+    include_records: list[RecordRule] = field(default_factory=list)
+    exclude_records: list[RecordRule] = field(
+        default_factory=lambda: copy.deepcopy(DEFAULT_EXCLUDE_RECORDS)
+    )
+    # Display file formats to write each screen in, see emitters.EMITTERS
+    output_formats: list[str] = field(default_factory=lambda: ["bob"])
+
+    @property
+    def title_bar_height(self) -> int:
+        return self.title_bar_heights[self.title_bar_format]
+
+    @property
+    def widget_start_position(self) -> tuple[int, int]:
+        return self.widget_offset, self.widget_offset + self.title_bar_height
+
+    @property
+    def column_pitch(self) -> int:
+        return self.default_widget_width + self.widget_offset
+
+    @property
+    def row_pitch(self) -> int:
+        return self.default_widget_height + self.widget_offset
+
+    @staticmethod
+    def from_args(args: dict[str, Any]) -> "EPICSDB2BOBConfig":
+        """
+        Create a config from parsed command line arguments, ignoring any that are
+        not config settings or were not given.
+        """
+        names = {config_field.name for config_field in fields(EPICSDB2BOBConfig)}
+        data = {
+            key: value
+            for key, value in args.items()
+            if key in names and value is not None
+        }
+        if isinstance(data.get("palette"), str):
+            data["palette"] = copy.deepcopy(BUILTIN_PALETTES[data["palette"]])
+        if "embed" in data:
+            data["embed"] = EmbedLevel(data["embed"])
+        if "macro_set_level" in data:
+            data["macro_set_level"] = MacroSetLevel(data["macro_set_level"])
+        if "title_bar_format" in data:
+            data["title_bar_format"] = TitleBarFormat(data["title_bar_format"])
+        if "bobfile_search_path" in data:
+            data["bobfile_search_path"] = [Path(p) for p in data["bobfile_search_path"]]
+        if "parse_cache_dir" in data:
+            data["parse_cache_dir"] = Path(data["parse_cache_dir"])
+        return EPICSDB2BOBConfig(**data)
 
     @staticmethod
     def from_yaml(file_path: Path, cli_args: dict[str, Any]) -> "EPICSDB2BOBConfig":
@@ -129,6 +201,8 @@ class EPICSDB2BOBConfig:
             )
         elif "palette" in data:
             palette = BUILTIN_PALETTES[data["palette"]]
+        # Copy so that custom settings don't leak into the shared builtin palette
+        palette = copy.deepcopy(palette)
 
         # Override with any custom palette settings
         if "custom_palette" in data:
@@ -157,6 +231,66 @@ class EPICSDB2BOBConfig:
             widget_widths={LED: data.get("widget_widths", {}).get("LED", 20)},
             background_color=tuple(data.get("background_color", (187, 187, 187))),  # type: ignore
             title_bar_color=tuple(data.get("title_bar_color", (218, 218, 218))),  # type: ignore
+            use_parse_cache=data.get("use_parse_cache", True),
+            parse_cache_dir=Path(data["parse_cache_dir"])
+            if data.get("parse_cache_dir")
+            else None,
+            fast_scan=data.get("fast_scan", False),
+            ignore_globs=list(data.get("ignore_globs", DEFAULT_IGNORE_GLOBS)),
+            max_scan_depth=data.get("max_scan_depth"),
+            scan_workers=data.get("scan_workers") or 8,
+            use_widget_classes=bool(data.get("use_widget_classes", False)),
+            include_records=rules_from_dicts(data.get("include_records", [])),
+            exclude_records=rules_from_dicts(data["exclude_records"])
+            if "exclude_records" in data
+            else copy.deepcopy(DEFAULT_EXCLUDE_RECORDS),
+            output_formats=list(data.get("output_formats") or ["bob"]),
+        )
+
+    def snapshot(self) -> "ConfigSnapshot":
+        """
+        Take an immutable copy of this config to hand to generators.
+        """
+        return ConfigSnapshot(
+            debug=self.debug,
+            embed=EmbedLevel(self.embed),
+            macro_set_level=MacroSetLevel(self.macro_set_level),
+            title_bar_format=TitleBarFormat(self.title_bar_format),
+            rtyp_to_widget_map=MappingProxyType(dict(self.rtyp_to_widget_map)),
+            readback_suffix=self.readback_suffix,
+            bobfile_search_path=tuple(Path(p) for p in self.bobfile_search_path),
+            palette=self.palette.freeze(),
+            font_size=self.font_size,
+            default_widget_width=self.default_widget_width,
+            default_widget_height=self.default_widget_height,
+            max_screen_height=self.max_screen_height,
+            widget_offset=self.widget_offset,
+            title_bar_heights=MappingProxyType(
+                {TitleBarFormat(k): v for k, v in self.title_bar_heights.items()}
+            ),
+            label_alignment=HorizontalAlignment(self.label_alignment),
+            widget_widths=MappingProxyType(dict(self.widget_widths)),
+            background_color=tuple(self.background_color),  # type: ignore
+            title_bar_color=tuple(self.title_bar_color),  # type: ignore
+            use_parse_cache=self.use_parse_cache,
+            parse_cache_dir=Path(self.parse_cache_dir)
+            if self.parse_cache_dir
+            else None,
+            fast_scan=self.fast_scan,
+            ignore_globs=tuple(self.ignore_globs),
+            max_scan_depth=self.max_scan_depth,
+            scan_workers=self.scan_workers,
+            use_widget_classes=self.use_widget_classes,
+            include_records=tuple(copy.deepcopy(self.include_records)),
+            exclude_records=tuple(copy.deepcopy(self.exclude_records)),
+            output_formats=tuple(self.output_formats),
+            title_bar_height=self.title_bar_height,
+            widget_start_position=self.widget_start_position,
+            column_pitch=self.column_pitch,
+            row_pitch=self.row_pitch,
+            record_filter=compile_record_filter(
+                self.include_records, self.exclude_records
+            ),
         )
 
     def to_yaml(self, file_path: Path) -> None:
@@ -169,6 +303,7 @@ class EPICSDB2BOBConfig:
             "bobfile_search_path": [str(p) for p in self.bobfile_search_path],
             "palette": next(
                 (name for name, pal in BUILTIN_PALETTES.items() if pal == self.palette),
+                "default",
             ),
             "rtyp_to_widget_map": {
                 key: value.__name__ for key, value in self.rtyp_to_widget_map.items()
@@ -184,6 +319,18 @@ class EPICSDB2BOBConfig:
             "widget_widths": {
                 key.__name__: value for key, value in self.widget_widths.items()
             },
+            "use_parse_cache": self.use_parse_cache,
+            "parse_cache_dir": str(self.parse_cache_dir)
+            if self.parse_cache_dir
+            else None,
+            "fast_scan": self.fast_scan,
+            "ignore_globs": self.ignore_globs,
+            "max_scan_depth": self.max_scan_depth,
+            "scan_workers": self.scan_workers,
+            "use_widget_classes": self.use_widget_classes,
+            "include_records": [rule.to_dict() for rule in self.include_records],
+            "exclude_records": [rule.to_dict() for rule in self.exclude_records],
+            "output_formats": list(self.output_formats),
         }
         with open(file_path, "w") as f:
             yaml.dump(data, f, sort_keys=False)
@@ -203,4 +350,143 @@ class EPICSDB2BOBConfig:
             f"widget_offset={self.widget_offset}, "
             f"title_bar_heights={self.title_bar_heights}, "
             f"widget_widths={self.widget_widths}, "
+            f"use_parse_cache={self.use_parse_cache}, "
+            f"parse_cache_dir={self.parse_cache_dir}, "
+            f"fast_scan={self.fast_scan}, "
+            f"ignore_globs={self.ignore_globs}, "
+            f"max_scan_depth={self.max_scan_depth}, "
+            f"scan_workers={self.scan_workers}, "
+            f"use_widget_classes={self.use_widget_classes}, "
+            f"include_records={self.include_records}, "
+            f"exclude_records={self.exclude_records}, "
+            f"output_formats={self.output_formats}, "
+        )
+
+
+# Settings that only change how inputs are found, parsed and cached, or what is
+# logged, never the screens generated from them
+_NON_SCREEN_SETTINGS = (
+    "debug",
+    "use_parse_cache",
+    "parse_cache_dir",
+    "fast_scan",
+    "ignore_globs",
+    "max_scan_depth",
+    "scan_workers",
+)
+
+
+def _canonical(value: Any) -> Any:
+    # Plain, order independent form of a setting, for fingerprinting
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, type):
+        return value.__name__
+    if isinstance(value, Path):
+        return str(value)
+    if isinstance(value, RecordRule):
+        return _canonical(value.to_dict())
+    if isinstance(value, FrozenPalette):
+        return _canonical(
+            {
+                config_field.name: getattr(value, config_field.name)
+                for config_field in fields(value)
+            }
+        )
+    if isinstance(value, Mapping):
+        return sorted(
+            ((_canonical(k), _canonical(v)) for k, v in value.items()),
+            key=lambda item: repr(item[0]),
         )
+    if isinstance(value, list | tuple):
+        return [_canonical(item) for item in value]
+    return value
+
+
+@dataclass(frozen=True, eq=False)
+class ConfigSnapshot:
+    """
+    Immutable, fully resolved copy of a config, safe to share between threads.
+    Snapshots compare and hash by their fingerprint, so can be used as cache keys.
+    """
+
+    debug: bool
+    embed: EmbedLevel
+    macro_set_level: MacroSetLevel
+    title_bar_format: TitleBarFormat
+    rtyp_to_widget_map: Mapping[str, type[Widget]]
+    readback_suffix: str
+    bobfile_search_path: tuple[Path, ...]
+    palette: FrozenPalette
+    font_size: int
+    default_widget_width: int
+    default_widget_height: int
+    max_screen_height: int
+    widget_offset: int
+    title_bar_heights: Mapping[TitleBarFormat, int]
+    label_alignment: HorizontalAlignment
+    widget_widths: Mapping[type[Widget], int]
+    background_color: Color
+    title_bar_color: Color
+    use_parse_cache: bool
+    parse_cache_dir: Path | None
+    fast_scan: bool
+    ignore_globs: tuple[str, ...]
+    max_scan_depth: int | None
+    scan_workers: int
+    use_widget_classes: bool
+    include_records: tuple[RecordRule, ...]
+    exclude_records: tuple[RecordRule, ...]
+    output_formats: tuple[str, ...]
+    # Precomputed from the settings above
+    title_bar_height: int
+    widget_start_position: tuple[int, int]
+    column_pitch: int
+    row_pitch: int
+    record_filter: RecordFilter
+
+    def _hash_settings(self, exclude: tuple[str, ...] = ()) -> str:
+        settings = {
+            name: _canonical(getattr(self, name))
+            for name in (
+                config_field.name for config_field in fields(EPICSDB2BOBConfig)
+            )
+            if name not in exclude
+        }
+        return hashlib.sha256(repr(sorted(settings.items())).encode()).hexdigest()
+
+    @cached_property
+    def fingerprint(self) -> str:
+        """
+        Stable hash of every setting, the same across runs and processes.
+        """
+        return self._hash_settings()
+
+    @cached_property
+    def screen_fingerprint(self) -> str:
+        """
+        Stable hash of the settings that can change a screen, leaving out those
+        for finding, parsing and caching inputs and for logging, so that runs on
+        different machines agree.
+        """
+        return self._hash_settings(_NON_SCREEN_SETTINGS)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ConfigSnapshot):
+            return NotImplemented
+        return self.fingerprint == other.fingerprint
+
+    def __hash__(self) -> int:
+        return hash(self.fingerprint)
+
+
+AnyConfig = EPICSDB2BOBConfig | ConfigSnapshot
+
+
+def resolve_config(config: AnyConfig) -> ConfigSnapshot:
+    """
+    Get a snapshot of a config, or the snapshot itself if already resolved.
+    """
+    if isinstance(config, ConfigSnapshot):
+        return config
+    return config.snapshot()
@@ -0,0 +1,93 @@
+import logging
+import os
+from collections.abc import Iterable
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from epicsdbtools import Database
+
+logger = logging.getLogger("epicsdb2bob")
+
+
+def escape_make_path(path: str | Path) -> str:
+    """
+    Escape a path for use as a target or prerequisite in a makefile.
+    """
+    return str(path).replace("\\", "\\\\").replace(" ", "\\ ").replace("$", "$$")
+
+
+def format_depfile(target: str | Path, dependencies: Iterable[str | Path]) -> str:
+    """
+    Format a gcc-style dependency file. Each dependency also gets an empty rule,
+    as with gcc -MP, so make does not fail when a dependency is deleted.
+    """
+    dependencies = list(dict.fromkeys(escape_make_path(dep) for dep in dependencies))
+    lines = [f"{escape_make_path(target)}:"]
+    for dependency in dependencies:
+        lines[-1] += " \\"
+        lines.append(f"  {dependency}")
+    for dependency in dependencies:
+        lines.extend(["", f"{dependency}:"])
+    return "\n".join(lines) + "\n"
+
+
+def write_depfile(
+    depfile_path: str | Path, target: str | Path, dependencies: Iterable[str | Path]
+) -> None:
+    with open(depfile_path, "w") as fp:
+        fp.write(format_depfile(target, dependencies))
+    logger.debug(f"Wrote dependency file {depfile_path}")
+
+
+def resolve_include(
+    include: str, including_file: Path, include_dirs: Iterable[Path]
+) -> Path | None:
+    """
+    Find an included template next to the including file or in the include dirs,
+    in the same order that msi and the IOC searches them.
+    """
+    for directory in [including_file.parent, *include_dirs]:
+        candidate = directory / include
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+def find_included_templates(
+    database_file: Path, database: "Database", include_dirs: Iterable[Path]
+) -> list[Path]:
+    """
+    Get all templates included by a database, directly or through other includes.
+    Nested includes are parsed to find their own includes. Those that fail to parse
+    are still listed, so that fixing them triggers a rebuild.
+    """
+    from epicsdbtools import LoadIncludesStrategy, load_database_file
+
+    include_dirs = list(include_dirs)
+    found: dict[Path, None] = {}
+    pending = [(database_file, database)]
+    while pending:
+        current, current_database = pending.pop()
+        for include in current_database.get_included_templates():
+            included = resolve_include(include, current, include_dirs)
+            if included is None:
+                logger.warning(f"Could not find {include} included by {current}")
+            elif included not in found and included != database_file:
+                found[included] = None
+                try:
+                    included_database = load_database_file(
+                        included, load_includes_strategy=LoadIncludesStrategy.IGNORE
+                    )
+                except Exception as e:
+                    logger.warning(
+                        f"Failed to parse {included} included by {current}, its "
+                        f"own includes are not listed: {e!r}"
+                    )
+                    continue
+                pending.append((included, included_database))
+    return list(found)
+
+
+def get_default_depfile_path(output_file: str | Path) -> str:
+    return os.path.splitext(output_file)[0] + ".d"
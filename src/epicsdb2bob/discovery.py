@@ -0,0 +1,162 @@
+import logging
+import os
+from collections.abc import Iterable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from enum import Enum
+from fnmatch import fnmatchcase
+from pathlib import Path
+
+logger = logging.getLogger("epicsdb2bob")
+
+# Build products and VCS metadata never contain inputs worth generating from
+DEFAULT_IGNORE_GLOBS: list[str] = ["O.*", ".git", ".svn", ".hg", "__pycache__"]
+
+
+class InputKind(str, Enum):
+    """Kinds of files picked up while scanning the input tree."""
+
+    DATABASE = "database"
+    SUBSTITUTION = "substitution"
+    SCREEN = "screen"
+
+
+SUFFIX_TO_INPUT_KIND: dict[str, InputKind] = {
+    ".db": InputKind.DATABASE,
+    ".template": InputKind.DATABASE,
+    ".substitutions": InputKind.SUBSTITUTION,
+    ".bob": InputKind.SCREEN,
+    ".opi": InputKind.SCREEN,
+}
+
+
+@dataclass
+class DiscoveredFiles:
+    databases: list[Path] = field(default_factory=list)
+    substitutions: list[Path] = field(default_factory=list)
+    screens: list[Path] = field(default_factory=list)
+
+    def add(self, kind: InputKind, path: Path) -> None:
+        if kind == InputKind.DATABASE:
+            self.databases.append(path)
+        elif kind == InputKind.SUBSTITUTION:
+            self.substitutions.append(path)
+        elif kind == InputKind.SCREEN:
+            self.screens.append(path)
+
+    def sort(self) -> None:
+        self.databases.sort()
+        self.substitutions.sort()
+        self.screens.sort()
+
+
+def classify_file(file_name: str) -> InputKind | None:
+    return SUFFIX_TO_INPUT_KIND.get(os.path.splitext(file_name)[1])
+
+
+def is_ignored(name: str, ignore_globs: Iterable[str]) -> bool:
+    return any(fnmatchcase(name, pattern) for pattern in ignore_globs)
+
+
+def _scan_directory(
+    directory: Path,
+    kinds: frozenset[InputKind],
+    ignore_globs: list[str],
+) -> tuple[list[tuple[InputKind, Path]], list[Path]]:
+    found: list[tuple[InputKind, Path]] = []
+    subdirectories: list[Path] = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if is_ignored(entry.name, ignore_globs):
+                    continue
+                # Like os.walk, don't descend into symlinked directories
+                if entry.is_dir(follow_symlinks=False):
+                    subdirectories.append(Path(entry.path))
+                elif (kind := classify_file(entry.name)) in kinds and entry.is_file():
+                    found.append((kind, Path(entry.path)))  # type: ignore
+    except OSError as e:
+        logger.warning(f"Failed to scan directory {directory}: {e}")
+
+    return found, subdirectories
+
+
+def discover_files(
+    roots: dict[Path, frozenset[InputKind]],
+    ignore_globs: list[str] | None = None,
+    max_depth: int | None = None,
+    max_workers: int = 8,
+) -> DiscoveredFiles:
+    """
+    Find all inputs under the given roots in a single pass.
+
+    Each root maps to the kinds of files that should be collected beneath it.
+    Directories are scanned concurrently, which hides the per-directory latency of
+    network filesystems. Files directly inside a root are at depth 0.
+    """
+    ignore_globs = DEFAULT_IGNORE_GLOBS if ignore_globs is None else ignore_globs
+    discovered = DiscoveredFiles()
+
+    # Merge roots that point at the same directory so it is only scanned once
+    merged_roots: dict[Path, frozenset[InputKind]] = {}
+    for root, kinds in roots.items():
+        normalized = Path(os.path.normpath(root))
+        merged_roots[normalized] = merged_roots.get(normalized, frozenset()) | kinds
+
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+        pending: dict[Future, tuple[frozenset[InputKind], int]] = {}
+
+        def submit(directory: Path, kinds: frozenset[InputKind], depth: int) -> None:
+            future = executor.submit(_scan_directory, directory, kinds, ignore_globs)
+            pending[future] = (kinds, depth)
+
+        for root, kinds in merged_roots.items():
+            if root.is_file():
+                kind = classify_file(root.name)
+                if kind in kinds:
+                    discovered.add(kind, root)  # type: ignore
+            elif root.is_dir():
+                submit(root, kinds, 0)
+            else:
+                logger.warning(f"Search path {root} does not exist, skipping.")
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                kinds, depth = pending.pop(future)
+                found, subdirectories = future.result()
+                for kind, path in found:
+                    discovered.add(kind, path)
+                if max_depth is None or depth < max_depth:
+                    for subdirectory in subdirectories:
+                        submit(subdirectory, kinds, depth + 1)
+
+    discovered.sort()
+    logger.info(
+        f"Found {len(discovered.databases)} databases, "
+        f"{len(discovered.substitutions)} substitution files and "
+        f"{len(discovered.screens)} screens."
+    )
+    return discovered
+
+
+def discover_inputs(
+    input_path: str | Path,
+    bobfile_search_path: Iterable[str | Path] = (),
+    ignore_globs: list[str] | None = None,
+    max_depth: int | None = None,
+    max_workers: int = 8,
+) -> DiscoveredFiles:
+    """
+    Find databases and substitution files under the input path, along with
+    existing screens under the bobfile search paths.
+    """
+    roots: dict[Path, frozenset[InputKind]] = {
+        Path(input_path): frozenset({InputKind.DATABASE, InputKind.SUBSTITUTION})
+    }
+    for search_path in bobfile_search_path:
+        roots[Path(search_path)] = roots.get(
+            Path(search_path), frozenset()
+        ) | frozenset({InputKind.SCREEN})
+
+    return discover_files(roots, ignore_globs, max_depth, max_workers)
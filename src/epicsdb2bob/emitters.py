@@ -0,0 +1,722 @@
+import io
+import json
+import logging
+import os
+import re
+from collections.abc import Callable, Iterable
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import TypeVar
+from xml.dom import minidom
+from xml.etree import ElementTree as ET
+
+from phoebusgen import widget as pw
+from phoebusgen.screen import Screen
+from phoebusgen.widget.properties import (
+    _Actions as HasActions,
+)
+from phoebusgen.widget.properties import (
+    _AutoSize as HasAutoSize,
+)
+from phoebusgen.widget.properties import (
+    _BackgroundColor as HasBackgroundColor,
+)
+from phoebusgen.widget.properties import (
+    _Border as HasBorder,
+)
+from phoebusgen.widget.properties import (
+    _Font as HasFontSize,
+)
+from phoebusgen.widget.properties import (
+    _ForegroundColor as HasForegroundColor,
+)
+from phoebusgen.widget.properties import (
+    _HorizontalAlignment as HasHorizontalAlignment,
+)
+from phoebusgen.widget.properties import (
+    _LineColor as HasLineColor,
+)
+from phoebusgen.widget.properties import (
+    _LineWidth as HasLineWidth,
+)
+from phoebusgen.widget.properties import (
+    _Macro as HasMacros,
+)
+from phoebusgen.widget.properties import (
+    _Transparent as HasTransparent,
+)
+from phoebusgen.widget.properties import (
+    _VerticalAlignment as HasVerticalAlignment,
+)
+from phoebusgen.widget.widget import _Widget as Widget
+
+from .config import HorizontalAlignment, VerticalAlignment
+from .layout import ScreenLayout, WidgetSpec
+from .palettes import Color
+
+logger = logging.getLogger("epicsdb2bob")
+
+ScreenWriter = Callable[[ScreenLayout, str], None]
+ScreenSerializer = Callable[[ScreenLayout], bytes]
+
+DISPLAY_FILE_SUFFIXES = (".bob", ".opi", ".ui")
+
+
+def align_widget_horizontally(
+    widget: HasHorizontalAlignment, alignment: HorizontalAlignment
+) -> None:
+    if alignment == HorizontalAlignment.LEFT:
+        widget.horizontal_alignment_left()
+    elif alignment == HorizontalAlignment.CENTER:
+        widget.horizontal_alignment_center()
+    elif alignment == HorizontalAlignment.RIGHT:
+        widget.horizontal_alignment_right()
+
+
+def retarget_display_file(file: str, suffix: str) -> str:
+    """
+    Point a reference to a generated display at its variant in another format.
+    """
+    stem, extension = os.path.splitext(file)
+    return stem + suffix if extension in DISPLAY_FILE_SUFFIXES else file
+
+
+WidgetFactory = Callable[[WidgetSpec], Widget]
+Property = TypeVar("Property")
+AnyWidget = TypeVar("AnyWidget", bound=Widget)
+
+
+def _pv_widget(
+    widget_type: Callable[[str, str, int, int, int, int], Widget],
+) -> WidgetFactory:
+    def create(spec: WidgetSpec) -> Widget:
+        return widget_type(
+            spec.name, spec.pv_name or "", spec.x, spec.y, spec.width, spec.height
+        )
+
+    return create
+
+
+def _labelled_pv_widget(
+    widget_type: Callable[[str, str, str, int, int, int, int], Widget],
+) -> WidgetFactory:
+    def create(spec: WidgetSpec) -> Widget:
+        return widget_type(
+            spec.name,
+            spec.text or "",
+            spec.pv_name or "",
+            spec.x,
+            spec.y,
+            spec.width,
+            spec.height,
+        )
+
+    return create
+
+
+def _text_widget(
+    widget_type: Callable[[str, str, int, int, int, int], Widget],
+) -> WidgetFactory:
+    def create(spec: WidgetSpec) -> Widget:
+        return widget_type(
+            spec.name, spec.text or "", spec.x, spec.y, spec.width, spec.height
+        )
+
+    return create
+
+
+def _file_widget(
+    widget_type: Callable[[str, str, int, int, int, int], Widget],
+) -> WidgetFactory:
+    def create(spec: WidgetSpec) -> Widget:
+        return widget_type(
+            spec.name, spec.file or "", spec.x, spec.y, spec.width, spec.height
+        )
+
+    return create
+
+
+def _shape_widget(
+    widget_type: Callable[[str, int, int, int, int], Widget],
+) -> WidgetFactory:
+    def create(spec: WidgetSpec) -> Widget:
+        return widget_type(spec.name, spec.x, spec.y, spec.width, spec.height)
+
+    return create
+
+
+# How to create the phoebusgen widget of each kind of widget spec, from the
+# properties its constructor takes
+BOB_WIDGET_FACTORIES: dict[str, WidgetFactory] = {
+    "ActionButton": _labelled_pv_widget(pw.ActionButton),
+    "Array": _pv_widget(pw.Array),
+    "BooleanButton": _pv_widget(pw.BooleanButton),
+    "ByteMonitor": _pv_widget(pw.ByteMonitor),
+    "CheckBox": _labelled_pv_widget(pw.CheckBox),
+    "ChoiceButton": _pv_widget(pw.ChoiceButton),
+    "ComboBox": _pv_widget(pw.ComboBox),
+    "EmbeddedDisplay": _file_widget(pw.EmbeddedDisplay),
+    "Ellipse": _shape_widget(pw.Ellipse),
+    "FileSelector": _pv_widget(pw.FileSelector),
+    "Group": _shape_widget(pw.Group),
+    "Image": _pv_widget(pw.Image),
+    "Label": _text_widget(pw.Label),
+    "LED": _pv_widget(pw.LED),
+    "LEDMultiState": _pv_widget(pw.LEDMultiState),
+    "Meter": _pv_widget(pw.Meter),
+    "Picture": _file_widget(pw.Picture),
+    "Polyline": _shape_widget(pw.Polyline),
+    "ProgressBar": _pv_widget(pw.ProgressBar),
+    "RadioButton": _pv_widget(pw.RadioButton),
+    "Rectangle": _shape_widget(pw.Rectangle),
+    "ScaledSlider": _pv_widget(pw.ScaledSlider),
+    "Scrollbar": _pv_widget(pw.Scrollbar),
+    "SlideButton": _labelled_pv_widget(pw.SlideButton),
+    "Spinner": _pv_widget(pw.Spinner),
+    "Symbol": _pv_widget(pw.Symbol),
+    "Table": _pv_widget(pw.Table),
+    "Tank": _pv_widget(pw.Tank),
+    "TextEntry": _pv_widget(pw.TextEntry),
+    "TextSymbol": _pv_widget(pw.TextSymbol),
+    "TextUpdate": _pv_widget(pw.TextUpdate),
+    "Thermometer": _pv_widget(pw.Thermometer),
+}
+
+
+def to_bob_widget_of(spec: WidgetSpec, widget_type: type[AnyWidget]) -> AnyWidget:
+    """
+    Create the phoebusgen widget for a widget spec known to be of a widget type.
+    """
+    widget = to_bob_widget(spec)
+    if not isinstance(widget, widget_type):
+        raise ValueError(f"{spec.kind} is not a {widget_type.__name__} widget")
+    return widget
+
+
+def _with_property(
+    widget: Widget, property_type: type[Property], spec: WidgetSpec, name: str
+) -> Property:
+    """
+    Get a widget as one with a property set by its spec, which its kind must have.
+    """
+    if not isinstance(widget, property_type):
+        raise ValueError(f"{spec.kind} widgets have no {name} property")
+    return widget
+
+
+def to_bob_widget(spec: WidgetSpec) -> Widget:
+    """
+    Create the phoebusgen widget for a widget spec.
+    """
+    try:
+        create = BOB_WIDGET_FACTORIES[spec.kind]
+    except KeyError:
+        raise ValueError(f"Unsupported widget type {spec.kind}") from None
+    widget = create(spec)
+
+    # Styles are left to the widget class when there is one
+    if spec.widget_class is not None:
+        ET.SubElement(widget.root, "class").text = spec.widget_class
+    else:
+        if spec.foreground_color is not None and isinstance(widget, HasForegroundColor):
+            widget.foreground_color(*spec.foreground_color)
+        if spec.background_color is not None and isinstance(widget, HasBackgroundColor):
+            widget.background_color(*spec.background_color)
+        if spec.font_size is not None and isinstance(widget, HasFontSize):
+            widget.font_size(spec.font_size)
+        if spec.horizontal_alignment is not None and isinstance(
+            widget, HasHorizontalAlignment
+        ):
+            align_widget_horizontally(widget, spec.horizontal_alignment)
+
+    if spec.vertical_alignment is not None:
+        aligned = _with_property(
+            widget, HasVerticalAlignment, spec, "vertical alignment"
+        )
+        getattr(aligned, f"vertical_alignment_{spec.vertical_alignment.value}")()
+    if spec.auto_size:
+        _with_property(widget, HasAutoSize, spec, "auto size").auto_size()
+    if spec.border_width is not None:
+        _with_property(widget, HasBorder, spec, "border").border_width(
+            spec.border_width
+        )
+    if spec.border_color is not None:
+        _with_property(widget, HasBorder, spec, "border").border_color(
+            *spec.border_color
+        )
+    if spec.transparent is not None:
+        _with_property(widget, HasTransparent, spec, "transparent").transparent(
+            spec.transparent
+        )
+    if spec.line_width is not None:
+        _with_property(widget, HasLineWidth, spec, "line width").line_width(
+            spec.line_width
+        )
+    if spec.line_color is not None:
+        _with_property(widget, HasLineColor, spec, "line color").line_color(
+            *spec.line_color
+        )
+    if spec.macros:
+        with_macros = _with_property(widget, HasMacros, spec, "macros")
+        for macro_name, macro_value in spec.macros.items():
+            with_macros.macro(macro_name, macro_value)
+    if spec.actions:
+        with_actions = _with_property(widget, HasActions, spec, "actions")
+        for action in spec.actions:
+            with_actions.action_open_display(
+                action.file, action.target, action.description, action.macros
+            )
+    return widget
+
+
+def _build_bob_screen(layout: ScreenLayout, widgets: Iterable[ET.Element]) -> Screen:
+    screen = Screen(layout.name)
+    if layout.background_color is not None:
+        screen.background_color(*layout.background_color)
+    for widget in widgets:
+        screen.root.append(widget)
+    screen.height(layout.height)
+    screen.width(layout.width)
+    for macro_name, macro_value in layout.macros.items():
+        screen.macro(macro_name, macro_value)
+    return screen
+
+
+def to_bob_screen(layout: ScreenLayout) -> Screen:
+    return _build_bob_screen(
+        layout, (to_bob_widget(spec).root for spec in layout.widgets)
+    )
+
+
+def xml_to_bytes(root: ET.Element) -> bytes:
+    """
+    Serialize a screen's XML exactly as Screen.write_screen writes it. The tree
+    must not hold whitespace between elements.
+    """
+    buffer = io.StringIO()
+    minidom.parseString(ET.tostring(root, "utf-8")).writexml(
+        buffer, indent="  ", addindent="  ", newl="\n", encoding="UTF-8"
+    )
+    return buffer.getvalue().encode()
+
+
+def screen_to_bytes(screen: Screen) -> bytes:
+    """
+    Serialize a phoebusgen screen exactly as Screen.write_screen writes it.
+    """
+    return xml_to_bytes(screen.root)
+
+
+def serialize_bob(layout: ScreenLayout) -> bytes:
+    return screen_to_bytes(to_bob_screen(layout))
+
+
+# Stands in for the widgets of a screen serialized in chunks
+_CHUNK_TAG = "epicsdb2bob_widgets"
+
+
+def serialize_bob_widgets(specs: list[WidgetSpec]) -> bytes:
+    """
+    Serialize widgets exactly as they appear in a serialized .bob screen.
+    """
+    wrapper = ET.Element(_CHUNK_TAG)
+    for spec in specs:
+        wrapper.append(to_bob_widget(spec).root)
+    text = xml_to_bytes(wrapper)
+    # Only the lines between the wrapper's opening and closing tags
+    start = text.index(b"\n", text.index(f"<{_CHUNK_TAG}>".encode())) + 1
+    end = text.rindex(b"\n", 0, text.rindex(b"</")) + 1
+    return text[start:end]
+
+
+def serialize_bob_chunked(
+    layout: ScreenLayout, executor: Executor, chunk_size: int
+) -> bytes:
+    """
+    Serialize a screen the same as serialize_bob, with its widgets serialized in
+    chunks of chunk_size on an executor, such as a pool of processes, and joined
+    in order.
+    """
+    chunks = [
+        layout.widgets[i : i + chunk_size]
+        for i in range(0, len(layout.widgets), chunk_size)
+    ]
+    fragments = executor.map(serialize_bob_widgets, chunks)
+    skeleton = xml_to_bytes(_build_bob_screen(layout, [ET.Element(_CHUNK_TAG)]).root)
+    marker = skeleton.index(f"<{_CHUNK_TAG}/>".encode())
+    start = skeleton.rindex(b"\n", 0, marker) + 1
+    end = skeleton.index(b"\n", marker) + 1
+    return skeleton[:start] + b"".join(fragments) + skeleton[end:]
+
+
+def write_bob(layout: ScreenLayout, file_path: str) -> None:
+    Path(file_path).write_bytes(serialize_bob(layout))
+
+
+# CS-Studio BOY widget type IDs
+OPI_WIDGET_TYPES = {
+    "Label": "org.csstudio.opibuilder.widgets.Label",
+    "TextUpdate": "org.csstudio.opibuilder.widgets.TextUpdate",
+    "TextEntry": "org.csstudio.opibuilder.widgets.TextInput",
+    "ComboBox": "org.csstudio.opibuilder.widgets.combo",
+    "ChoiceButton": "org.csstudio.opibuilder.widgets.choiceButton",
+    "LED": "org.csstudio.opibuilder.widgets.LED",
+    "Rectangle": "org.csstudio.opibuilder.widgets.Rectangle",
+    "ActionButton": "org.csstudio.opibuilder.widgets.ActionButton",
+    "EmbeddedDisplay": "org.csstudio.opibuilder.widgets.linkingContainer",
+}
+OPI_DISPLAY_MODES = {"replace": 0, "tab": 1, "window": 8}
+OPI_HORIZONTAL_ALIGNMENTS = {
+    HorizontalAlignment.LEFT: 0,
+    HorizontalAlignment.CENTER: 1,
+    HorizontalAlignment.RIGHT: 2,
+}
+OPI_VERTICAL_ALIGNMENTS = {
+    VerticalAlignment.TOP: 0,
+    VerticalAlignment.MIDDLE: 1,
+    VerticalAlignment.BOTTOM: 2,
+}
+
+
+def _add_text(parent: ET.Element, tag: str, value: object) -> ET.Element:
+    element = ET.SubElement(parent, tag)
+    element.text = str(value).lower() if isinstance(value, bool) else str(value)
+    return element
+
+
+def _add_opi_color(parent: ET.Element, tag: str, color: Color) -> None:
+    red, green, blue = color
+    ET.SubElement(
+        ET.SubElement(parent, tag),
+        "color",
+        red=str(red),
+        green=str(green),
+        blue=str(blue),
+    )
+
+
+def _add_opi_macros(parent: ET.Element, macros: dict[str, str]) -> None:
+    element = ET.SubElement(parent, "macros")
+    _add_text(element, "include_parent_macros", True)
+    for macro_name, macro_value in macros.items():
+        _add_text(element, macro_name, macro_value)
+
+
+def to_opi_widget(spec: WidgetSpec) -> ET.Element:
+    type_id = OPI_WIDGET_TYPES.get(spec.kind)
+    if type_id is None:
+        logger.debug(f"No BOY equivalent of {spec.kind}, using a text update")
+        type_id = OPI_WIDGET_TYPES["TextUpdate"]
+    widget = ET.Element("widget", typeId=type_id, version="1.0.0")
+    for tag, value in [
+        ("name", spec.name),
+        ("x", spec.x),
+        ("y", spec.y),
+        ("width", spec.width),
+        ("height", spec.height),
+    ]:
+        _add_text(widget, tag, value)
+    if spec.pv_name is not None:
+        _add_text(widget, "pv_name", spec.pv_name)
+    if spec.text is not None:
+        _add_text(widget, "text", spec.text)
+    if spec.file is not None:
+        _add_text(widget, "opi_file", retarget_display_file(spec.file, ".opi"))
+    if spec.macros:
+        _add_opi_macros(widget, spec.macros)
+    if spec.foreground_color is not None:
+        _add_opi_color(widget, "foreground_color", spec.foreground_color)
+    if spec.background_color is not None:
+        _add_opi_color(widget, "background_color", spec.background_color)
+    if spec.font_size is not None:
+        ET.SubElement(
+            ET.SubElement(widget, "font"),
+            "fontdata",
+            fontName="Liberation Sans",
+            height=str(spec.font_size),
+            style="0",
+        )
+    if spec.horizontal_alignment is not None:
+        _add_text(
+            widget,
+            "horizontal_alignment",
+            OPI_HORIZONTAL_ALIGNMENTS[spec.horizontal_alignment],
+        )
+    if spec.vertical_alignment is not None:
+        _add_text(
+            widget,
+            "vertical_alignment",
+            OPI_VERTICAL_ALIGNMENTS[spec.vertical_alignment],
+        )
+    if spec.auto_size:
+        _add_text(widget, "auto_size", True)
+    if spec.border_width is not None:
+        _add_text(widget, "border_width", spec.border_width)
+        _add_text(widget, "border_style", 1)  # Line
+    if spec.border_color is not None:
+        _add_opi_color(widget, "border_color", spec.border_color)
+    if spec.transparent is not None:
+        _add_text(widget, "transparent", spec.transparent)
+    if spec.line_width is not None:
+        _add_text(widget, "line_width", spec.line_width)
+    if spec.line_color is not None:
+        _add_opi_color(widget, "line_color", spec.line_color)
+    if spec.actions:
+        actions = ET.SubElement(widget, "actions", hook="false", hook_all="false")
+        for action in spec.actions:
+            element = ET.SubElement(actions, "action", type="OPEN_DISPLAY")
+            _add_text(element, "path", retarget_display_file(action.file, ".opi"))
+            _add_opi_macros(element, action.macros)
+            _add_text(element, "mode", OPI_DISPLAY_MODES[action.target])
+            _add_text(element, "description", action.description)
+    return widget
+
+
+def to_opi_display(layout: ScreenLayout) -> ET.Element:
+    display = ET.Element(
+        "display", typeId="org.csstudio.opibuilder.Display", version="1.0.0"
+    )
+    _add_text(display, "name", layout.name)
+    _add_text(display, "width", layout.width)
+    _add_text(display, "height", layout.height)
+    if layout.background_color is not None:
+        _add_opi_color(display, "background_color", layout.background_color)
+    _add_opi_macros(display, layout.macros)
+    for spec in layout.widgets:
+        display.append(to_opi_widget(spec))
+    return display
+
+
+def serialize_opi(layout: ScreenLayout) -> bytes:
+    display = to_opi_display(layout)
+    ET.indent(display)
+    return ET.tostring(display, encoding="UTF-8", xml_declaration=True)
+
+
+def write_opi(layout: ScreenLayout, file_path: str) -> None:
+    Path(file_path).write_bytes(serialize_opi(layout))
+
+
+# PyDM widget class, the Qt class it extends and its module, for Qt Designer files
+UI_WIDGET_TYPES: dict[str, tuple[str, str | None, str | None]] = {
+    "Label": ("QLabel", None, None),
+    "TextUpdate": ("PyDMLabel", "QLabel", "pydm.widgets.label"),
+    "TextEntry": ("PyDMLineEdit", "QLineEdit", "pydm.widgets.line_edit"),
+    "ComboBox": ("PyDMEnumComboBox", "QComboBox", "pydm.widgets.enum_combo_box"),
+    "ChoiceButton": ("PyDMEnumButton", "QWidget", "pydm.widgets.enum_button"),
+    "LED": ("PyDMByteIndicator", "QWidget", "pydm.widgets.byte"),
+    "Rectangle": ("PyDMDrawingRectangle", "QWidget", "pydm.widgets.drawing"),
+    "ActionButton": (
+        "PyDMRelatedDisplayButton",
+        "QPushButton",
+        "pydm.widgets.related_display_button",
+    ),
+    "EmbeddedDisplay": (
+        "PyDMEmbeddedDisplay",
+        "QFrame",
+        "pydm.widgets.embedded_display",
+    ),
+}
+UI_HORIZONTAL_ALIGNMENTS = {
+    HorizontalAlignment.LEFT: "Qt::AlignLeft",
+    HorizontalAlignment.CENTER: "Qt::AlignHCenter",
+    HorizontalAlignment.RIGHT: "Qt::AlignRight",
+}
+UI_VERTICAL_ALIGNMENTS = {
+    VerticalAlignment.TOP: "Qt::AlignTop",
+    VerticalAlignment.MIDDLE: "Qt::AlignVCenter",
+    VerticalAlignment.BOTTOM: "Qt::AlignBottom",
+}
+_MACRO_RE = re.compile(r"\$\(([^)]+)\)")
+
+
+def to_pydm_macros(value: str) -> str:
+    """
+    Convert $(NAME) macro references to the ${NAME} form PyDM substitutes.
+    """
+    return _MACRO_RE.sub(r"${\1}", value)
+
+
+def _add_ui_property(
+    parent: ET.Element, name: str, value_type: str, value: object, stdset: bool = True
+) -> ET.Element:
+    element = ET.SubElement(parent, "property", name=name)
+    if not stdset:
+        element.set("stdset", "0")
+    return _add_text(element, value_type, value)
+
+
+def _add_ui_string_list(parent: ET.Element, name: str, values: list[str]) -> None:
+    element = ET.SubElement(parent, "property", name=name, stdset="0")
+    string_list = ET.SubElement(element, "stringlist")
+    for value in values:
+        _add_text(string_list, "string", value)
+
+
+def _add_ui_geometry(parent: ET.Element, x: int, y: int, width: int, height: int):
+    rect = ET.SubElement(ET.SubElement(parent, "property", name="geometry"), "rect")
+    for tag, value in [("x", x), ("y", y), ("width", width), ("height", height)]:
+        _add_text(rect, tag, value)
+
+
+def _get_ui_style_sheet(spec: WidgetSpec) -> str:
+    styles = []
+    if spec.foreground_color is not None:
+        styles.append(f"color: rgb{spec.foreground_color};")
+    if spec.transparent:
+        styles.append("background-color: transparent;")
+    elif spec.background_color is not None:
+        styles.append(f"background-color: rgb{spec.background_color};")
+    if spec.border_width is not None:
+        border_color = spec.border_color or (0, 0, 0)
+        styles.append(f"border: {spec.border_width}px solid rgb{border_color};")
+    return " ".join(styles)
+
+
+def to_ui_widget(spec: WidgetSpec) -> ET.Element:
+    widget_class = UI_WIDGET_TYPES.get(spec.kind, UI_WIDGET_TYPES["TextUpdate"])[0]
+    # Qt object names must be valid identifiers
+    widget = ET.Element("widget", {"class": widget_class, "name": f"w_{spec.name}"})
+    _add_ui_geometry(widget, spec.x, spec.y, spec.width, spec.height)
+    if spec.pv_name is not None and spec.kind != "ActionButton":
+        _add_ui_property(
+            widget,
+            "channel",
+            "string",
+            f"ca://{to_pydm_macros(spec.pv_name)}",
+            stdset=False,
+        )
+    if spec.text is not None:
+        _add_ui_property(widget, "text", "string", to_pydm_macros(spec.text))
+    if spec.file is not None:
+        _add_ui_property(
+            widget,
+            "filename",
+            "string",
+            retarget_display_file(spec.file, ".ui"),
+            stdset=False,
+        )
+    if spec.macros:
+        _add_ui_property(
+            widget, "macros", "string", json.dumps(spec.macros), stdset=False
+        )
+    style_sheet = _get_ui_style_sheet(spec)
+    if style_sheet:
+        _add_ui_property(widget, "styleSheet", "string", style_sheet)
+    if spec.font_size is not None:
+        font = ET.SubElement(ET.SubElement(widget, "property", name="font"), "font")
+        _add_text(font, "pointsize", spec.font_size)
+    if spec.horizontal_alignment is not None or spec.vertical_alignment is not None:
+        alignment = [
+            UI_HORIZONTAL_ALIGNMENTS[
+                spec.horizontal_alignment or HorizontalAlignment.LEFT
+            ],
+            UI_VERTICAL_ALIGNMENTS[spec.vertical_alignment or VerticalAlignment.MIDDLE],
+        ]
+        _add_ui_property(widget, "alignment", "set", "|".join(alignment))
+    if spec.line_width is not None:
+        _add_ui_property(widget, "penWidth", "double", spec.line_width, stdset=False)
+    if spec.line_color is not None:
+        pen_color = ET.SubElement(
+            ET.SubElement(widget, "property", name="penColor", stdset="0"), "color"
+        )
+        for tag, value in zip(("red", "green", "blue"), spec.line_color, strict=True):
+            _add_text(pen_color, tag, value)
+    if spec.actions:
+        _add_ui_string_list(
+            widget,
+            "filenames",
+            [retarget_display_file(action.file, ".ui") for action in spec.actions],
+        )
+        _add_ui_string_list(
+            widget, "titles", [action.description for action in spec.actions]
+        )
+        _add_ui_string_list(
+            widget, "macros", [json.dumps(action.macros) for action in spec.actions]
+        )
+        _add_ui_property(
+            widget,
+            "openInNewWindow",
+            "bool",
+            all(action.target == "window" for action in spec.actions),
+            stdset=False,
+        )
+    return widget
+
+
+def to_ui_form(layout: ScreenLayout) -> ET.Element:
+    """
+    Build a Qt Designer form of PyDM widgets. PyDM has no screen level macro
+    defaults, so screen macros must be passed when the display is opened.
+    """
+    ui = ET.Element("ui", version="4.0")
+    _add_text(ui, "class", "Form")
+    form = ET.SubElement(ui, "widget", {"class": "QWidget", "name": "Form"})
+    _add_ui_geometry(form, 0, 0, layout.width, layout.height)
+    _add_ui_property(form, "windowTitle", "string", layout.name)
+    if layout.background_color is not None:
+        _add_ui_property(
+            form,
+            "styleSheet",
+            "string",
+            f"QWidget#Form {{ background-color: rgb{layout.background_color}; }}",
+        )
+
+    used_kinds = []
+    for spec in layout.widgets:
+        form.append(to_ui_widget(spec))
+        if spec.kind not in used_kinds:
+            used_kinds.append(spec.kind)
+
+    custom_widgets = ET.SubElement(ui, "customwidgets")
+    declared: set[str] = set()
+    for kind in used_kinds:
+        widget_class, extends, header = UI_WIDGET_TYPES.get(
+            kind, UI_WIDGET_TYPES["TextUpdate"]
+        )
+        if header is None or widget_class in declared:
+            continue
+        declared.add(widget_class)
+        custom_widget = ET.SubElement(custom_widgets, "customwidget")
+        _add_text(custom_widget, "class", widget_class)
+        _add_text(custom_widget, "extends", extends)
+        _add_text(custom_widget, "header", header)
+    return ui
+
+
+def serialize_ui(layout: ScreenLayout) -> bytes:
+    form = to_ui_form(layout)
+    ET.indent(form, space=" ")
+    return ET.tostring(form, encoding="UTF-8", xml_declaration=True)
+
+
+def write_ui(layout: ScreenLayout, file_path: str) -> None:
+    Path(file_path).write_bytes(serialize_ui(layout))
+
+
+# Display formats screens can be written in, keyed by file extension
+EMITTERS: dict[str, ScreenWriter] = {
+    "bob": write_bob,
+    "opi": write_opi,
+    "ui": write_ui,
+}
+SERIALIZERS: dict[str, ScreenSerializer] = {
+    "bob": serialize_bob,
+    "opi": serialize_opi,
+    "ui": serialize_ui,
+}
+
+
+def write_layout(
+    layout: ScreenLayout, base_path: str | Path, formats: Iterable[str]
+) -> list[str]:
+    """
+    Write a layout in each of the given formats, next to each other at the base
+    path with the format's extension. Returns the paths written.
+    """
+    written = []
+    for output_format in formats:
+        file_path = f"{base_path}.{output_format}"
+        EMITTERS[output_format](layout, file_path)
+        written.append(file_path)
+    return written
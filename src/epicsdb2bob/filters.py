@@ -0,0 +1,165 @@
+import logging
+import re
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from epicsdbtools import Database, Record
+
+logger = logging.getLogger("epicsdb2bob")
+
+RecordFilter = Callable[["Record"], bool]
+
+
+@dataclass
+class RecordRule:
+    """
+    Matches records meeting all of the criteria that are set. A rule with no
+    criteria matches every record.
+    """
+
+    name: str | None = None  # Regex searched for in the record name
+    rtyp: list[str] = field(default_factory=list)
+    # Field or info tag name to a regex the whole value must match, None for any value
+    fields: dict[str, str | None] = field(default_factory=dict)
+    infos: dict[str, str | None] = field(default_factory=dict)
+
+    @staticmethod
+    def from_dict(data: dict[str, Any]) -> "RecordRule":
+        def to_patterns(value: Any) -> dict[str, str | None]:
+            # A list of names only checks for their presence
+            if isinstance(value, dict):
+                return dict(value)
+            return dict.fromkeys(value)
+
+        rtyp = data.get("rtyp", [])
+        return RecordRule(
+            name=data.get("name"),
+            rtyp=[rtyp] if isinstance(rtyp, str) else list(rtyp),
+            fields=to_patterns(data.get("fields", {})),
+            infos=to_patterns(data.get("infos", {})),
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        data: dict[str, Any] = {}
+        if self.name is not None:
+            data["name"] = self.name
+        if self.rtyp:
+            data["rtyp"] = list(self.rtyp)
+        if self.fields:
+            data["fields"] = dict(self.fields)
+        if self.infos:
+            data["infos"] = dict(self.infos)
+        return data
+
+
+DEFAULT_EXCLUDE_RECORDS = [RecordRule(infos={"screen": "hide"})]
+
+
+def _select_all(record: "Record") -> bool:
+    return True
+
+
+def _compile_mapping_check(
+    attribute: str, patterns: dict[str, str | None]
+) -> RecordFilter:
+    compiled = [
+        (key, re.compile(pattern) if pattern is not None else None)
+        for key, pattern in patterns.items()
+    ]
+
+    def check(record: "Record") -> bool:
+        values = getattr(record, attribute, None) or {}
+        for key, pattern in compiled:
+            if key not in values:
+                return False
+            if pattern is not None and pattern.fullmatch(str(values[key])) is None:
+                return False
+        return True
+
+    return check
+
+
+def compile_rule(rule: RecordRule) -> RecordFilter:
+    """
+    Compile a rule into a predicate, checking the cheapest criteria first.
+    """
+    checks: list[RecordFilter] = []
+    if rule.rtyp:
+        rtyps = frozenset(rule.rtyp)
+        checks.append(lambda record: record.rtyp in rtyps)
+    if rule.fields:
+        checks.append(_compile_mapping_check("fields", rule.fields))
+    if rule.infos:
+        checks.append(_compile_mapping_check("infos", rule.infos))
+    if rule.name is not None:
+        name_regex = re.compile(rule.name)
+        checks.append(lambda record: name_regex.search(str(record.name)) is not None)
+
+    if not checks:
+        return _select_all
+    if len(checks) == 1:
+        return checks[0]
+    return lambda record: all(check(record) for check in checks)
+
+
+def _compile_rules(rules: list[RecordRule]) -> list[RecordFilter]:
+    # Rules matching only on name are folded into a single regex
+    name_only = [
+        rule.name
+        for rule in rules
+        if rule.name is not None and not (rule.rtyp or rule.fields or rule.infos)
+    ]
+    compiled = [
+        compile_rule(rule)
+        for rule in rules
+        if rule.name is None or rule.rtyp or rule.fields or rule.infos
+    ]
+    if name_only:
+        names_regex = re.compile("|".join(f"(?:{name})" for name in name_only))
+        compiled.insert(
+            0, lambda record: names_regex.search(str(record.name)) is not None
+        )
+    return compiled
+
+
+def compile_record_filter(
+    include: list[RecordRule], exclude: list[RecordRule]
+) -> RecordFilter:
+    """
+    Compile include and exclude rules into a single predicate. A record is
+    selected if it matches any include rule, or there are none, and matches no
+    exclude rule.
+    """
+    include_checks = _compile_rules(include)
+    exclude_checks = _compile_rules(exclude)
+    if not include_checks and not exclude_checks:
+        return _select_all
+
+    def record_filter(record: "Record") -> bool:
+        if include_checks and not any(check(record) for check in include_checks):
+            return False
+        return not any(check(record) for check in exclude_checks)
+
+    return record_filter
+
+
+def select_records(
+    database: "Database", record_filter: RecordFilter
+) -> dict[str, "Record"]:
+    """
+    Select the records of a database to generate widgets for, in one pass.
+    """
+    if record_filter is _select_all:
+        return dict(database)
+    selected = {
+        name: record for name, record in database.items() if record_filter(record)
+    }
+    if len(selected) < len(database):
+        logger.debug(f"Record rules excluded {len(database) - len(selected)} records")
+    return selected
+
+
+def rules_from_dicts(rules: Iterable[dict[str, Any]]) -> list[RecordRule]:
+    return [RecordRule.from_dict(rule) for rule in rules]
@@ -0,0 +1,120 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from .cache import hash_file_contents
+from .layout import ScreenLayout
+
+logger = logging.getLogger("epicsdb2bob")
+
+SCREEN_FINGERPRINTS_FILE_NAME = ".epicsdb2bob-screens.json"
+
+
+def layout_digest(layout: ScreenLayout) -> str:
+    """
+    Compute a digest of a layout that ignores generated widget names, so that
+    laying out an unchanged screen again yields the same value.
+    """
+    data = asdict(layout)
+    for widget in data["widgets"]:
+        del widget["name"]
+    return hashlib.sha256(repr(data).encode()).hexdigest()
+
+
+@dataclass
+class ScreenFingerprint:
+    """What a screen in an output directory was generated from."""
+
+    config: str  # ConfigSnapshot.screen_fingerprint of the settings used
+    layout: str | None = None  # See layout_digest, unknown for patched screens
+    file: str = ""  # Digest of the file as written, to detect later edits
+
+
+class ScreenFingerprints:
+    """
+    Fingerprints of the screens written to an output directory, kept in a file
+    alongside them, so that later runs can tell whether a screen would change
+    without serializing it again.
+    """
+
+    def __init__(self, directory: str | Path) -> None:
+        self.path = Path(directory) / SCREEN_FINGERPRINTS_FILE_NAME
+        self._entries = self._read()
+        # Screens written during this run
+        self._updated: dict[str, ScreenFingerprint] = {}
+
+    def _read(self) -> dict[str, ScreenFingerprint]:
+        try:
+            data = json.loads(self.path.read_text())
+            return {name: ScreenFingerprint(**entry) for name, entry in data.items()}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(
+                f"Discarding unreadable screen fingerprints {self.path}: {e}"
+            )
+            return {}
+
+    def get(self, file_name: str) -> ScreenFingerprint | None:
+        return self._entries.get(file_name)
+
+    def record(
+        self, file_name: str, config: str, layout: ScreenLayout | None = None
+    ) -> None:
+        """
+        Record the settings and layout a screen is being written with. The layout
+        is not known for screens fetched from an artifact cache or patched.
+        """
+        self._updated[file_name] = ScreenFingerprint(
+            config, layout_digest(layout) if layout is not None else None
+        )
+
+    def write(self) -> None:
+        """
+        Write the fingerprints of the screens recorded during this run, once they
+        are written, merged with those of other screens in the file.
+        """
+        if not self._updated:
+            return
+        entries = self._read()
+        for file_name, fingerprint in self._updated.items():
+            file_path = self.path.parent / file_name
+            if not file_path.exists():
+                entries.pop(file_name, None)
+            else:
+                fingerprint.file = hash_file_contents(file_path)
+                entries[file_name] = fingerprint
+        data = json.dumps(
+            {name: asdict(entry) for name, entry in entries.items()},
+            indent=2,
+            sort_keys=True,
+        )
+        try:
+            with tempfile.NamedTemporaryFile(
+                "w", dir=self.path.parent, prefix=f"{self.path.name}.", delete=False
+            ) as f:
+                f.write(data)
+            os.chmod(f.name, 0o644)
+            os.replace(f.name, self.path)
+        except OSError as e:
+            logger.warning(f"Failed to write screen fingerprints {self.path}: {e}")
+            return
+        self._entries = entries
+        self._updated = {}
+
+    def is_unchanged(self, layout: ScreenLayout, file_path: str | Path) -> bool:
+        """
+        Whether a screen on disk was written from this layout and not edited since.
+        """
+        recorded = self.get(os.path.basename(file_path))
+        return (
+            recorded is not None
+            and recorded.layout is not None
+            and recorded.layout == layout_digest(layout)
+            and os.path.exists(file_path)
+            and recorded.file == hash_file_contents(file_path)
+        )
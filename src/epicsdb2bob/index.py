@@ -0,0 +1,225 @@
+import logging
+import os
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from phoebusgen.widget import Label
+
+from .bobfile_gen import (
+    layout_title_bar,
+    short_uuid,
+    style_widget_spec,
+    template_to_bob,
+)
+from .config import AnyConfig, resolve_config
+from .layout import OpenDisplayAction, ScreenLayout, WidgetSpec
+
+logger = logging.getLogger("epicsdb2bob")
+
+INDEX_NAME = "index"
+
+
+@dataclass
+class IndexEntry:
+    """A generated screen listed in the index, under the directory of its input."""
+
+    directory: tuple[str, ...]
+    title: str
+    file: str
+    summary: str
+    # Instances of each template of a substitution, launched from their own index
+    # screen instead of being embedded all at once
+    templates: Mapping[str, Sequence[dict[str, str]]] | None = None
+    # Macros to open the screen with, if it is shared by several inputs
+    macros: dict[str, str] | None = None
+
+
+@dataclass
+class IndexNode:
+    directory: tuple[str, ...]
+    children: dict[str, "IndexNode"] = field(default_factory=dict)
+    entries: list[IndexEntry] = field(default_factory=list)
+
+    def count_screens(self) -> int:
+        return len(self.entries) + sum(
+            child.count_screens() for child in self.children.values()
+        )
+
+
+@dataclass
+class IndexRow:
+    """A launcher button and the summary shown next to it."""
+
+    text: str
+    actions: list[OpenDisplayAction]
+    summary: str
+
+
+def build_index_tree(entries: Sequence[IndexEntry]) -> IndexNode:
+    root = IndexNode(())
+    for entry in entries:
+        node = root
+        for depth, part in enumerate(entry.directory):
+            node = node.children.setdefault(
+                part, IndexNode(entry.directory[: depth + 1])
+            )
+        node.entries.append(entry)
+    return root
+
+
+def get_input_directory(file_path: Path, input_path: str | Path) -> tuple[str, ...]:
+    """
+    Directory of an input file relative to the searched input path.
+    """
+    try:
+        return file_path.parent.relative_to(input_path).parts
+    except ValueError:
+        return ()
+
+
+def get_index_name(directory: tuple[str, ...]) -> str:
+    """
+    Name of the index screen of an input directory. Underscores in directory names
+    are doubled, so that a/b and a_b get different index screens.
+    """
+    return "_".join((INDEX_NAME, *(part.replace("_", "__") for part in directory)))
+
+
+def get_substitution_index_name(entry: IndexEntry) -> str:
+    return f"{os.path.splitext(entry.file)[0]}_{INDEX_NAME}"
+
+
+def _open(file: str, description: str, macros: dict[str, str] | None = None):
+    return OpenDisplayAction(file, "tab", description, dict(macros or {}))
+
+
+def layout_index_screen(
+    title: str, rows: Sequence[IndexRow], config: AnyConfig
+) -> ScreenLayout:
+    """
+    Lay out a column of launcher buttons, each with a static summary label. Nothing
+    on an index screen connects to a PV, so it opens instantly.
+    """
+    config = resolve_config(config)
+    layout = ScreenLayout(title, background_color=config.background_color)
+    summary_width = 2 * config.default_widget_width
+    column_width = config.column_pitch + summary_width + config.widget_offset
+    start_x, start_y = config.widget_start_position
+    x, y = start_x, start_y
+    max_y = start_y
+    for row in rows:
+        if y + config.row_pitch > config.max_screen_height and y != start_y:
+            x, y = x + column_width, start_y
+        layout.widgets.append(
+            WidgetSpec(
+                "ActionButton",
+                short_uuid(),
+                x,
+                y,
+                config.default_widget_width,
+                config.default_widget_height,
+                text=row.text,
+                actions=row.actions,
+            )
+        )
+        summary = WidgetSpec(
+            "Label",
+            short_uuid(),
+            x + config.column_pitch,
+            y,
+            summary_width,
+            config.default_widget_height,
+            text=row.summary,
+            horizontal_alignment=config.label_alignment,
+        )
+        style_widget_spec(summary, Label, config)
+        layout.widgets.append(summary)
+        y += config.row_pitch
+        max_y = max(max_y, y)
+
+    layout.width = x + column_width
+    layout.height = max_y + config.widget_offset
+    title_bar = layout_title_bar(title, config, layout.width - config.widget_offset)
+    if title_bar:
+        layout.widgets.append(title_bar)
+    return layout
+
+
+def _layout_substitution_index(entry: IndexEntry, config: AnyConfig) -> ScreenLayout:
+    rows = [
+        IndexRow(
+            "All",
+            [_open(entry.file, entry.title)],
+            "Every instance, embedded where possible",
+        )
+    ]
+    for template, instances in (entry.templates or {}).items():
+        stem = os.path.splitext(os.path.basename(template))[0]
+        rows.append(
+            IndexRow(
+                stem,
+                [
+                    _open(template_to_bob(template), f"{stem} {i + 1}", instance)
+                    for i, instance in enumerate(instances)
+                ],
+                f"{len(instances)} instances",
+            )
+        )
+    return layout_index_screen(entry.title, rows, config)
+
+
+def layout_indexes(
+    entries: Sequence[IndexEntry], config: AnyConfig, title: str = "Index"
+) -> dict[str, ScreenLayout]:
+    """
+    Lay out index screens mirroring the directories of the inputs, keyed by file
+    name without extension. The top level index is named index, and each
+    substitution gets its own index launching the instances of its templates.
+    Raises ValueError if an index screen would replace another screen.
+    """
+    config = resolve_config(config)
+    layouts: dict[str, ScreenLayout] = {}
+    screen_names = {os.path.splitext(entry.file)[0]: entry.title for entry in entries}
+
+    def add_layout(name: str, layout: ScreenLayout) -> None:
+        if name in layouts:
+            raise ValueError(f"Index screen {name}.bob is generated more than once")
+        if name in screen_names:
+            raise ValueError(
+                f"Index screen {name}.bob would replace the screen of"
+                f" {screen_names[name]}"
+            )
+        layouts[name] = layout
+
+    def add_node(node: IndexNode, node_title: str) -> None:
+        rows = []
+        for name, child in sorted(node.children.items()):
+            child_index = get_index_name(child.directory)
+            rows.append(
+                IndexRow(
+                    name,
+                    [_open(f"{child_index}.bob", name)],
+                    f"{child.count_screens()} screens",
+                )
+            )
+            add_node(child, "/".join(child.directory))
+        for entry in sorted(node.entries, key=lambda entry: entry.title):
+            if entry.templates is not None:
+                substitution_index = get_substitution_index_name(entry)
+                add_layout(
+                    substitution_index, _layout_substitution_index(entry, config)
+                )
+                actions = [_open(f"{substitution_index}.bob", entry.title)]
+            else:
+                actions = [_open(entry.file, entry.title, entry.macros)]
+            rows.append(IndexRow(entry.title, actions, entry.summary))
+
+        add_layout(
+            get_index_name(node.directory),
+            layout_index_screen(node_title, rows, config),
+        )
+
+    add_node(build_index_tree(entries), title)
+    logger.info(f"Laid out {len(layouts)} index screens")
+    return layouts
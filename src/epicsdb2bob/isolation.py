@@ -0,0 +1,301 @@
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from multiprocessing.connection import Connection
+from pathlib import Path
+from queue import Queue
+from typing import Any
+
+from .cache import default_cache_dir, hash_file_contents
+from .discovery import InputKind
+
+logger = logging.getLogger("epicsdb2bob")
+
+QUARANTINE_FILE_NAME = "quarantine.json"
+
+
+@dataclass(frozen=True)
+class ParseLimits:
+    """Limits on parsing a single file in a worker process."""
+
+    timeout: float | None = None  # Seconds
+    max_memory: int | None = None  # Bytes of address space of the worker
+
+
+class ParseLimitExceeded(Exception):
+    """Parsing a file exceeded a limit or crashed its worker."""
+
+
+class ParseFailed(Exception):
+    """Parsing a file raised an error in its worker."""
+
+
+def _limit_memory(max_memory: int) -> None:
+    try:
+        import resource
+    except ImportError:  # Not available on Windows
+        return
+    resource.setrlimit(resource.RLIMIT_AS, (max_memory, max_memory))
+
+
+# Parses a file of a kind in a worker, must be importable by worker processes
+ParseFunction = Callable[[Path, InputKind, bool], Any]
+
+
+def parse_file(file_path: Path, kind: InputKind, fast_scan: bool) -> Any:
+    from .parser import load_epics_db
+    from .substitutions import read_substitution_file
+
+    if kind == InputKind.SUBSTITUTION:
+        return read_substitution_file(file_path)
+    return load_epics_db(file_path, fast_scan)
+
+
+def _worker_main(
+    connection: Connection,
+    limits: ParseLimits,
+    fast_scan: bool,
+    parse_function: ParseFunction,
+) -> None:
+    if limits.max_memory is not None:
+        _limit_memory(limits.max_memory)
+    connection.send(("ready", None))
+    while True:
+        request = connection.recv()
+        if request is None:
+            return
+        file_path, kind = request
+        try:
+            connection.send(("ok", parse_function(file_path, kind, fast_scan)))
+        except MemoryError:
+            connection.send(("memory", None))
+        except BaseException as e:
+            connection.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class _Worker:
+    """A worker process, replaced whenever it exceeds a limit."""
+
+    def __init__(
+        self, limits: ParseLimits, fast_scan: bool, parse_function: ParseFunction
+    ) -> None:
+        self.limits = limits
+        self.fast_scan = fast_scan
+        self.parse_function = parse_function
+        self._start()
+
+    def _start(self) -> None:
+        context = multiprocessing.get_context("spawn")
+        self._connection, child_connection = context.Pipe()
+        self._process = context.Process(
+            target=_worker_main,
+            args=(child_connection, self.limits, self.fast_scan, self.parse_function),
+            daemon=True,
+        )
+        self._process.start()
+        child_connection.close()
+        # Start up is not counted against the time limit of the first file
+        self._connection.recv()
+
+    def _restart(self) -> None:
+        self._process.kill()
+        self._process.join()
+        self._connection.close()
+        self._start()
+
+    def parse(self, file_path: Path, kind: InputKind) -> Any:
+        self._connection.send((file_path, kind))
+        if not self._connection.poll(self.limits.timeout):
+            self._restart()
+            raise ParseLimitExceeded(f"timed out after {self.limits.timeout}s")
+        try:
+            status, result = self._connection.recv()
+        except EOFError:
+            self._process.join()
+            exitcode = self._process.exitcode
+            self._restart()
+            raise ParseLimitExceeded(f"worker exited with code {exitcode}") from None
+        if status == "memory":
+            self._restart()
+            raise ParseLimitExceeded(
+                f"exceeded the memory limit of {self.limits.max_memory} bytes"
+            )
+        if status == "error":
+            raise ParseFailed(result)
+        return result
+
+    def close(self) -> None:
+        try:
+            self._connection.send(None)
+        except OSError:
+            pass
+        self._process.join(timeout=1)
+        if self._process.is_alive():
+            self._process.kill()
+            self._process.join()
+        self._connection.close()
+
+
+class IsolatedParser:
+    """
+    Parses files in worker processes, so that a file that takes too long, uses
+    too much memory or crashes the parser only costs its own worker, which is
+    killed and replaced. Workers are started on first use.
+    """
+
+    def __init__(
+        self,
+        limits: ParseLimits,
+        workers: int = 1,
+        fast_scan: bool = False,
+        parse_function: ParseFunction = parse_file,
+    ) -> None:
+        self.limits = limits
+        self.workers = max(workers, 1)
+        self.fast_scan = fast_scan
+        self.parse_function = parse_function
+        self._idle: Queue[_Worker] = Queue()
+        self._all: list[_Worker] = []
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> _Worker:
+        with self._lock:
+            if self._idle.empty() and len(self._all) < self.workers:
+                worker = _Worker(self.limits, self.fast_scan, self.parse_function)
+                self._all.append(worker)
+                return worker
+        return self._idle.get()
+
+    def parse(self, file_path: Path, kind: InputKind) -> Any:
+        """
+        Parse a file in a worker. Raises ParseLimitExceeded if it exceeds the
+        limits, or ParseFailed if the parser raised an error.
+        """
+        worker = self._acquire()
+        try:
+            return worker.parse(file_path, kind)
+        finally:
+            self._idle.put(worker)
+
+    def map(
+        self, file_paths: Iterable[Path], kind: InputKind
+    ) -> Iterator[tuple[Path, Any | Exception]]:
+        """
+        Parse files on all workers, yielding each path with its result or the
+        exception raised parsing it, in order.
+        """
+
+        def parse_or_error(file_path: Path) -> Any | Exception:
+            try:
+                return self.parse(file_path, kind)
+            except (ParseLimitExceeded, ParseFailed) as e:
+                return e
+
+        file_paths = list(file_paths)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            yield from zip(
+                file_paths, executor.map(parse_or_error, file_paths), strict=True
+            )
+
+    def close(self) -> None:
+        for worker in self._all:
+            worker.close()
+        self._all.clear()
+
+    def __enter__(self) -> "IsolatedParser":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class Quarantine:
+    """
+    Files that exceeded parse limits, remembered between runs so that they are
+    skipped until their contents change, unless skip is False. Files that parse
+    again are released. A read-only quarantine only changes for the current run.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str | Path | None = None,
+        skip: bool = True,
+        read_only: bool = False,
+    ) -> None:
+        cache_dir = Path(cache_dir) if cache_dir else default_cache_dir()
+        self.path = cache_dir / QUARANTINE_FILE_NAME
+        self.skip = skip
+        self.read_only = read_only
+        self._lock = threading.Lock()
+        try:
+            self.entries: dict[str, dict[str, str]] = json.loads(self.path.read_text())
+        except FileNotFoundError:
+            self.entries = {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable quarantine {self.path}: {e}")
+            self.entries = {}
+        # Files quarantined or skipped during this run, with the reason
+        self.reported: dict[str, str] = {}
+
+    def is_quarantined(self, file_path: Path) -> bool:
+        entry = self.entries.get(str(file_path.resolve()))
+        if entry is None or not self.skip:
+            return False
+        if entry["digest"] != hash_file_contents(file_path):
+            logger.info(f"Parsing {file_path} again, it changed since quarantined")
+            return False
+        self.reported[str(file_path)] = f"{entry['reason']} (since {entry['since']})"
+        return True
+
+    def add(self, file_path: Path, reason: str) -> None:
+        with self._lock:
+            self.entries[str(file_path.resolve())] = {
+                "digest": hash_file_contents(file_path),
+                "reason": reason,
+                "since": datetime.now(UTC).isoformat(timespec="seconds"),
+            }
+            self.reported[str(file_path)] = reason
+        logger.warning(f"Quarantined {file_path}: {reason}")
+        self._save()
+
+    def release(self, file_path: Path) -> None:
+        key = str(file_path.resolve())
+        if key not in self.entries:
+            return
+        with self._lock:
+            del self.entries[key]
+        logger.info(f"Released {file_path} from quarantine")
+        self._save()
+
+    def _save(self) -> None:
+        if self.read_only:
+            return
+        with self._lock:
+            data = json.dumps(self.entries, indent=2, sort_keys=True)
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                "w", dir=self.path.parent, delete=False
+            ) as f:
+                f.write(data)
+            os.replace(f.name, self.path)
+        except OSError as e:
+            logger.warning(f"Failed to write quarantine {self.path}: {e}")
+
+    def report(self) -> str:
+        lines = [f"{len(self.reported)} files are quarantined and were skipped:"]
+        lines.extend(
+            f"    {file_path}: {reason}"
+            for file_path, reason in sorted(self.reported.items())
+        )
+        lines.append(
+            f"They are parsed again once they change, or after removing {self.path}."
+        )
+        return "\n".join(lines)
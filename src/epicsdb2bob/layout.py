@@ -0,0 +1,92 @@
+from collections import Counter
+from dataclasses import dataclass, field
+
+from .config import HorizontalAlignment, VerticalAlignment
+from .palettes import Color
+
+
+@dataclass
+class OpenDisplayAction:
+    file: str
+    target: str  # tab, replace or window
+    description: str
+    macros: dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class WidgetSpec:
+    """
+    A positioned widget, independent of the display file format it is written to.
+    The kind is the name of the equivalent phoebusgen widget class, e.g. TextUpdate.
+    Style properties left as None are not written.
+    """
+
+    kind: str
+    name: str
+    x: int
+    y: int
+    width: int
+    height: int
+    pv_name: str | None = None
+    record_type: str | None = None  # Of the record whose PV is shown
+    text: str | None = None
+    file: str | None = None  # Display shown by an EmbeddedDisplay
+    macros: dict[str, str] = field(default_factory=dict)
+    actions: list[OpenDisplayAction] = field(default_factory=list)
+    widget_class: str | None = None
+    foreground_color: Color | None = None
+    background_color: Color | None = None
+    font_size: int | None = None
+    horizontal_alignment: HorizontalAlignment | None = None
+    vertical_alignment: VerticalAlignment | None = None
+    transparent: bool | None = None
+    auto_size: bool = False
+    border_width: int | None = None
+    border_color: Color | None = None
+    line_width: int | None = None
+    line_color: Color | None = None
+
+
+@dataclass
+class ScreenLayout:
+    """
+    A laid out screen, computed once and written to any number of display formats.
+    """
+
+    name: str
+    width: int = 0
+    height: int = 0
+    background_color: Color | None = None
+    macros: dict[str, str] = field(default_factory=dict)
+    widgets: list[WidgetSpec] = field(default_factory=list)
+
+    def get_embedded_files(self) -> list[str]:
+        return [
+            widget.file
+            for widget in self.widgets
+            if widget.kind == "EmbeddedDisplay" and widget.file
+        ]
+
+
+@dataclass
+class LayoutStats:
+    """Counts of what went into laid out screens, added to by each layout."""
+
+    screens: int = 0
+    records: int = 0
+    instances: int = 0
+    widgets: int = 0
+    filtered: int = 0  # Records not selected by the record filter
+    unsupported: Counter[str] = field(default_factory=Counter)  # By record type
+
+    @property
+    def skipped(self) -> int:
+        return self.filtered + sum(self.unsupported.values())
+
+    def add(self, other: "LayoutStats") -> None:
+        self.screens += other.screens
+        self.records += other.records
+        self.instances += other.instances
+        self.widgets += other.widgets
+        self.filtered += other.filtered
+        self.unsupported.update(other.unsupported)
@@ -0,0 +1,281 @@
+import logging
+import os
+import sqlite3
+import tempfile
+from collections.abc import Iterator
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+
+logger = logging.getLogger("epicsdb2bob")
+
+LEDGER_FILE_NAME = "ledger.sqlite"
+
+# Sizes of a run, compared between runs for context but never regressions
+COUNT_METRICS = (
+    "input_files",
+    "screens",
+    "files_written",
+    "bytes_written",
+    "records",
+    "instances",
+    "widgets",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started TEXT NOT NULL,
+    version TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    input_path TEXT NOT NULL,
+    output_path TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    input_files INTEGER NOT NULL,
+    screens INTEGER NOT NULL,
+    files_written INTEGER NOT NULL,
+    bytes_written INTEGER NOT NULL,
+    records INTEGER NOT NULL,
+    instances INTEGER NOT NULL,
+    widgets INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS phases (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    PRIMARY KEY (run_id, name)
+);
+"""
+
+
+def default_ledger_path() -> Path:
+    """
+    Get the default ledger location, following the XDG base directory spec.
+    """
+    xdg_data_home = os.environ.get("XDG_DATA_HOME")
+    base = Path(xdg_data_home) if xdg_data_home else Path.home() / ".local" / "share"
+    return base / "epicsdb2bob" / LEDGER_FILE_NAME
+
+
+@dataclass
+class RunRecord:
+    """Measurements of one run of epicsdb2bob."""
+
+    started: str  # ISO 8601 timestamp
+    version: str
+    fingerprint: str
+    input_path: str
+    output_path: str
+    seconds: float
+    input_files: int = 0
+    screens: int = 0
+    files_written: int = 0
+    bytes_written: int = 0
+    records: int = 0
+    instances: int = 0
+    widgets: int = 0
+    phases: dict[str, float] = field(default_factory=dict)
+    id: int | None = None
+
+
+_RUN_COLUMNS = [f.name for f in fields(RunRecord) if f.name not in ("phases", "id")]
+
+
+@dataclass
+class MetricChange:
+    metric: str
+    baseline: float
+    current: float
+    regression: bool = False
+
+    @property
+    def change(self) -> float | None:
+        if self.baseline == 0:
+            return None
+        return (self.current - self.baseline) / self.baseline
+
+
+class RunLedger:
+    """
+    SQLite ledger of runs, for tracking how generation time and output size
+    change as an IOC tree grows and epicsdb2bob is upgraded.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(self.path)
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        self._connection.executescript(_SCHEMA)
+
+    def record(self, run: RunRecord) -> int:
+        with self._connection:
+            cursor = self._connection.execute(
+                f"INSERT INTO runs ({', '.join(_RUN_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(_RUN_COLUMNS))})",
+                [getattr(run, column) for column in _RUN_COLUMNS],
+            )
+            run.id = cursor.lastrowid
+            self._connection.executemany(
+                "INSERT INTO phases (run_id, name, seconds) VALUES (?, ?, ?)",
+                [(run.id, name, seconds) for name, seconds in run.phases.items()],
+            )
+        logger.debug(f"Recorded run {run.id} in {self.path}")
+        return run.id  # type: ignore
+
+    def _to_run(self, row: tuple) -> RunRecord:
+        run = RunRecord(**dict(zip(_RUN_COLUMNS, row[1:], strict=True)), id=row[0])
+        run.phases = dict(
+            self._connection.execute(
+                "SELECT name, seconds FROM phases WHERE run_id = ? ORDER BY rowid",
+                (run.id,),
+            ).fetchall()
+        )
+        return run
+
+    def get_run(self, run_id: int) -> RunRecord:
+        row = self._connection.execute(
+            f"SELECT id, {', '.join(_RUN_COLUMNS)} FROM runs WHERE id = ?", (run_id,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(f"No run {run_id} in {self.path}")
+        return self._to_run(row)
+
+    def get_runs(
+        self, limit: int | None = None, input_path: str | None = None
+    ) -> list[RunRecord]:
+        """
+        Get the most recent runs, oldest first, optionally only those of an input.
+        """
+        query = f"SELECT id, {', '.join(_RUN_COLUMNS)} FROM runs"
+        parameters: list = []
+        if input_path is not None:
+            query += " WHERE input_path = ?"
+            parameters.append(input_path)
+        query += " ORDER BY id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            parameters.append(limit)
+        rows = self._connection.execute(query, parameters).fetchall()
+        return [self._to_run(row) for row in reversed(rows)]
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> "RunLedger":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def compare_runs(
+    baseline: RunRecord,
+    current: RunRecord,
+    threshold: float = 0.1,
+    min_seconds: float = 0.01,
+) -> list[MetricChange]:
+    """
+    Compare the metrics and phase timings of two runs. Timings, including the time
+    per record or instance, that grew by more than the threshold fraction are
+    regressions, unless they grew by less than min_seconds, which is noise.
+    """
+    changes = [
+        MetricChange(metric, getattr(baseline, metric), getattr(current, metric))
+        for metric in ("seconds", *COUNT_METRICS)
+    ]
+    baseline_items = baseline.records + baseline.instances
+    current_items = current.records + current.instances
+    if baseline_items and current_items:
+        changes.append(
+            MetricChange(
+                "ms_per_item",
+                1000 * baseline.seconds / baseline_items,
+                1000 * current.seconds / current_items,
+            )
+        )
+    for phase in dict.fromkeys([*baseline.phases, *current.phases]):
+        changes.append(
+            MetricChange(
+                f"phase:{phase}",
+                baseline.phases.get(phase, 0.0),
+                current.phases.get(phase, 0.0),
+            )
+        )
+
+    for change in changes:
+        change.regression = (
+            change.metric not in COUNT_METRICS
+            and change.change is not None
+            and change.change > threshold
+            and (
+                change.metric == "ms_per_item"
+                or change.current - change.baseline >= min_seconds
+            )
+        )
+    return changes
+
+
+def format_runs(runs: list[RunRecord]) -> str:
+    lines = [
+        f"{'Run':>5} {'Started':<20} {'Version':<12} {'Seconds':>9} {'Screens':>8} "
+        f"{'Widgets':>9} {'Bytes':>12}  Input"
+    ]
+    for run in runs:
+        lines.append(
+            f"{run.id:>5} {run.started[:19]:<20} {run.version[:12]:<12} "
+            f"{run.seconds:>9.2f} {run.screens:>8} {run.widgets:>9} "
+            f"{run.bytes_written:>12}  {run.input_path}"
+        )
+    return "\n".join(lines)
+
+
+def format_comparison(
+    baseline: RunRecord, current: RunRecord, changes: list[MetricChange]
+) -> str:
+    lines = [
+        f"Run {baseline.id} ({baseline.version}, config {baseline.fingerprint[:12]}) "
+        f"-> run {current.id} ({current.version}, config {current.fingerprint[:12]})",
+        f"{'Metric':<20} {'Baseline':>12} {'Current':>12} {'Change':>8}",
+    ]
+    for change in changes:
+        relative = f"{change.change:+.1%}" if change.change is not None else "n/a"
+        lines.append(
+            f"{change.metric:<20} {change.baseline:>12.4g} {change.current:>12.4g} "
+            f"{relative:>8}" + ("  REGRESSION" if change.regression else "")
+        )
+    return "\n".join(lines)
+
+
+def _prometheus_lines(run: RunRecord) -> Iterator[str]:
+    yield "# HELP epicsdb2bob_run_info Version and config fingerprint of the run."
+    yield "# TYPE epicsdb2bob_run_info gauge"
+    yield (
+        f'epicsdb2bob_run_info{{version="{run.version}",'
+        f'fingerprint="{run.fingerprint}"}} 1'
+    )
+    yield "# HELP epicsdb2bob_run_duration_seconds Wall time of the run."
+    yield "# TYPE epicsdb2bob_run_duration_seconds gauge"
+    yield f"epicsdb2bob_run_duration_seconds {run.seconds}"
+    yield "# HELP epicsdb2bob_phase_duration_seconds Wall time of each phase."
+    yield "# TYPE epicsdb2bob_phase_duration_seconds gauge"
+    for phase, seconds in run.phases.items():
+        yield f'epicsdb2bob_phase_duration_seconds{{phase="{phase}"}} {seconds}'
+    for metric in COUNT_METRICS:
+        yield f"# HELP epicsdb2bob_{metric} Number of {metric.replace('_', ' ')}."
+        yield f"# TYPE epicsdb2bob_{metric} gauge"
+        yield f"epicsdb2bob_{metric} {getattr(run, metric)}"
+
+
+def write_prometheus_textfile(run: RunRecord, path: str | Path) -> None:
+    """
+    Write the metrics of a run for the node exporter textfile collector. The file
+    is replaced atomically, so the collector never reads it half written.
+    """
+    path = Path(path)
+    with tempfile.NamedTemporaryFile(
+        "w", dir=path.parent, prefix=f".{path.name}.", delete=False
+    ) as f:
+        f.write("\n".join(_prometheus_lines(run)) + "\n")
+    # Temporary files are only readable by their owner, unlike the collector
+    os.chmod(f.name, 0o644)
+    os.replace(f.name, path)
@@ -0,0 +1,171 @@
+import hashlib
+import logging
+import re
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass, field
+
+from epicsdbtools import Database, Record
+
+from .variants import macroize_pv_name
+
+logger = logging.getLogger("epicsdb2bob")
+
+DEFAULT_MACRO_NAMES = ("P", "R")
+DEFAULT_SEPARATORS = ":"
+
+
+@dataclass
+class _TrieNode:
+    count: int = 0
+    # Number of names ending at this node
+    terminal: int = 0
+    children: dict[str, "_TrieNode"] = field(default_factory=dict)
+
+
+def split_name(name: str, separators: str = DEFAULT_SEPARATORS) -> list[str]:
+    """
+    Split a record name into tokens, each ending in a separator except the last.
+    """
+    separators = re.escape(separators)
+    return re.findall(rf"[^{separators}]*[{separators}]|.+$", name)
+
+
+class PrefixTrie:
+    """
+    Trie over the tokens of record names, counting the names under each prefix.
+    """
+
+    def __init__(self, separators: str = DEFAULT_SEPARATORS) -> None:
+        self.separators = separators
+        self.root = _TrieNode()
+
+    def insert(self, name: str) -> None:
+        node = self.root
+        node.count += 1
+        for token in split_name(name, self.separators):
+            node = node.children.setdefault(token, _TrieNode())
+            node.count += 1
+        node.terminal += 1
+
+    def common_prefix(self, min_share: float = 1.0) -> list[str]:
+        """
+        Get the tokens of the longest prefix of at least min_share of the names,
+        stopping before a prefix that is a whole name.
+        """
+        tokens: list[str] = []
+        node = self.root
+        while node.children:
+            token, child = max(node.children.items(), key=lambda item: item[1].count)
+            if child.count < min_share * self.root.count or child.terminal:
+                break
+            tokens.append(token)
+            node = child
+        return tokens
+
+
+def _has_macros(name: str) -> bool:
+    return "$(" in name or "${" in name
+
+
+def infer_macros(
+    record_names: Iterable[str],
+    macro_names: Sequence[str] = DEFAULT_MACRO_NAMES,
+    separators: str = DEFAULT_SEPARATORS,
+) -> dict[str, str]:
+    """
+    Infer macros for the prefix shared by all record names. Each macro but the last
+    takes one token of the prefix, and the last takes the rest, so 13SIM1:cam1:
+    gives P=13SIM1: and R=cam1:. Templates, with macros in their record names
+    already, get no macros.
+    """
+    trie = PrefixTrie(separators)
+    for name in record_names:
+        if _has_macros(name):
+            return {}
+        trie.insert(name)
+    tokens = trie.common_prefix()
+    macros: dict[str, str] = {}
+    for i, macro_name in enumerate(macro_names[: len(tokens)]):
+        if i == len(macro_names) - 1:
+            macros[macro_name] = "".join(tokens[i:])
+        else:
+            macros[macro_name] = tokens[i]
+    return macros
+
+
+def database_signature(
+    database: Database, macros: dict[str, str], readbacks: Iterable[Record] = ()
+) -> str:
+    """
+    Digest of the records of a database, and readbacks paired from other databases,
+    with macro values replaced by references. Databases with the same signature
+    have the same screen under their macros.
+    """
+    digest = hashlib.sha256()
+    for record in [*database.values(), *readbacks]:
+        digest.update(
+            repr(
+                (
+                    macroize_pv_name(record.name, macros),
+                    record.rtyp,
+                    [
+                        (name, macroize_pv_name(str(value), macros))
+                        for name, value in record.fields.items()
+                    ],
+                    [
+                        (name, macroize_pv_name(str(value), macros))
+                        for name, value in record.infos.items()
+                    ],
+                )
+            ).encode()
+        )
+    return digest.hexdigest()
+
+
+@dataclass
+class InferredScreen:
+    """The reusable screen a database is shown with, and its inferred macros."""
+
+    name: str
+    screen: str
+    macros: dict[str, str]
+
+    @property
+    def reused(self) -> bool:
+        return self.screen != self.name
+
+
+def group_reusable_databases(
+    databases: dict[str, Database],
+    macro_names: Sequence[str] = DEFAULT_MACRO_NAMES,
+    readbacks: dict[str, list[Record]] | None = None,
+) -> dict[str, InferredScreen]:
+    """
+    Infer macros for each database, and share one screen between the databases
+    that have the same records under their macros, named after the first of them.
+    """
+    inferred: dict[str, InferredScreen] = {}
+    screens: dict[str, str] = {}
+    for name, database in databases.items():
+        macros = infer_macros(database, macro_names)
+        screen = name
+        if macros:
+            signature = database_signature(
+                database, macros, (readbacks or {}).get(name, ())
+            )
+            screen = screens.setdefault(signature, name)
+        inferred[name] = InferredScreen(name, screen, macros)
+    return inferred
+
+
+def format_inferred_macros(inferred: dict[str, InferredScreen]) -> str:
+    with_macros = [screen for screen in inferred.values() if screen.macros]
+    reused = sum(screen.reused for screen in with_macros)
+    lines = [
+        f"Inferred macros for {len(with_macros)} of {len(inferred)} databases, "
+        f"{reused} reuse the screen of another:"
+    ]
+    for screen in with_macros:
+        macros = ", ".join(f"{name}={value}" for name, value in screen.macros.items())
+        lines.append(f"    {screen.name} -> {screen.screen}.bob: {macros}")
+    return "\n".join(lines)
@@ -1,4 +1,6 @@
+from collections.abc import Mapping
 from dataclasses import dataclass, field
+from types import MappingProxyType
 from typing import Any
 
 import phoebusgen.widget as phoebusgen_widget
@@ -70,6 +72,52 @@ class Palette:
                 widget_type = getattr(phoebusgen_widget, key)
                 self.widget_bg[widget_type] = tuple(value)
 
+    def freeze(self) -> "FrozenPalette":
+        return FrozenPalette(
+            screen_bg=tuple(self.screen_bg),  # type: ignore
+            border_color=tuple(self.border_color),  # type: ignore
+            title_bar_bg=tuple(self.title_bar_bg),  # type: ignore
+            title_bar_fg=tuple(self.title_bar_fg),  # type: ignore
+            widget_fg=MappingProxyType(dict(self.widget_fg)),
+            widget_bg=MappingProxyType(dict(self.widget_bg)),
+        )
+
+
+@dataclass(frozen=True, eq=False)
+class FrozenPalette:
+    """Read-only copy of a palette, safe to share between threads and to hash."""
+
+    screen_bg: Color
+    border_color: Color
+    title_bar_bg: Color
+    title_bar_fg: Color
+    widget_fg: Mapping[type[Widget], Color]
+    widget_bg: Mapping[type[Widget], Color]
+
+    def get_widget_fg(self, widget_type: type[Widget]) -> Color:
+        return self.widget_fg.get(widget_type, BLACK)
+
+    def get_widget_bg(self, widget_type: type[Widget]) -> Color:
+        return self.widget_bg.get(widget_type, WHITE)
+
+    def _key(self) -> tuple:
+        return (
+            self.screen_bg,
+            self.border_color,
+            self.title_bar_bg,
+            self.title_bar_fg,
+            tuple(sorted((t.__name__, c) for t, c in self.widget_fg.items())),
+            tuple(sorted((t.__name__, c) for t, c in self.widget_bg.items())),
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, FrozenPalette):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
 
 BUILTIN_PALETTES: dict[str, Palette] = {
     "default": Palette(
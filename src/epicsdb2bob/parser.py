@@ -1,15 +1,24 @@
 import logging
 import os
 from collections import OrderedDict
+from collections.abc import Iterable, Iterator
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 from epicsdbtools import (
     Database,
     LoadIncludesStrategy,
     load_database_file,
-    load_template_file,
 )
 
+from .cache import ParseCache, get_parse_variant
+from .discovery import InputKind, discover_inputs
+from .scanner import scan_database_file
+from .substitutions import Substitution, read_substitution_file
+
+if TYPE_CHECKING:
+    from .isolation import IsolatedParser, Quarantine
+
 logger = logging.getLogger("epicsdb2bob")
 
 
@@ -36,48 +45,157 @@ def order_dbs_by_includes(databases: dict[str, Database]) -> OrderedDict[str, Da
     return ordered_dbs
 
 
-def find_epics_dbs_and_templates(
-    search_path: Path, macros: dict[str, str] | None = None
+def load_epics_db(full_file_path: Path, fast_scan: bool = False) -> Database:
+    """
+    Parse a single database or template without loading its includes.
+    """
+    if fast_scan:
+        return scan_database_file(full_file_path)
+    return load_database_file(
+        full_file_path,
+        load_includes_strategy=LoadIncludesStrategy.IGNORE,
+    )
+
+
+def _isolated_result(
+    full_file_path: Path, result: object, quarantine: "Quarantine | None"
+) -> object | None:
+    from .isolation import ParseLimitExceeded
+
+    if isinstance(result, ParseLimitExceeded):
+        if quarantine is not None:
+            quarantine.add(full_file_path, str(result))
+        else:
+            logger.warning(f"Failed to parse {full_file_path}: {result}")
+        return None
+    if isinstance(result, Exception):
+        logger.warning(f"Failed to parse {full_file_path}: {result}")
+        return None
+    if quarantine is not None:
+        quarantine.release(full_file_path)
+    return result
+
+
+def load_epics_dbs_and_templates(
+    database_files: Iterable[Path],
+    cache: ParseCache | None = None,
+    fast_scan: bool = False,
+    isolated_parser: "IsolatedParser | None" = None,
+    quarantine: "Quarantine | None" = None,
 ) -> dict[str, Database]:
+    """
+    Parse databases and templates, ordered so that included templates come first.
+
+    Given an isolated parser, files not in the cache are parsed in its worker
+    processes under its limits, and files exceeding them are quarantined. Files
+    in the quarantine are skipped.
+    """
+    cache_variant = get_parse_variant(fast_scan)
     epics_databases: dict[str, Database] = {}
-    for dirpath, _, filenames in os.walk(search_path):
-        for file in filenames:
-            full_file_path = Path(dirpath) / file
-            if file.endswith((".db", ".template")):
-                try:
-                    epics_databases[file.split(".", -1)[0]] = load_database_file(
-                        full_file_path,
-                        load_includes_strategy=LoadIncludesStrategy.IGNORE,
-                    )
-                    logger.info(f"Parsed {full_file_path}")
-                except StopIteration:
-                    logger.warning(
-                        f"Failed to parse {full_file_path} as an EPICS database"
-                    )
+    db_names: list[str] = []
+    to_parse: list[Path] = []
+    for full_file_path in database_files:
+        db_name = full_file_path.name.split(".", -1)[0]
+        db_names.append(db_name)
+        if quarantine is not None and quarantine.is_quarantined(full_file_path):
+            continue
+        if cache is not None:
+            cached = cache.load(full_file_path, cache_variant)
+            if cached is not None:
+                epics_databases[db_name] = cached
+                continue
+        if isolated_parser is not None:
+            to_parse.append(full_file_path)
+            continue
+        try:
+            database = load_epics_db(full_file_path, fast_scan)
+            epics_databases[db_name] = database
+            logger.info(f"Parsed {full_file_path}")
+            if cache is not None:
+                cache.store(full_file_path, database, cache_variant)
+        except StopIteration:
+            logger.warning(f"Failed to parse {full_file_path} as an EPICS database")
+
+    if isolated_parser is not None:
+        for full_file_path, result in isolated_parser.map(to_parse, InputKind.DATABASE):
+            database = _isolated_result(full_file_path, result, quarantine)
+            if database is None:
+                continue
+            epics_databases[full_file_path.name.split(".", -1)[0]] = database  # type: ignore
+            logger.info(f"Parsed {full_file_path}")
+            if cache is not None:
+                cache.store(full_file_path, database, cache_variant)  # type: ignore
+        # In the order found, as if parsed one after the other
+        epics_databases = {
+            name: epics_databases[name] for name in db_names if name in epics_databases
+        }
+
+    if cache is not None:
+        logger.info(
+            f"Parse cache: {cache.hits} hits, of which {cache.shared_hits} shared, "
+            f"{cache.misses} misses ({cache.cache_dir})"
+        )
 
     epics_databases = order_dbs_by_includes(epics_databases)
 
     return epics_databases
 
 
-def find_epics_subs(search_path: Path) -> dict[str, dict[str, list[dict[str, str]]]]:
-    epics_subs: dict[str, dict[str, list[dict[str, str]]]] = {}
-    for dirpath, _, filenames in os.walk(search_path):
-        for file in filenames:
-            full_file_path = Path(dirpath) / file
-            if file.endswith(".substitutions"):
-                try:
-                    dbs_and_macros: list[tuple[str, dict[str, str]]] = (
-                        load_template_file(full_file_path)
-                    )
-                    epics_sub = {}
-                    logger.info(f"Parsed {full_file_path}")
-                    for db_name, macros in dbs_and_macros:
-                        epics_sub.setdefault(db_name, []).append(macros)
-                    epics_subs[os.path.splitext(file)[0]] = epics_sub
-                except Exception as e:
-                    logger.warning(
-                        f"Failed to parse {full_file_path} as an EPICS subs file: {e}"
-                    )
-
-    return epics_subs
+def find_epics_dbs_and_templates(
+    search_path: Path,
+    macros: dict[str, str] | None = None,
+    cache: ParseCache | None = None,
+    fast_scan: bool = False,
+) -> dict[str, Database]:
+    discovered = discover_inputs(search_path)
+    return load_epics_dbs_and_templates(discovered.databases, cache, fast_scan)
+
+
+def load_epics_sub(
+    full_file_path: Path,
+    isolated_parser: "IsolatedParser | None" = None,
+    quarantine: "Quarantine | None" = None,
+) -> Substitution | None:
+    """
+    Parse a single substitutions file, or return None if it can't be parsed or is
+    quarantined. Given an isolated parser, it is parsed in a worker process.
+    """
+    if quarantine is not None and quarantine.is_quarantined(full_file_path):
+        return None
+    if isolated_parser is not None:
+        [(_, result)] = isolated_parser.map([full_file_path], InputKind.SUBSTITUTION)
+        epics_sub = _isolated_result(full_file_path, result, quarantine)
+        if epics_sub is not None:
+            logger.info(f"Parsed {full_file_path}")
+        return epics_sub  # type: ignore
+    try:
+        epics_sub = read_substitution_file(full_file_path)
+        logger.info(f"Parsed {full_file_path}")
+        return epics_sub
+    except Exception as e:
+        logger.warning(f"Failed to parse {full_file_path} as an EPICS subs file: {e}")
+        return None
+
+
+def iter_epics_subs(
+    substitution_files: Iterable[Path],
+) -> Iterator[tuple[str, Substitution]]:
+    """
+    Parse substitutions files one at a time, so that only one is held in memory
+    while its screen is generated.
+    """
+    for full_file_path in substitution_files:
+        epics_sub = load_epics_sub(full_file_path)
+        if epics_sub is not None:
+            yield os.path.splitext(full_file_path.name)[0], epics_sub
+
+
+def load_epics_subs(
+    substitution_files: Iterable[Path],
+) -> dict[str, Substitution]:
+    return dict(iter_epics_subs(substitution_files))
+
+
+def find_epics_subs(search_path: Path) -> dict[str, Substitution]:
+    discovered = discover_inputs(search_path)
+    return load_epics_subs(discovered.substitutions)
@@ -0,0 +1,355 @@
+import logging
+import os
+import tempfile
+from collections import Counter
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from xml.etree import ElementTree as ET
+
+from epicsdbtools import Database
+
+from .bobfile_gen import (
+    get_next_widget_position,
+    get_widget_start_positions,
+    layout_widgets_for_record,
+    pair_records,
+)
+from .config import AnyConfig, ConfigSnapshot, MacroSetLevel, resolve_config
+from .emitters import to_bob_widget, xml_to_bytes
+from .filters import RecordFilter, select_records
+from .layout import LayoutStats, WidgetSpec
+from .pv_index import PVIndex
+
+logger = logging.getLogger("epicsdb2bob")
+
+
+class PatchNotPossible(Exception):
+    """The changes can't be patched into the existing screen, regenerate it."""
+
+
+@dataclass
+class PatchResult:
+    height: int
+    width: int
+    updated: list[str] = field(default_factory=list)
+    added: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.updated or self.added or self.removed)
+
+    def __str__(self) -> str:
+        return (
+            f"{len(self.updated)} records updated, {len(self.added)} added, "
+            f"{len(self.removed)} removed"
+        )
+
+
+@dataclass
+class _Row:
+    """The widgets of a record in an existing screen."""
+
+    widget: ET.Element
+    label: ET.Element | None = None
+    readback: ET.Element | None = None
+
+    @property
+    def x(self) -> int:
+        return _get_int(self.label if self.label is not None else self.widget, "x")
+
+    @property
+    def y(self) -> int:
+        return _get_int(self.widget, "y")
+
+    @property
+    def elements(self) -> list[ET.Element]:
+        return [e for e in (self.label, self.widget, self.readback) if e is not None]
+
+
+def _get_int(element: ET.Element, tag: str) -> int:
+    try:
+        return int(element.findtext(tag) or 0)
+    except ValueError:
+        return 0
+
+
+def _strip_whitespace(root: ET.Element) -> None:
+    for element in root.iter():
+        if element.text is not None and not element.text.strip():
+            element.text = None
+        element.tail = None
+
+
+def _find_rows(
+    root: ET.Element, readback_suffix: str, column_pitch: int
+) -> dict[str, _Row]:
+    """
+    Find the rows of record widgets by PV name. A row's label is the nearest label
+    to the left of its widget, and its readback the widget for the readback PV to
+    the right of it.
+    """
+    by_pv: dict[str, ET.Element] = {}
+    labels: list[ET.Element] = []
+    for element in root.findall("widget"):
+        pv_name = element.findtext("pv_name")
+        if pv_name:
+            by_pv.setdefault(pv_name, element)
+        elif element.get("type") == "label":
+            labels.append(element)
+
+    def is_readback(pv_name: str, element: ET.Element) -> bool:
+        setpoint = by_pv.get(pv_name.removesuffix(readback_suffix))
+        return (
+            pv_name.endswith(readback_suffix)
+            and setpoint is not None
+            and _get_int(setpoint, "y") == _get_int(element, "y")
+            and _get_int(setpoint, "x") < _get_int(element, "x")
+        )
+
+    rows: dict[str, _Row] = {}
+    claimed: set[int] = set()
+    for pv_name, element in by_pv.items():
+        if is_readback(pv_name, element):
+            continue
+        row = _Row(element)
+        x, y = _get_int(element, "x"), _get_int(element, "y")
+        candidates = [
+            label
+            for label in labels
+            if id(label) not in claimed
+            and _get_int(label, "y") == y
+            and x - column_pitch <= _get_int(label, "x") < x
+        ]
+        if candidates:
+            row.label = max(candidates, key=lambda label: _get_int(label, "x"))
+            claimed.add(id(row.label))
+        readback = by_pv.get(pv_name + readback_suffix)
+        if readback is not None and is_readback(pv_name + readback_suffix, readback):
+            row.readback = readback
+        rows[pv_name] = row
+    return rows
+
+
+def _replace_element(root: ET.Element, old: ET.Element, spec: WidgetSpec) -> None:
+    """
+    Replace a widget with one for a spec, keeping its position and size.
+    """
+    spec = replace(
+        spec,
+        x=_get_int(old, "x"),
+        y=_get_int(old, "y"),
+        width=_get_int(old, "width"),
+        height=_get_int(old, "height"),
+    )
+    index = list(root).index(old)
+    root.remove(old)
+    root.insert(index, to_bob_widget(spec).root)
+
+
+def _update_widget(
+    root: ET.Element, element: ET.Element | None, spec: WidgetSpec | None
+) -> bool:
+    if element is None or spec is None:
+        return False
+    if element.get("type") == to_bob_widget(spec).root.get("type"):
+        return False
+    _replace_element(root, element, spec)
+    return True
+
+
+def _grow_screen(
+    root: ET.Element, result: PatchResult, height: int, config: ConfigSnapshot
+) -> None:
+    """
+    Make a screen at least as tall as height, along with its border.
+    """
+    if height <= result.height:
+        return
+    border_offset = int(config.title_bar_height / 2)
+    for element in root.findall("widget"):
+        if (
+            element.get("type") == "rectangle"
+            and _get_int(element, "y") == border_offset + 1
+            and _get_int(element, "height") == result.height - border_offset
+        ):
+            element.find("height").text = str(height - border_offset)  # type: ignore
+    root.find("height").text = str(height)  # type: ignore
+    result.height = height
+
+
+def patch_screen(
+    root: ET.Element,
+    name: str,
+    database: Database,
+    macros: dict[str, str],
+    config: AnyConfig,
+    record_filter: RecordFilter | None = None,
+    pv_index: PVIndex | None = None,
+    stats: LayoutStats | None = None,
+) -> PatchResult:
+    """
+    Patch a screen generated for a database in place, applying only the changes
+    to its records. Labels and widget types are updated, rows of deleted records
+    are removed, and rows of new records take the place of removed ones or are
+    appended to the last column. Everything else in the screen, including widgets
+    moved or added by hand, is left as it was. Raises PatchNotPossible if a change
+    needs the screen to be laid out again.
+    """
+    config = resolve_config(config)
+    if record_filter is None:
+        record_filter = config.record_filter
+    existing_macros = {
+        macro.tag: macro.text or "" for macro in root.findall("macros/*")
+    }
+    # Screens of macro set variants carry their macros at any level but widget
+    if (
+        config.macro_set_level == MacroSetLevel.SCREEN or existing_macros
+    ) and existing_macros != macros:
+        raise PatchNotPossible("screen macros changed")
+
+    records = select_records(database, record_filter)
+    unsupported: Counter[str] = Counter()
+    pairs = pair_records(
+        name, database, records, config, record_filter, pv_index, unsupported
+    )
+    # Widgets of other types were not generated for records, so are left alone
+    generated_types = {
+        to_bob_widget(WidgetSpec(widget_type.__name__, "", 0, 0, 0, 0)).root.get("type")
+        for widget_type in config.rtyp_to_widget_map.values()
+    }
+    rows = {
+        pv_name: row
+        for pv_name, row in _find_rows(
+            root, config.readback_suffix, config.column_pitch
+        ).items()
+        if row.widget.get("type") in generated_types
+    }
+    result = PatchResult(_get_int(root, "height"), _get_int(root, "width"))
+
+    # Columns of record rows, by x position, with the most widgets in a row
+    columns: dict[int, int] = {}
+    for row in rows.values():
+        columns[row.x] = max(columns.get(row.x, 2), len(row.elements))
+
+    new_rows: list[tuple[str, list[WidgetSpec]]] = []
+    wanted: set[str] = set()
+    for record, readback_record in pairs:
+        specs = layout_widgets_for_record(
+            record, 0, 0, macros, config, readback_record=readback_record
+        )
+        label_spec, widget_spec, *readback_specs = specs
+        pv_name = str(widget_spec.pv_name)
+        wanted.add(pv_name)
+        row = rows.get(pv_name)
+        if row is None:
+            new_rows.append((str(record.name), specs))
+            continue
+
+        readback_spec = readback_specs[0] if readback_specs else None
+        if (row.readback is None) != (readback_spec is None):
+            raise PatchNotPossible(f"readback of {record.name} changed")
+        updated = _update_widget(root, row.widget, widget_spec)
+        updated |= _update_widget(root, row.readback, readback_spec)
+        text = row.label.find("text") if row.label is not None else None
+        if text is not None and text.text != label_spec.text:
+            text.text = label_spec.text
+            updated = True
+        if updated:
+            result.updated.append(str(record.name))
+
+    # Slots of removed rows are filled by new rows first
+    free_slots: list[tuple[int, int, int]] = []
+    for pv_name, row in rows.items():
+        if pv_name in wanted:
+            continue
+        for element in row.elements:
+            root.remove(element)
+        free_slots.append((row.x, row.y, columns[row.x]))
+        result.removed.append(pv_name)
+    free_slots.sort()
+
+    if new_rows:
+        if columns:
+            x = max(columns)
+            y = max(row.y for row in rows.values() if row.x == x)
+            next_row = (x, y)
+        else:
+            x, y = get_widget_start_positions(config)
+            next_row = None
+        capacity = columns.get(x, 2)
+        for record_name, specs in new_rows:
+            slot = next(
+                (slot for slot in free_slots if len(specs) <= slot[2]),
+                None,
+            )
+            if slot is not None:
+                free_slots.remove(slot)
+                slot_x, slot_y, _ = slot
+            else:
+                if next_row is not None:
+                    x, y = get_next_widget_position(*next_row, capacity, config)
+                    if x != next_row[0]:
+                        raise PatchNotPossible("new records need another column")
+                if len(specs) > capacity:
+                    raise PatchNotPossible(f"{record_name} is wider than the column")
+                slot_x, slot_y = x, y
+                next_row = (x, y)
+            for spec in specs:
+                spec.x += slot_x
+                spec.y = slot_y
+                root.append(to_bob_widget(spec).root)
+            result.added.append(record_name)
+            _grow_screen(
+                root, result, slot_y + config.row_pitch + config.widget_offset, config
+            )
+
+    if stats is not None:
+        stats.screens += 1
+        stats.records += len(database)
+        stats.widgets += len(root.findall("widget"))
+        stats.filtered += len(database) - len(records)
+        stats.unsupported.update(unsupported)
+    return result
+
+
+def patch_screen_file(
+    file_path: str | Path,
+    name: str,
+    database: Database,
+    macros: dict[str, str],
+    config: AnyConfig,
+    record_filter: RecordFilter | None = None,
+    pv_index: PVIndex | None = None,
+    stats: LayoutStats | None = None,
+    screen_fingerprint: str | None = None,
+) -> PatchResult:
+    """
+    Patch a generated .bob file for the changes to its database, see patch_screen.
+    The file is only rewritten if something changed. Given the screen fingerprint
+    of the settings it was generated with, a screen generated with other settings,
+    such as another palette or font, must be regenerated.
+    """
+    if (
+        screen_fingerprint is not None
+        and screen_fingerprint != resolve_config(config).screen_fingerprint
+    ):
+        raise PatchNotPossible("it was generated with different settings")
+    file_path = Path(file_path)
+    try:
+        root = ET.parse(file_path).getroot()
+    except ET.ParseError as e:
+        raise PatchNotPossible(f"failed to parse {file_path}: {e}") from e
+    _strip_whitespace(root)
+    result = patch_screen(
+        root, name, database, macros, config, record_filter, pv_index, stats
+    )
+    if result.changed:
+        with tempfile.NamedTemporaryFile(
+            "wb", dir=file_path.parent, prefix=f".{file_path.name}.", delete=False
+        ) as f:
+            f.write(xml_to_bytes(root))
+        os.chmod(f.name, file_path.stat().st_mode & 0o777)
+        os.replace(f.name, file_path)
+        logger.info(f"Patched {file_path}: {result}")
+    return result
@@ -0,0 +1,159 @@
+import json
+import os
+from collections.abc import Mapping, Sequence
+from dataclasses import asdict, dataclass, field
+from enum import Enum
+from pathlib import Path
+from typing import Any
+
+from epicsdbtools import Database
+
+from .config import AnyConfig, resolve_config
+from .filters import RecordFilter, select_records
+from .fingerprints import ScreenFingerprints
+from .layout import ScreenLayout
+
+
+class PlanStatus(str, Enum):
+    """How a planned screen compares to the screen currently on disk."""
+
+    NEW = "new"
+    CHANGED = "changed"
+    UNCHANGED = "unchanged"
+
+
+@dataclass
+class ScreenPlan:
+    name: str
+    output_path: str
+    source: str  # "database" or "substitution"
+    record_count: int
+    widget_count: int
+    width: int
+    height: int
+    status: PlanStatus
+    skipped_rtyps: list[str] = field(default_factory=list)
+    embeds: list[str] = field(default_factory=list)
+
+    def to_dict(self) -> dict[str, Any]:
+        data = asdict(self)
+        data["status"] = self.status.value
+        return data
+
+
+def get_plan_status(
+    layout: ScreenLayout,
+    output_path: str | Path,
+    fingerprints: ScreenFingerprints | None = None,
+) -> PlanStatus:
+    """
+    Compare a layout with the screen on disk through the fingerprint recorded when
+    it was written. Screens without one, or edited since, are reported as changed.
+    """
+    if not os.path.exists(output_path):
+        return PlanStatus.NEW
+    if fingerprints is not None and fingerprints.is_unchanged(layout, output_path):
+        return PlanStatus.UNCHANGED
+    return PlanStatus.CHANGED
+
+
+def plan_screen(
+    name: str,
+    layout: ScreenLayout,
+    output_path: str | Path,
+    source: str,
+    record_count: int,
+    skipped_rtyps: list[str] | None = None,
+    fingerprints: ScreenFingerprints | None = None,
+) -> ScreenPlan:
+    return ScreenPlan(
+        name=name,
+        output_path=str(output_path),
+        source=source,
+        record_count=record_count,
+        widget_count=len(layout.widgets),
+        width=layout.width,
+        height=layout.height,
+        status=get_plan_status(layout, output_path, fingerprints),
+        skipped_rtyps=skipped_rtyps or [],
+        embeds=layout.get_embedded_files(),
+    )
+
+
+def plan_database_screen(
+    name: str,
+    database: Database,
+    layout: ScreenLayout,
+    output_path: str | Path,
+    config: AnyConfig,
+    record_filter: RecordFilter | None = None,
+    fingerprints: ScreenFingerprints | None = None,
+) -> ScreenPlan:
+    config = resolve_config(config)
+    if record_filter is None:
+        record_filter = config.record_filter
+    records = select_records(database, record_filter)
+    supported = [
+        record
+        for record in records.values()
+        if record.rtyp in config.rtyp_to_widget_map
+    ]
+    skipped_rtyps = sorted(
+        {
+            str(record.rtyp)
+            for record in records.values()
+            if record.rtyp not in config.rtyp_to_widget_map
+        }
+    )
+    return plan_screen(
+        name,
+        layout,
+        output_path,
+        "database",
+        len(supported),
+        skipped_rtyps,
+        fingerprints,
+    )
+
+
+def plan_substitution_screen(
+    name: str,
+    substitution: Mapping[str, Sequence[dict[str, str]]],
+    layout: ScreenLayout,
+    output_path: str | Path,
+    fingerprints: ScreenFingerprints | None = None,
+) -> ScreenPlan:
+    instance_count = sum(len(instances) for instances in substitution.values())
+    return plan_screen(
+        name,
+        layout,
+        output_path,
+        "substitution",
+        instance_count,
+        fingerprints=fingerprints,
+    )
+
+
+def format_plan(plans: list[ScreenPlan], output_format: str = "text") -> str:
+    if output_format == "json":
+        return json.dumps([plan.to_dict() for plan in plans], indent=2)
+
+    header = (
+        f"{'Screen':<40} {'Status':<10} {'Records':>8} {'Widgets':>8} "
+        f"{'Size':>11}  Notes"
+    )
+    lines = [header, "-" * len(header)]
+    for plan in plans:
+        notes = []
+        if plan.skipped_rtyps:
+            notes.append(f"skipped rtyps: {', '.join(plan.skipped_rtyps)}")
+        if plan.embeds:
+            notes.append(f"embeds: {', '.join(sorted(set(plan.embeds)))}")
+        lines.append(
+            f"{os.path.basename(plan.output_path):<40} {plan.status.value:<10} "
+            f"{plan.record_count:>8} {plan.widget_count:>8} "
+            f"{f'{plan.width}x{plan.height}':>11}  {'; '.join(notes)}"
+        )
+    changed = sum(1 for plan in plans if plan.status != PlanStatus.UNCHANGED)
+    lines.append(f"{len(plans)} screens planned, {changed} new or changed.")
+    return "\n".join(lines)
@@ -0,0 +1,160 @@
+import logging
+import sys
+import time
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+logger = logging.getLogger("epicsdb2bob")
+
+
+def get_peak_rss() -> int:
+    """
+    Get the peak resident set size of this process in bytes, or 0 if unavailable.
+    """
+    try:
+        import resource
+    except ImportError:  # Not available on Windows
+        return 0
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def format_bytes(num_bytes: float) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if abs(num_bytes) < 1024:
+            return f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} GiB"
+
+
+@dataclass
+class PhaseMemory:
+    name: str
+    calls: int = 0
+    retained: int = 0  # Net traced bytes allocated and not freed by the phase
+    peak: int = 0  # Largest traced peak above the phase's starting point
+    # Largest traced peak of a call divided by the number of items it handled
+    peak_per_item: float = 0.0
+    # Largest increase in the peak RSS of the process during a call
+    peak_rss_increase: int = 0
+    top_allocations: list[str] = field(default_factory=list)
+
+
+class MemoryProfiler:
+    """
+    Records tracemalloc and RSS measurements around phases of a run. Wall time of
+    each phase is recorded even when memory profiling is disabled.
+    """
+
+    def __init__(self, enabled: bool = True, top_n: int = 10):
+        self.enabled = enabled
+        self.top_n = top_n
+        self.phases: dict[str, PhaseMemory] = {}
+        self.timings: dict[str, float] = {}
+        self._started_tracing = False
+
+    def start(self) -> None:
+        if self.enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self) -> None:
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def _top_allocations(
+        self, snapshot: tracemalloc.Snapshot, baseline: tracemalloc.Snapshot | None
+    ) -> list[str]:
+        if baseline is None:
+            stats = snapshot.statistics("lineno")
+        else:
+            stats = snapshot.compare_to(baseline, "lineno")
+        return [str(stat) for stat in stats[: self.top_n]]
+
+    @staticmethod
+    def _take_snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)]
+        )
+
+    @contextmanager
+    def phase(
+        self, name: str, snapshot: bool = False, items: int = 0
+    ) -> Iterator[None]:
+        """
+        Measure time and memory use of a phase. A phase may be entered multiple
+        times, in which case its measurements accumulate. Taking a snapshot records
+        the top allocation sites of the phase, but is expensive on large heaps.
+        Given the number of items a call handles, such as records, its peak per
+        item is recorded too.
+        """
+        start_time = time.perf_counter()
+        try:
+            with self._measure_memory(name, snapshot, items):
+                yield
+        finally:
+            self.timings[name] = (
+                self.timings.get(name, 0.0) + time.perf_counter() - start_time
+            )
+
+    @contextmanager
+    def _measure_memory(self, name: str, snapshot: bool, items: int) -> Iterator[None]:
+        if not self.enabled or not tracemalloc.is_tracing():
+            yield
+            return
+
+        phase = self.phases.setdefault(name, PhaseMemory(name))
+        baseline = self._take_snapshot() if snapshot else None
+        start_rss = get_peak_rss()
+        start, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            phase.calls += 1
+            phase.retained += current - start
+            phase.peak = max(phase.peak, peak - start)
+            if items:
+                phase.peak_per_item = max(phase.peak_per_item, (peak - start) / items)
+            phase.peak_rss_increase = max(
+                phase.peak_rss_increase, get_peak_rss() - start_rss
+            )
+            if baseline is not None:
+                phase.top_allocations = self._top_allocations(
+                    self._take_snapshot(), baseline
+                )
+
+    def retained_allocations(self) -> list[str]:
+        """
+        Get the top allocation sites of everything currently held in memory.
+        """
+        if not tracemalloc.is_tracing():
+            return []
+        return self._top_allocations(self._take_snapshot(), None)
+
+    def report(self) -> str:
+        lines = [
+            f"{'Phase':<12} {'Calls':>7} {'Retained':>12} {'Peak':>12} "
+            f"{'Peak/item':>12} {'RSS increase':>12}"
+        ]
+        for phase in self.phases.values():
+            lines.append(
+                f"{phase.name:<12} {phase.calls:>7} {format_bytes(phase.retained):>12} "
+                f"{format_bytes(phase.peak):>12} "
+                f"{format_bytes(int(phase.peak_per_item)):>12} "
+                f"{format_bytes(phase.peak_rss_increase):>12}"
+            )
+            for allocation in phase.top_allocations:
+                lines.append(f"    {allocation}")
+
+        retained = self.retained_allocations()
+        if retained:
+            lines.append("Top allocation sites still retained at end of run:")
+            lines.extend(f"    {allocation}" for allocation in retained)
+        return "\n".join(lines)
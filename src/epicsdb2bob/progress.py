@@ -0,0 +1,151 @@
+import logging
+import sys
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import TextIO
+
+from .layout import LayoutStats
+
+logger = logging.getLogger("epicsdb2bob")
+
+PROGRESS_MODES = ("auto", "tty", "log", "none")
+
+
+def format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+@dataclass
+class FileProgress:
+    name: str
+    stats: LayoutStats = field(default_factory=LayoutStats)
+    seconds: float = 0.0
+
+
+class ProgressReporter:
+    """
+    Aggregates layout counters per input file, reporting progress with throughput
+    and an ETA. On a terminal one status line is redrawn in place, otherwise a log
+    line is written at most every interval seconds.
+    """
+
+    def __init__(
+        self,
+        total: int,
+        mode: str = "auto",
+        interval: float = 10.0,
+        stream: TextIO | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.total = total
+        self.stream = stream if stream is not None else sys.stderr
+        if mode == "auto":
+            mode = "tty" if self.stream.isatty() else "log"
+        self.mode = mode
+        self.interval = 0.1 if mode == "tty" else interval
+        self.files: list[FileProgress] = []
+        self.totals = LayoutStats()
+        self._clock = clock
+        self._start = clock()
+        self._last_report = self._start
+
+    @contextmanager
+    def track(self, name: str) -> Iterator[LayoutStats]:
+        """
+        Time the generation of the screens for an input file, yielding the stats
+        to add its layouts to.
+        """
+        progress = FileProgress(name)
+        start = self._clock()
+        try:
+            yield progress.stats
+        finally:
+            progress.seconds = self._clock() - start
+            self.files.append(progress)
+            self.totals.add(progress.stats)
+            self._report()
+
+    def status(self) -> str:
+        elapsed = self._clock() - self._start
+        done = len(self.files)
+        items = self.totals.records + self.totals.instances
+        rate = items / elapsed if elapsed > 0 else 0.0
+        eta = format_duration(elapsed / done * (self.total - done)) if done else "?"
+        percent = 100 * done / self.total if self.total else 100
+        return (
+            f"[{done}/{self.total}] {percent:.0f}% | {self.totals.records} records, "
+            f"{self.totals.instances} instances, {self.totals.widgets} widgets | "
+            f"{rate:.0f}/s | ETA {eta}"
+        )
+
+    def _report(self) -> None:
+        if self.mode == "none":
+            return
+        now = self._clock()
+        if now - self._last_report < self.interval and len(self.files) < self.total:
+            return
+        self._last_report = now
+        if self.mode == "tty":
+            # Left at the start of the line, so that log output overwrites it
+            self.stream.write(f"\033[K{self.status()}\r")
+            self.stream.flush()
+        else:
+            logger.info(self.status())
+
+    def close(self) -> None:
+        if self.mode == "tty" and self.files:
+            self.stream.write("\033[K")
+            self.stream.flush()
+
+    def summary(self, top_n: int = 10) -> str:
+        """
+        Table of the slowest input files and the totals of the run.
+        """
+        slowest = sorted(self.files, key=lambda file: file.seconds, reverse=True)
+        rows = [
+            ("File", "Records", "Instances", "Widgets", "Skipped", "Seconds"),
+            *(
+                (
+                    file.name,
+                    str(file.stats.records),
+                    str(file.stats.instances),
+                    str(file.stats.widgets),
+                    str(file.stats.skipped),
+                    f"{file.seconds:.3f}",
+                )
+                for file in slowest[:top_n]
+            ),
+        ]
+        if len(slowest) > top_n:
+            rows.append((f"... {len(slowest) - top_n} more", "", "", "", "", ""))
+        rows.append(
+            (
+                f"Total ({len(self.files)} files)",
+                str(self.totals.records),
+                str(self.totals.instances),
+                str(self.totals.widgets),
+                str(self.totals.skipped),
+                f"{self._clock() - self._start:.3f}",
+            )
+        )
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        lines = [
+            "  ".join(
+                cell.ljust(width) if i == 0 else cell.rjust(width)
+                for i, (cell, width) in enumerate(zip(row, widths, strict=True))
+            )
+            for row in rows
+        ]
+        if self.totals.unsupported:
+            lines.append(
+                "Unsupported record types: "
+                + ", ".join(
+                    f"{rtyp} ({count})"
+                    for rtyp, count in self.totals.unsupported.most_common()
+                )
+            )
+        return "\n".join(lines)
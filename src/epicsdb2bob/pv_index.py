@@ -0,0 +1,113 @@
+import logging
+import sys
+
+from epicsdbtools import Database, Record
+
+from .shard import group_databases_by_includes
+
+logger = logging.getLogger("epicsdb2bob")
+
+
+class PVIndex:
+    """
+    Index of every record name across all parsed databases, for O(1) lookups of
+    where a PV is defined.
+    """
+
+    def __init__(self) -> None:
+        # First definition of each name, as (database name, record)
+        self._definitions: dict[str, tuple[str, Record]] = {}
+        # Further definitions of names defined in more than one database
+        self._duplicates: dict[str, list[tuple[str, Record]]] = {}
+        self._groups: dict[str, str] = {}
+
+    @staticmethod
+    def build(databases: dict[str, Database]) -> "PVIndex":
+        """
+        Index all records of the given databases in a single pass.
+        """
+        index = PVIndex()
+        definitions = index._definitions
+        for database_name, database in databases.items():
+            database_name = sys.intern(database_name)
+            for name, record in database.items():
+                name = sys.intern(name)
+                if name not in definitions:
+                    definitions[name] = (database_name, record)
+                else:
+                    index._duplicates.setdefault(name, []).append(
+                        (database_name, record)
+                    )
+        index._groups = group_databases_by_includes(databases)
+        logger.debug(
+            f"Indexed {len(definitions)} PVs from {len(databases)} databases, "
+            f"{len(index._duplicates)} defined more than once"
+        )
+        return index
+
+    def __len__(self) -> int:
+        return len(self._definitions)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._definitions
+
+    def get_definitions(self, name: str) -> list[tuple[str, Record]]:
+        """
+        Get the database name and record of every definition of a PV.
+        """
+        if name not in self._definitions:
+            return []
+        return [self._definitions[name], *self._duplicates.get(name, [])]
+
+    def find_record(self, name: str, database_name: str) -> Record | None:
+        """
+        Find the record for a PV referenced from the given database. When the PV
+        is defined more than once, a definition in the same database is preferred,
+        then one in a database related to it through includes. Ambiguous
+        definitions elsewhere are not guessed between.
+        """
+        definition = self._definitions.get(name)
+        if definition is None:
+            return None
+        if name not in self._duplicates:
+            return definition[1]
+
+        definitions = self.get_definitions(name)
+        for defining_database, record in definitions:
+            if defining_database == database_name:
+                return record
+        group = self._groups.get(database_name)
+        related = [
+            record
+            for defining_database, record in definitions
+            if self._groups.get(defining_database) == group
+        ]
+        if len(related) == 1:
+            return related[0]
+        logger.debug(f"{name} is defined in several databases, not pairing it")
+        return None
+
+    def get_duplicates(self) -> dict[str, list[str]]:
+        """
+        Get the names of the databases defining each PV defined more than once.
+        """
+        return {
+            name: [database_name for database_name, _ in self.get_definitions(name)]
+            for name in self._duplicates
+        }
+
+    def report_duplicates(self) -> None:
+        duplicates = self.get_duplicates()
+        # Names still containing macros only clash if instantiated with the same ones
+        templated = 0
+        for name, database_names in duplicates.items():
+            if "$(" in name or "${" in name:
+                templated += 1
+                logger.debug(f"PV {name} is defined in {database_names}")
+            else:
+                logger.warning(f"PV {name} is defined more than once: {database_names}")
+        if templated:
+            logger.info(
+                f"{templated} PV names with macros are defined in more than one "
+                "template, and clash if instantiated with the same macros."
+            )
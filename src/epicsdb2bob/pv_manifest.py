@@ -0,0 +1,158 @@
+import csv
+import io
+import json
+import logging
+import os
+import re
+import tempfile
+from collections.abc import Iterator
+from dataclasses import asdict, dataclass, fields, replace
+from pathlib import Path
+
+from .layout import ScreenLayout
+
+logger = logging.getLogger("epicsdb2bob")
+
+PV_MANIFEST_FILE_NAME = "pvs.jsonl"
+
+# $(NAME), ${NAME}, $(NAME=default) or ${NAME=default}
+_MACRO_RE = re.compile(r"\$(?:\(([^)=]+)(?:=([^)]*))?\)|\{([^}=]+)(?:=([^}]*))?\})")
+
+
+def expand_macros(text: str, macros: dict[str, str]) -> str:
+    """
+    Expand references to macros in a PV name, leaving unknown ones as they are
+    unless they have a default.
+    """
+
+    def expand(match: re.Match) -> str:
+        name = match.group(1) or match.group(3)
+        default = match.group(2) if match.group(1) else match.group(4)
+        if name in macros:
+            return macros[name]
+        return default if default is not None else match.group(0)
+
+    return _MACRO_RE.sub(expand, text)
+
+
+@dataclass
+class PVEntry:
+    """A PV shown on a screen, by the widget for a record."""
+
+    screen: str
+    pv: str
+    widget: str
+    record_type: str
+    # Screen the widget is on, when shown through an embedded display
+    embedded_screen: str | None = None
+
+
+class PVManifest:
+    """
+    PVs shown on each screen, collected from layouts as they are generated, with
+    their macros expanded. PVs of embedded displays are listed for the screens
+    embedding them too, with the macros of each instance, if the embedded screen
+    was added before.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[str, list[PVEntry]] = {}
+        # Entries of each screen before expanding its own default macros, and
+        # those defaults, for other screens showing it under their macros
+        self._unexpanded: dict[str, list[PVEntry]] = {}
+        self._defaults: dict[str, dict[str, str]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    def __iter__(self) -> Iterator[PVEntry]:
+        for entries in self._entries.values():
+            yield from entries
+
+    def get_entries(self, screen: str) -> list[PVEntry]:
+        return self._entries.get(screen, [])
+
+    def _get_shown_entries(self, screen: str, macros: dict[str, str]) -> list[PVEntry]:
+        """
+        Get the entries of a screen as shown with macros, which take precedence
+        over its defaults.
+        """
+        macros = {**self._defaults.get(screen, {}), **macros}
+        return [
+            replace(entry, pv=expand_macros(entry.pv, macros))
+            for entry in self._unexpanded.get(screen, [])
+        ]
+
+    def add_layout(self, layout: ScreenLayout, screen: str | None = None) -> None:
+        """
+        Add the PVs of a laid out screen, by default named after the layout. Layouts
+        of macro set variants, or of databases shown with the screen of another under
+        their own macros, are added under the name of the screen showing them.
+        """
+        screen = screen or layout.name
+        unexpanded: list[PVEntry] = []
+        for widget in layout.widgets:
+            if widget.pv_name and widget.record_type is not None:
+                unexpanded.append(
+                    PVEntry(
+                        screen,
+                        expand_macros(widget.pv_name, widget.macros),
+                        widget.kind,
+                        widget.record_type,
+                    )
+                )
+            elif widget.kind == "EmbeddedDisplay" and widget.file:
+                embedded = os.path.splitext(widget.file)[0]
+                unexpanded.extend(
+                    replace(
+                        entry,
+                        screen=screen,
+                        embedded_screen=entry.embedded_screen or embedded,
+                    )
+                    for entry in self._get_shown_entries(embedded, widget.macros)
+                )
+        self._unexpanded.setdefault(screen, []).extend(unexpanded)
+        self._defaults.setdefault(screen, dict(layout.macros))
+        self._entries.setdefault(screen, []).extend(
+            replace(entry, pv=expand_macros(entry.pv, layout.macros))
+            for entry in unexpanded
+        )
+
+    def add_shown_with(self, screen: str, macros: dict[str, str]) -> None:
+        """
+        Add the PVs of a database shown with the screen of another under its own
+        macros, listed for that screen, which must have been added before.
+        """
+        self._entries.setdefault(screen, []).extend(
+            self._get_shown_entries(screen, macros)
+        )
+
+    def to_bytes(self, output_format: str = "jsonl") -> bytes:
+        """
+        Serialize all entries as JSON Lines, or as CSV with a header row.
+        """
+        if output_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer, lineterminator="\n")
+            writer.writerow(field.name for field in fields(PVEntry))
+            for entry in self:
+                writer.writerow(
+                    "" if value is None else value for value in asdict(entry).values()
+                )
+            return buffer.getvalue().encode()
+        return "".join(json.dumps(asdict(entry)) + "\n" for entry in self).encode()
+
+    def write(self, path: str | Path) -> None:
+        """
+        Write all entries to a file, as CSV if it ends in .csv or else JSON Lines.
+        """
+        path = Path(path)
+        output_format = "csv" if path.suffix == ".csv" else "jsonl"
+        with tempfile.NamedTemporaryFile(
+            "wb", dir=path.parent, prefix=f".{path.name}.", delete=False
+        ) as f:
+            f.write(self.to_bytes(output_format))
+        # Readable by the tools consuming it, not only its owner
+        os.chmod(f.name, 0o644)
+        os.replace(f.name, path)
+        logger.info(f"Wrote {len(self)} PVs of {len(self._entries)} screens to {path}")
@@ -0,0 +1,169 @@
+import logging
+import mmap
+import re
+from collections.abc import Generator
+from pathlib import Path
+
+from epicsdbtools import (
+    Database,
+    LoadIncludesStrategy,
+    Record,
+    load_database_file,
+)
+
+logger = logging.getLogger("epicsdb2bob")
+
+_TOKEN_RE = re.compile(
+    rb'"((?:[^"\\]|\\.)*)"|([(){},])|([^\s(){},"#]+)|(#[^\n]*)|(\s+)|(.)', re.S
+)
+_STRING, _PUNCT, _WORD, _COMMENT, _WHITESPACE, _INVALID = range(1, 7)
+
+_RECORD_KEYWORDS = (b"record", b"grecord")
+_RECORD_BODY_KEYWORDS = (b"field", b"info")
+
+
+class UnsupportedSyntax(Exception):
+    """Raised when the fast-path scanner encounters a construct it can't handle."""
+
+
+class _TokenStream:
+    def __init__(self, data: bytes | mmap.mmap, token_re: re.Pattern = _TOKEN_RE):
+        # token_re must have the same groups, in the same order, as _TOKEN_RE
+        self._tokens = self._tokenize(data, token_re)
+        self._peeked: tuple[int, bytes] | None = None
+
+    @staticmethod
+    def _tokenize(
+        data: bytes | mmap.mmap, token_re: re.Pattern
+    ) -> Generator[tuple[int, bytes], None, None]:
+        for match in token_re.finditer(data):
+            kind = match.lastindex
+            if kind == _COMMENT or kind == _WHITESPACE:
+                continue
+            if kind == _INVALID or kind is None:
+                raise UnsupportedSyntax(f"Unexpected input at offset {match.start()}")
+            yield kind, match.group(kind)
+
+    def close(self) -> None:
+        self._tokens.close()
+
+    def next(self) -> tuple[int, bytes] | None:
+        if self._peeked is not None:
+            token, self._peeked = self._peeked, None
+            return token
+        return next(self._tokens, None)
+
+    def peek(self) -> tuple[int, bytes] | None:
+        if self._peeked is None:
+            self._peeked = next(self._tokens, None)
+        return self._peeked
+
+    def expect(self, punctuation: bytes) -> None:
+        token = self.next()
+        if token != (_PUNCT, punctuation):
+            raise UnsupportedSyntax(f"Expected {punctuation!r}, got {token!r}")
+
+    def value(self) -> str:
+        token = self.next()
+        if token is None or token[0] not in (_STRING, _WORD):
+            raise UnsupportedSyntax(f"Expected a value, got {token!r}")
+        return token[1].decode()
+
+
+def _scan_record_body(tokens: _TokenStream, record: Record) -> None:
+    while True:
+        token = tokens.next()
+        if token == (_PUNCT, b"}"):
+            return
+        if token is None or token[0] != _WORD:
+            raise UnsupportedSyntax(f"Unexpected token in record body: {token!r}")
+
+        if token[1] in _RECORD_BODY_KEYWORDS:
+            tokens.expect(b"(")
+            key = tokens.value()
+            tokens.expect(b",")
+            value = tokens.value()
+            tokens.expect(b")")
+            if token[1] == b"field":
+                record.fields[key] = value  # type: ignore
+            else:
+                record.infos[key] = value  # type: ignore
+        elif token[1] == b"alias":
+            tokens.expect(b"(")
+            tokens.value()
+            tokens.expect(b")")
+        else:
+            raise UnsupportedSyntax(f"Unsupported record body statement {token[1]!r}")
+
+
+def scan_database(data: bytes | mmap.mmap) -> Database:
+    """
+    Scan the contents of a database file, extracting records, fields and includes.
+    """
+    database = Database()
+    tokens = _TokenStream(data)
+    try:
+        _scan_top_level(tokens, database)
+    finally:
+        # Release the tokenizer so that an mmap backing it can be closed
+        tokens.close()
+    return database
+
+
+def _scan_top_level(tokens: _TokenStream, database: Database) -> None:
+    while (token := tokens.next()) is not None:
+        if token[0] != _WORD:
+            raise UnsupportedSyntax(f"Unexpected top level token {token!r}")
+
+        if token[1] in _RECORD_KEYWORDS:
+            tokens.expect(b"(")
+            rtyp = tokens.value()
+            tokens.expect(b",")
+            name = tokens.value()
+            tokens.expect(b")")
+            if name in database:
+                # Merging repeated record definitions is left to epicsdbtools
+                raise UnsupportedSyntax(f"Record {name} is defined more than once")
+
+            record = Record()
+            record.rtyp = rtyp  # type: ignore
+            record.name = name  # type: ignore
+            record.fields = {}  # type: ignore
+            record.infos = {}  # type: ignore
+            if tokens.peek() == (_PUNCT, b"{"):
+                tokens.next()
+                _scan_record_body(tokens, record)
+            database.add_record(record)
+        elif token[1] == b"include":
+            database.add_included_template(tokens.value(), database=None)
+        else:
+            raise UnsupportedSyntax(f"Unsupported top level statement {token[1]!r}")
+
+
+def _load_database_file_full(file_path: str | Path) -> Database:
+    return load_database_file(
+        file_path, load_includes_strategy=LoadIncludesStrategy.IGNORE
+    )
+
+
+def scan_database_file(file_path: str | Path) -> Database:
+    """
+    Load a database file with the fast-path scanner.
+
+    Only record headers, fields, info tags and includes are understood. Files using
+    any other construct are handed off to the full epicsdbtools parser instead.
+    """
+    try:
+        with open(file_path, "rb") as fp:
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                database = scan_database(data)
+    except (UnsupportedSyntax, UnicodeDecodeError, ValueError) as e:
+        # ValueError is raised by mmap for empty files
+        logger.debug(f"Falling back to full parser for {file_path}: {e}")
+        return _load_database_file_full(file_path)
+
+    if len(database) == 0 and not database.get_included_templates():
+        # Leave error reporting for files without any records to epicsdbtools
+        return _load_database_file_full(file_path)
+
+    return database
@@ -0,0 +1,177 @@
+import hashlib
+import json
+import logging
+import os
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from epicsdbtools import Database
+
+logger = logging.getLogger("epicsdb2bob")
+
+MANIFEST_VERSION = 1
+MERGED_MANIFEST_NAME = "epicsdb2bob-manifest.json"
+
+
+def parse_shard_spec(spec: str) -> tuple[int, int]:
+    """
+    Parse a shard specification of the form i/N, where shards are numbered 1 to N.
+    """
+    try:
+        index_str, count_str = spec.split("/")
+        index, count = int(index_str), int(count_str)
+    except ValueError as e:
+        raise ValueError(f"Invalid shard {spec}, expected the form i/N.") from e
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Invalid shard {spec}, i must be between 1 and N.")
+    return index, count
+
+
+def get_shard_manifest_name(shard_index: int, shard_count: int) -> str:
+    return f"epicsdb2bob-shard-{shard_index}-of-{shard_count}.json"
+
+
+def stable_shard(key: str, shard_count: int) -> int:
+    """
+    Map a key onto a shard number, identically on every machine and Python run.
+    """
+    digest = hashlib.sha256(key.encode()).digest()
+    return int.from_bytes(digest[:8], "big") % shard_count + 1
+
+
+def _template_name(template: str) -> str:
+    return os.path.splitext(os.path.basename(template))[0]
+
+
+def group_databases_by_includes(
+    databases: "dict[str, Database]",
+    substitutions: "dict[str, list[str]] | None" = None,
+) -> dict[str, str]:
+    """
+    Map each database name to a group key shared by all databases that are
+    connected to it through includes, or embedded by the same substitutions file.
+    """
+    parents = {name: name for name in databases}
+
+    def find(name: str) -> str:
+        while parents[name] != name:
+            parents[name] = parents[parents[name]]
+            name = parents[name]
+        return name
+
+    def union(name: str, other_name: str) -> None:
+        root, other_root = find(name), find(other_name)
+        # Use the smallest name as the root so group keys are deterministic
+        parents[max(root, other_root)] = min(root, other_root)
+
+    for name, database in databases.items():
+        for include in database.get_included_templates():
+            included_name = _template_name(include)
+            if included_name in parents:
+                union(name, included_name)
+
+    for templates in (substitutions or {}).values():
+        embedded = [
+            _template_name(t) for t in templates if _template_name(t) in parents
+        ]
+        for embedded_name in embedded[1:]:
+            union(embedded[0], embedded_name)
+
+    return {name: find(name) for name in databases}
+
+
+def assign_shards(
+    databases: "dict[str, Database]",
+    substitutions: dict[str, list[str]],
+    shard_count: int,
+) -> tuple[dict[str, int], dict[str, int]]:
+    """
+    Assign each database and substitutions file to a shard. Databases related by
+    includes are kept together, and substitutions files go to the shard of the
+    databases they embed, so the sizes of embedded screens are always known.
+    """
+    groups = group_databases_by_includes(databases, substitutions)
+    database_shards = {
+        name: stable_shard(group, shard_count) for name, group in groups.items()
+    }
+    substitution_shards = {}
+    for substitution, templates in substitutions.items():
+        embedded = [_template_name(t) for t in templates if _template_name(t) in groups]
+        substitution_shards[substitution] = (
+            database_shards[embedded[0]]
+            if embedded
+            else stable_shard(substitution, shard_count)
+        )
+    return database_shards, substitution_shards
+
+
+@dataclass
+class ShardManifest:
+    """Dimensions of the screens written by one shard, or by all shards once merged."""
+
+    shard_count: int
+    shard_index: int | None = None  # None once merged
+    screens: dict[str, tuple[int, int]] = field(default_factory=dict)
+
+    def add_screen(self, file_name: str, height: int, width: int) -> None:
+        self.screens[file_name] = (height, width)
+
+    def write(self, file_path: str | Path) -> None:
+        data = {
+            "version": MANIFEST_VERSION,
+            "shard_count": self.shard_count,
+            "shard_index": self.shard_index,
+            "screens": {
+                name: {"height": height, "width": width}
+                for name, (height, width) in sorted(self.screens.items())
+            },
+        }
+        with open(file_path, "w") as fp:
+            json.dump(data, fp, indent=2)
+
+    @staticmethod
+    def read(file_path: str | Path) -> "ShardManifest":
+        with open(file_path) as fp:
+            data = json.load(fp)
+        if data.get("version") != MANIFEST_VERSION:
+            raise ValueError(
+                f"Unsupported manifest version {data.get('version')} in {file_path}."
+            )
+        return ShardManifest(
+            shard_count=data["shard_count"],
+            shard_index=data.get("shard_index"),
+            screens={
+                name: (size["height"], size["width"])
+                for name, size in data["screens"].items()
+            },
+        )
+
+
+def merge_manifests(manifests: Iterable[ShardManifest]) -> ShardManifest:
+    manifests = list(manifests)
+    if not manifests:
+        raise ValueError("No manifests to merge.")
+
+    shard_counts = {manifest.shard_count for manifest in manifests}
+    if len(shard_counts) > 1:
+        raise ValueError(f"Manifests come from different shard counts: {shard_counts}")
+
+    merged = ShardManifest(shard_count=shard_counts.pop())
+    for manifest in manifests:
+        for name, size in manifest.screens.items():
+            if name in merged.screens and merged.screens[name] != size:
+                logger.warning(
+                    f"Screen {name} has conflicting sizes {merged.screens[name]} "
+                    f"and {size} across shards, using the latter."
+                )
+            merged.screens[name] = size
+
+    seen_shards = {m.shard_index for m in manifests if m.shard_index is not None}
+    missing = set(range(1, merged.shard_count + 1)) - seen_shards
+    if missing:
+        logger.warning(f"No manifests were given for shards {sorted(missing)}.")
+
+    return merged
@@ -0,0 +1,212 @@
+import logging
+import mmap
+import os
+import re
+import sys
+from collections.abc import Iterable, Iterator, Sequence
+from pathlib import Path
+from typing import overload
+
+from .scanner import (
+    _PUNCT,
+    _STRING,
+    _WORD,
+    UnsupportedSyntax,
+    _TokenStream,
+)
+
+logger = logging.getLogger("epicsdb2bob")
+
+# As the database scanner's tokens, but with = as punctuation and () inside words
+_SUBSTITUTIONS_TOKEN_RE = re.compile(
+    rb'"((?:[^"\\]|\\.)*)"|([{},=])|([^\s{},="#]+)|(#[^\n]*)|(\s+)|(.)', re.S
+)
+
+
+class TemplateInstances(Sequence[dict[str, str]]):
+    """
+    Macros for each instance of a template, stored column-wise. Rows sharing the
+    same macro names are kept in a block holding one tuple of names and a tuple of
+    values per row, so names are not repeated for every instance. Instances are
+    only turned into dicts when accessed.
+    """
+
+    __slots__ = ("blocks", "_length")
+
+    def __init__(self) -> None:
+        self.blocks: list[tuple[tuple[str, ...], list[tuple[str, ...]]]] = []
+        self._length = 0
+
+    @staticmethod
+    def from_dicts(instances: Iterable[dict[str, str]]) -> "TemplateInstances":
+        template_instances = TemplateInstances()
+        for instance in instances:
+            template_instances.add_row(
+                tuple(map(sys.intern, instance)),
+                tuple(map(sys.intern, instance.values())),
+            )
+        return template_instances
+
+    def add_row(self, keys: tuple[str, ...], values: tuple[str, ...]) -> None:
+        if not self.blocks or self.blocks[-1][0] != keys:
+            self.blocks.append((keys, []))
+        self.blocks[-1][1].append(values)
+        self._length += 1
+
+    def extend(self, other: "TemplateInstances") -> None:
+        for keys, rows in other.blocks:
+            for row in rows:
+                self.add_row(keys, row)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[dict[str, str]]:
+        for keys, rows in self.blocks:
+            for row in rows:
+                yield dict(zip(keys, row, strict=True))
+
+    @overload
+    def __getitem__(self, index: int) -> dict[str, str]: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[dict[str, str]]: ...
+
+    def __getitem__(self, index: int | slice) -> dict[str, str] | list[dict[str, str]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("TemplateInstances index out of range")
+        for keys, rows in self.blocks:
+            if index < len(rows):
+                return dict(zip(keys, rows[index], strict=True))
+            index -= len(rows)
+        raise IndexError("TemplateInstances index out of range")  # pragma: no cover
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Sequence):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"TemplateInstances({list(self)!r})"
+
+
+Substitution = dict[str, TemplateInstances]
+
+
+def _scan_values(tokens: _TokenStream) -> list[str]:
+    # Comma or whitespace separated values up to the closing brace
+    values = []
+    while True:
+        token = tokens.next()
+        if token == (_PUNCT, b"}"):
+            return values
+        if token == (_PUNCT, b","):
+            continue
+        if token is None or token[0] not in (_STRING, _WORD):
+            raise UnsupportedSyntax(f"Expected a value, got {token!r}")
+        values.append(sys.intern(token[1].decode()))
+
+
+def _scan_definitions(tokens: _TokenStream) -> tuple[list[str], list[str]]:
+    # name=value pairs up to the closing brace
+    keys, values = [], []
+    while True:
+        token = tokens.next()
+        if token == (_PUNCT, b"}"):
+            return keys, values
+        if token == (_PUNCT, b","):
+            continue
+        if token is None or token[0] not in (_STRING, _WORD):
+            raise UnsupportedSyntax(f"Expected a macro name, got {token!r}")
+        tokens.expect(b"=")
+        keys.append(sys.intern(token[1].decode()))
+        values.append(sys.intern(tokens.value()))
+
+
+def _scan_file_block(tokens: _TokenStream) -> TemplateInstances:
+    instances = TemplateInstances()
+    pattern_keys: tuple[str, ...] | None = None
+    while True:
+        token = tokens.next()
+        if token == (_PUNCT, b"}"):
+            return instances
+        if token == (_WORD, b"pattern"):
+            tokens.expect(b"{")
+            pattern_keys = tuple(_scan_values(tokens))
+        elif token == (_PUNCT, b"{"):
+            if pattern_keys is not None:
+                values = _scan_values(tokens)
+                if len(values) != len(pattern_keys):
+                    raise UnsupportedSyntax(
+                        f"Row {values} does not match pattern {pattern_keys}"
+                    )
+                instances.add_row(pattern_keys, tuple(values))
+            else:
+                keys, values = _scan_definitions(tokens)
+                instances.add_row(tuple(keys), tuple(values))
+        else:
+            raise UnsupportedSyntax(f"Unexpected token in file block: {token!r}")
+
+
+def scan_substitutions(
+    data: bytes | mmap.mmap,
+) -> Iterator[tuple[str, TemplateInstances]]:
+    """
+    Scan substitutions, yielding the instances of each file block as soon as it
+    has been read. Only file blocks holding pattern or name=value rows are
+    understood, any other construct raises UnsupportedSyntax.
+    """
+    tokens = _TokenStream(data, _SUBSTITUTIONS_TOKEN_RE)
+    try:
+        while (token := tokens.next()) is not None:
+            if token != (_WORD, b"file"):
+                raise UnsupportedSyntax(f"Unsupported top level statement {token!r}")
+            template = tokens.value()
+            tokens.expect(b"{")
+            yield template, _scan_file_block(tokens)
+    finally:
+        tokens.close()
+
+
+def stream_substitution_file(
+    file_path: str | Path,
+) -> Iterator[tuple[str, TemplateInstances]]:
+    """
+    Read a substitutions file one file block at a time. The same template may be
+    yielded more than once if it has several blocks.
+    """
+    with open(file_path, "rb") as fp:
+        if os.fstat(fp.fileno()).st_size == 0:
+            return
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield from scan_substitutions(data)
+
+
+def read_substitution_file(file_path: str | Path) -> Substitution:
+    """
+    Read a substitutions file into columnar instances per template, falling back
+    to epicsdbtools for syntax the streaming reader doesn't understand.
+    """
+    substitution: Substitution = {}
+    try:
+        for template, instances in stream_substitution_file(file_path):
+            if template in substitution:
+                substitution[template].extend(instances)
+            else:
+                substitution[template] = instances
+        return substitution
+    except (UnsupportedSyntax, UnicodeDecodeError) as e:
+        logger.debug(f"Falling back to full parser for {file_path}: {e}")
+
+    from epicsdbtools import load_template_file
+
+    substitution = {}
+    for template, macros in load_template_file(file_path):
+        substitution.setdefault(template, TemplateInstances()).add_row(
+            tuple(map(sys.intern, macros)), tuple(map(sys.intern, macros.values()))
+        )
+    return substitution
@@ -0,0 +1,85 @@
+import csv
+import logging
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+import yaml
+
+from .config import AnyConfig, MacroSetLevel
+from .layout import ScreenLayout
+
+logger = logging.getLogger("epicsdb2bob")
+
+
+@dataclass
+class MacroSet:
+    """One variant of a screen, named for the file it is written to."""
+
+    name: str
+    macros: dict[str, str]
+
+
+def _to_macro_set(index: int, row: dict) -> MacroSet:
+    macros = {str(key): str(value) for key, value in row.items() if value is not None}
+    name = macros.pop("name", None) or str(index + 1)
+    return MacroSet(name, macros)
+
+
+def load_macro_sets(file_path: str | Path) -> list[MacroSet]:
+    """
+    Load a table of macro sets. CSV files have a header row of macro names, YAML
+    files hold a list of mappings, or a mapping of variant name to macros. A name
+    column or key names the variant, otherwise variants are numbered from 1.
+    """
+    file_path = Path(file_path)
+    with open(file_path, newline="") as f:
+        if file_path.suffix == ".csv":
+            rows: list[dict] = list(csv.DictReader(f))
+        else:
+            data = yaml.safe_load(f) or []
+            if isinstance(data, dict):
+                rows = [{"name": name, **macros} for name, macros in data.items()]
+            else:
+                rows = list(data)
+
+    macro_sets = [_to_macro_set(i, row) for i, row in enumerate(rows)]
+    names = [macro_set.name for macro_set in macro_sets]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Macro set names {duplicates} in {file_path} are not unique")
+    logger.info(f"Loaded {len(macro_sets)} macro sets from {file_path}")
+    return macro_sets
+
+
+def macroize_pv_name(pv_name: str, macros: dict[str, str]) -> str:
+    """
+    Replace macro values in a PV name with references to the macros.
+    """
+    for macro_name, macro_value in macros.items():
+        pv_name = pv_name.replace(macro_value, f"$({macro_name})")
+    return pv_name
+
+
+def apply_macro_set(
+    layout: ScreenLayout, macros: dict[str, str], config: AnyConfig
+) -> ScreenLayout:
+    """
+    Derive the variant of a layout for a macro set. The layout must have been made
+    without macros. Only widgets with PVs are copied, everything else is shared
+    with the base layout, so it must not be modified afterwards. Variant screens
+    are opened on their own, so their macros are set on the screen unless they
+    are set at the widget level.
+    """
+    widgets = layout.widgets
+    if config.macro_set_level != MacroSetLevel.WIDGET and macros:
+        widgets = [
+            replace(widget, pv_name=macroize_pv_name(widget.pv_name, macros))
+            if widget.pv_name
+            else widget
+            for widget in widgets
+        ]
+    return replace(
+        layout,
+        macros=dict(macros) if config.macro_set_level != MacroSetLevel.WIDGET else {},
+        widgets=widgets,
+    )
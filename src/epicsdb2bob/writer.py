@@ -0,0 +1,186 @@
+import logging
+import multiprocessing
+import os
+import threading
+from collections.abc import Iterable
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+from .archive import ScreenArchive
+from .artifacts import ArtifactCache
+from .emitters import SERIALIZERS, serialize_bob_chunked
+from .layout import ScreenLayout
+
+logger = logging.getLogger("epicsdb2bob")
+
+DEFAULT_CHUNK_SIZE = 5000
+
+
+class ParallelWriter:
+    """
+    Serializes and writes screens on a pool of threads, so that writing overlaps
+    laying out the next screen. Layouts must not be modified once submitted. With
+    no workers, screens are written as they are submitted. Given an archive,
+    screens are added to it, named for the last part of their base path. Given an
+    artifact cache, screens with a source digest are also stored in it.
+
+    Given chunk workers, the widgets of .bob screens with more than chunk_size of
+    them are serialized in chunks on a pool of that many processes, so that a
+    single large screen is not limited to one core.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        archive: ScreenArchive | None = None,
+        artifacts: ArtifactCache | None = None,
+        chunk_workers: int = 0,
+        chunk_size: int | None = None,
+    ) -> None:
+        self.archive = archive
+        self.artifacts = artifacts
+        self.chunk_workers = chunk_workers
+        self.chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+        self._chunk_executor: ProcessPoolExecutor | None = None
+        self._chunk_lock = threading.Lock()
+        self._executor = (
+            ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="epicsdb2bob-writer"
+            )
+            if max_workers > 0
+            else None
+        )
+        self._futures: list[Future[list[str]]] = []
+        self._written: list[str] = []
+
+    def _write(
+        self,
+        layout: ScreenLayout,
+        base_path: str | Path,
+        formats: list[str],
+        source: str | None,
+    ) -> list[str]:
+        files = {
+            output_format: self._serialize(layout, output_format)
+            for output_format in formats
+        }
+        if self.artifacts is not None and source is not None:
+            self.artifacts.store_screen(
+                os.path.basename(base_path), source, files, layout.height, layout.width
+            )
+        return self._write_files(base_path, files, layout.height, layout.width, source)
+
+    def _serialize(self, layout: ScreenLayout, output_format: str) -> bytes:
+        if (
+            output_format == "bob"
+            and self.chunk_workers > 0
+            and len(layout.widgets) > self.chunk_size
+        ):
+            with self._chunk_lock:
+                # Started on first use, as most screens are too small to split
+                if self._chunk_executor is None:
+                    self._chunk_executor = ProcessPoolExecutor(
+                        self.chunk_workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+            logger.debug(
+                f"Serializing {len(layout.widgets)} widgets of {layout.name} in "
+                f"chunks of {self.chunk_size}"
+            )
+            return serialize_bob_chunked(layout, self._chunk_executor, self.chunk_size)
+        return SERIALIZERS[output_format](layout)
+
+    def _shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        if self._chunk_executor is not None:
+            self._chunk_executor.shutdown(wait=True, cancel_futures=True)
+
+    def _write_files(
+        self,
+        base_path: str | Path,
+        files: dict[str, bytes],
+        height: int,
+        width: int,
+        source: str | None,
+    ) -> list[str]:
+        if self.archive is not None:
+            return self.archive.add_serialized(
+                os.path.basename(base_path), files, height, width, source
+            )
+        written = []
+        for output_format, data in files.items():
+            file_path = f"{base_path}.{output_format}"
+            Path(file_path).write_bytes(data)
+            written.append(file_path)
+        return written
+
+    def submit(
+        self,
+        layout: ScreenLayout,
+        base_path: str | Path,
+        formats: Iterable[str],
+        source: str | None = None,
+    ) -> None:
+        """
+        Write a layout in each format. The source digest of its inputs is recorded
+        in the manifest of an archive, so unchanged screens can later be reused.
+        """
+        if self._executor is None:
+            self._written.extend(self._write(layout, base_path, list(formats), source))
+            return
+        self._futures.append(
+            self._executor.submit(self._write, layout, base_path, list(formats), source)
+        )
+
+    def submit_files(
+        self,
+        base_path: str | Path,
+        files: dict[str, bytes],
+        height: int,
+        width: int,
+        source: str | None = None,
+    ) -> None:
+        """
+        Write a screen already serialized in each format, such as one fetched from
+        an artifact cache.
+        """
+        if self._executor is None:
+            self._written.extend(
+                self._write_files(base_path, files, height, width, source)
+            )
+            return
+        self._futures.append(
+            self._executor.submit(
+                self._write_files, base_path, files, height, width, source
+            )
+        )
+
+    def close(self) -> list[str]:
+        """
+        Wait for all writes to finish, raising the first error, and return the
+        paths written.
+        """
+        written = self._written
+        try:
+            for future in self._futures:
+                written.extend(future.result())
+        finally:
+            self._shutdown()
+        logger.debug(f"Wrote {len(written)} files")
+        return written
+
+    def abort(self) -> None:
+        """
+        Stop writing, discarding screens not written yet.
+        """
+        self._shutdown()
+
+    def __enter__(self) -> "ParallelWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if exc_info[0] is None:
+            self.close()
+        else:
+            self.abort()
@@ -0,0 +1,83 @@
+from pathlib import Path
+
+from epicsdb2bob.analysis import (
+    AnalysisThresholds,
+    analyze_screens,
+    format_analysis,
+    read_screen_file_info,
+)
+from epicsdb2bob.bobfile_gen import generate_bobfile_for_db
+
+
+def write_embedding_screen(path: Path, embeds: list[str], pvs: list[str]) -> None:
+    widgets = "".join(
+        f'<widget type="embedded" version="2.0.0"><file>{embed}</file></widget>'
+        for embed in embeds
+    ) + "".join(
+        f'<widget type="textupdate" version="2.0.0"><pv_name>{pv}</pv_name></widget>'
+        for pv in pvs
+    )
+    path.write_text(
+        f"<display><width>100</width><height>50</height>{widgets}</display>"
+    )
+
+
+def test_read_screen_file_info(tmp_path: Path, simple_db, default_config):
+    path = tmp_path / "test.bob"
+    generate_bobfile_for_db("test", simple_db, {}, default_config).write_screen(
+        str(path)
+    )
+
+    info = read_screen_file_info(path)
+    assert info.pvs == frozenset(simple_db)
+    assert info.widget_count > len(simple_db)
+    assert info.embeds == []
+    assert info.byte_size == path.stat().st_size
+    assert info.width > 0 and info.height > 0
+
+
+def test_analyze_screens_follows_embeds(tmp_path: Path):
+    screens = tmp_path / "screens"
+    library = tmp_path / "library"
+    screens.mkdir()
+    library.mkdir()
+    write_embedding_screen(screens / "top.bob", ["mid.bob", "mid.bob"], ["A"])
+    write_embedding_screen(screens / "mid.bob", ["leaf.bob"], ["B", "B"])
+    write_embedding_screen(library / "leaf.bob", [], ["C", "D"])
+
+    results = {
+        Path(metrics.path).name: metrics
+        for metrics in analyze_screens([screens], search_path=[library], workers=1)
+    }
+    assert sorted(results) == ["mid.bob", "top.bob"]
+
+    top = results["top.bob"]
+    assert top.embed_fanout == 2
+    assert top.embed_depth == 2
+    assert top.pv_count == 1
+    assert top.total_pv_count == 1 + 2 * (1 + 2)
+    assert top.total_widget_count == 3 + 2 * (3 + 2)
+    assert results["mid.bob"].embed_depth == 1
+
+
+def test_analyze_screens_in_parallel_matches_serial(tmp_path: Path):
+    for i in range(6):
+        write_embedding_screen(tmp_path / f"screen_{i}.bob", [], [f"PV{i}"] * i)
+    serial = analyze_screens([tmp_path], workers=1)
+    parallel = analyze_screens([tmp_path], workers=2)
+    assert [m.to_dict() for m in serial] == [m.to_dict() for m in parallel]
+
+
+def test_analyze_screens_handles_recursive_embeds(tmp_path: Path):
+    write_embedding_screen(tmp_path / "a.bob", ["b.bob"], [])
+    write_embedding_screen(tmp_path / "b.bob", ["a.bob"], [])
+    results = analyze_screens([tmp_path / "a.bob"], workers=1)
+    assert results[0].embed_depth == 1
+
+
+def test_thresholds_flag_screens(tmp_path: Path):
+    write_embedding_screen(tmp_path / "big.bob", [], ["A", "B", "C"])
+    thresholds = AnalysisThresholds(max_widgets=2, max_pvs=2, max_area=1000)
+    (metrics,) = analyze_screens([tmp_path], thresholds, workers=1)
+    assert metrics.violations == ["widgets 3 > 2", "PVs 3 > 2", "area 5000 > 1000"]
+    assert "1 over budget" in format_analysis([metrics])
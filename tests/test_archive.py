@@ -0,0 +1,165 @@
+import json
+import sys
+import tarfile
+import zipfile
+from pathlib import Path
+
+import pytest
+from epicsdbtools import Database
+
+from epicsdb2bob import archive, bobfile_gen
+from epicsdb2bob.__main__ import main
+from epicsdb2bob.archive import (
+    ARCHIVE_MANIFEST_NAME,
+    ScreenArchive,
+    get_database_source,
+    get_substitution_source,
+    is_archive_path,
+    read_archive_manifest,
+)
+from epicsdb2bob.bobfile_gen import get_external_readbacks, layout_database
+from epicsdb2bob.emitters import serialize_bob
+from epicsdb2bob.pv_index import PVIndex
+from epicsdb2bob.writer import ParallelWriter
+
+
+def read_member(path: Path, name: str) -> bytes:
+    if path.suffix == ".zip":
+        return zipfile.ZipFile(path).read(name)
+    return tarfile.open(path).extractfile(name).read()  # type: ignore
+
+
+@pytest.mark.parametrize("archive_name", ["screens.zip", "screens.tar.gz"])
+def test_screens_are_streamed_into_archive(
+    tmp_path: Path, archive_name, db_with_readbacks, default_config
+):
+    path = tmp_path / archive_name
+    layout = layout_database("test", db_with_readbacks, {}, default_config)
+    with ScreenArchive(path) as archive:
+        archive.add("test", layout, ["bob", "opi"], "source")
+
+    assert list(tmp_path.iterdir()) == [path]
+    manifest = read_archive_manifest(path)
+    assert sorted(manifest) == ["test.bob", "test.opi"]
+    assert manifest["test.bob"].height == layout.height
+    assert manifest["test.bob"].width == layout.width
+    assert read_member(path, "test.bob") == serialize_bob(layout)
+    assert json.loads(read_member(path, ARCHIVE_MANIFEST_NAME))["version"] == 1
+
+
+def test_unchanged_screens_are_reused(tmp_path: Path, simple_db, default_config):
+    path = tmp_path / "screens.zip"
+    layout = layout_database("test", simple_db, {}, default_config)
+    with ScreenArchive(path) as archive:
+        archive.add("test", layout, ["bob"], "one")
+        archive.add("gone", layout, ["bob"], "one")
+    original = read_member(path, "test.bob")
+
+    with ScreenArchive(path, previous=path) as archive:
+        assert archive.reuse("test", ["bob"], "two") is None
+        assert archive.reuse("test", ["bob", "opi"], "one") is None
+        assert archive.reuse("test", ["bob"], "one") == (layout.height, layout.width)
+
+    assert read_member(path, "test.bob") == original
+    assert list(read_archive_manifest(path)) == ["test.bob"]
+
+
+def test_aborted_archive_keeps_previous(tmp_path: Path, simple_db, default_config):
+    path = tmp_path / "screens.tar"
+    layout = layout_database("test", simple_db, {}, default_config)
+    with ScreenArchive(path) as archive:
+        archive.add("test", layout, ["bob"])
+
+    with pytest.raises(RuntimeError):
+        with ScreenArchive(path, previous=path) as archive:
+            raise RuntimeError()
+
+    assert list(read_archive_manifest(path)) == ["test.bob"]
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_failed_run_aborts_archive_and_writer(tmp_path: Path, monkeypatch):
+    input_path = tmp_path / "in"
+    input_path.mkdir()
+    (input_path / "motor.template").write_text(
+        'record(ao, "$(P)Pos") {\n    field(DESC, "Position")\n}\n'
+    )
+    (input_path / "ioc.substitutions").write_text(
+        'file "motor.template" {\n    { P=XF:1: }\n}\n'
+    )
+    path = tmp_path / "out" / "screens.zip"
+    path.parent.mkdir()
+    aborted = []
+    abort = ParallelWriter.abort
+    monkeypatch.setattr(
+        ParallelWriter, "abort", lambda self: aborted.append(abort(self))
+    )
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("generation failed")
+
+    # Fails once the database screen was written, laying out the substitution
+    monkeypatch.setattr(bobfile_gen, "layout_substitution", fail)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(
+        sys, "argv", ["epicsdb2bob", str(input_path), str(path), "--no_cache"]
+    )
+    with pytest.raises(RuntimeError, match="generation failed"):
+        main()
+
+    assert len(aborted) == 1
+    assert list(path.parent.iterdir()) == []
+
+
+def test_parallel_writer_adds_to_archive(tmp_path: Path, simple_db, default_config):
+    path = tmp_path / "screens.zip"
+    layout = layout_database("test", simple_db, {}, default_config)
+    archive = ScreenArchive(path)
+    with ParallelWriter(2, archive) as writer:
+        for i in range(5):
+            writer.submit(layout, tmp_path / f"screen_{i}", ["bob", "ui"])
+    archive.close()
+
+    assert len(read_archive_manifest(path)) == 10
+    assert not list(tmp_path.glob("*.bob"))
+
+
+def test_database_source(tmp_path: Path, simple_record_factory, default_config):
+    database_path = tmp_path / "test.db"
+    database_path.write_text('record(ao, "X") {}\n')
+    local = Database()
+    local.add_record(simple_record_factory("ao", "X"))
+    other = Database()
+    other.add_record(simple_record_factory("ai", "X_RBV"))
+    readbacks = get_external_readbacks(
+        "local",
+        local,
+        default_config,
+        default_config.snapshot().record_filter,
+        PVIndex.build({"local": local, "other": other}),
+    )
+    assert [readback.name for readback in readbacks] == ["X_RBV"]
+
+    source = get_database_source("config", database_path, {}, readbacks)
+    assert source == get_database_source("config", database_path, {}, readbacks)
+    assert source != get_database_source("config", database_path, {}, [])
+    assert source != get_database_source("config", database_path, {"P": "A"}, [])
+    database_path.write_text('record(ao, "Y") {}\n')
+    assert source != get_database_source("config", database_path, {}, readbacks)
+
+
+def test_sources_depend_on_version(monkeypatch, tmp_path: Path):
+    database_path = tmp_path / "local.db"
+    database_path.write_text('record(ao, "X") {}\n')
+    source = get_database_source("config", database_path, {}, [])
+    substitution_source = get_substitution_source("config", database_path, {})
+
+    monkeypatch.setattr(archive, "__version__", "0.0")
+    assert source != get_database_source("config", database_path, {}, [])
+    assert substitution_source != get_substitution_source("config", database_path, {})
+
+
+def test_is_archive_path():
+    assert is_archive_path("screens.tar.gz")
+    assert is_archive_path("out/screens.zip")
+    assert not is_archive_path("out/screens")
@@ -0,0 +1,181 @@
+import pickle
+import subprocess
+import sys
+import threading
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from epicsdb2bob.artifacts import (
+    ArtifactCache,
+    ArtifactStore,
+    DirectoryStore,
+    HTTPStore,
+    open_artifact_store,
+)
+from epicsdb2bob.bobfile_gen import layout_database
+from epicsdb2bob.cache import ParseCache
+from epicsdb2bob.writer import ParallelWriter
+
+
+class StoreHandler(BaseHTTPRequestHandler):
+    """Stand-in for a shared artifact store, keeping entries in memory."""
+
+    entries: dict[str, bytes]
+    fail: bool
+
+    def do_GET(self) -> None:
+        if self.fail:
+            self.send_error(500)
+        elif self.path in self.entries:
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(self.entries[self.path])
+        else:
+            self.send_error(404)
+
+    def do_PUT(self) -> None:
+        self.entries[self.path] = self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(201)
+        self.end_headers()
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def http_store() -> Iterator[tuple[str, type[StoreHandler]]]:
+    handler = type("Handler", (StoreHandler,), {"entries": {}, "fail": False})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/artifacts", handler
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def db_file(tmp_path: Path) -> Path:
+    db_file = tmp_path / "in" / "test.db"
+    db_file.parent.mkdir()
+    db_file.write_text('record(ai, "test_ai_1") {\n    field(DESC, "AI")\n}\n')
+    return db_file
+
+
+def test_artifact_store_is_abstract():
+    with pytest.raises(TypeError):
+        ArtifactStore()  # type: ignore[abstract]
+
+    class GetOnly(ArtifactStore):
+        def get(self, key: str) -> bytes | None:
+            return None
+
+    with pytest.raises(TypeError):
+        GetOnly()  # type: ignore[abstract]
+
+
+def test_directory_store(tmp_path: Path):
+    store = open_artifact_store(str(tmp_path / "store"))
+    assert isinstance(store, DirectoryStore)
+    assert store.get("ab12") is None
+    store.put("ab12", b"data")
+    assert store.get("ab12") == b"data"
+    assert store.path_for("ab12").stat().st_mode & 0o777 == 0o644
+
+
+def test_http_store(http_store):
+    url, handler = http_store
+    store = open_artifact_store(url)
+    assert isinstance(store, HTTPStore)
+    assert store.get("ab12") is None
+    store.put("ab12", b"data")
+    assert handler.entries == {"/artifacts/ab12": b"data"}
+    assert store.get("ab12") == b"data"
+
+    # Errors other than missing entries stop the store being used
+    handler.fail = True
+    assert store.get("ab12") is None
+    handler.fail = False
+    assert store.get("ab12") is None
+    assert not store.available
+
+
+def test_unreachable_http_store(caplog):
+    store = HTTPStore("http://127.0.0.1:9/artifacts", timeout=1)
+    assert store.get("ab12") is None
+    store.put("ab12", b"data")
+    assert not store.available
+    assert len(caplog.records) == 1
+
+
+def test_parse_cache_fetches_shared_entries(tmp_path: Path, db_file: Path, simple_db):
+    shared = DirectoryStore(tmp_path / "shared")
+    ParseCache(tmp_path / "agent1", shared).store(db_file, simple_db)
+
+    cache = ParseCache(tmp_path / "agent2", shared)
+    assert list(cache.load(db_file)) == list(simple_db)  # type: ignore
+    assert (cache.hits, cache.shared_hits) == (1, 1)
+    # Kept locally for the next run
+    assert cache._entry_path(cache.key_for(db_file)).exists()
+
+
+def test_parse_cache_never_unpickles_shared_entries(
+    tmp_path: Path, db_file: Path, simple_db
+):
+    shared = DirectoryStore(tmp_path / "shared")
+    cache = ParseCache(tmp_path / "agent1", shared)
+    key = cache.key_for(db_file)
+    shared.put(key, pickle.dumps(simple_db))
+
+    assert cache.load(db_file) is None
+    assert shared.get(key) is None
+
+
+def test_screens_round_trip(tmp_path: Path, http_store, simple_db, default_config):
+    layout = layout_database("test", simple_db, {}, default_config)
+    artifacts = ArtifactCache(HTTPStore(http_store[0]))
+    with ParallelWriter(2, artifacts=artifacts) as writer:
+        writer.submit(layout, tmp_path / "test", ["bob", "ui"], "source1")
+
+    fetched = ArtifactCache(HTTPStore(http_store[0])).load_screen(
+        "test", "source1", ["bob"]
+    )
+    assert fetched is not None
+    height, width, files = fetched
+    assert (height, width) == (layout.height, layout.width)
+    assert files["bob"] == (tmp_path / "test.bob").read_bytes()
+    assert artifacts.load_screen("test", "source1", ["bob", "opi"]) is None
+    assert artifacts.load_screen("other", "source1", ["bob"]) is None
+    assert (
+        ArtifactCache(artifacts.store, "0.0").load_screen("test", "source1", ["bob"])
+        is None
+    )
+
+
+def test_cli_fetches_screens(tmp_path: Path, http_store, db_file: Path):
+    outputs = []
+    for agent in ["agent1", "agent2"]:
+        output = tmp_path / agent / "screens"
+        output.mkdir(parents=True)
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "epicsdb2bob",
+                str(db_file.parent),
+                str(output),
+                "--artifact_store",
+                http_store[0],
+                "--cache_dir",
+                str(tmp_path / agent / "cache"),
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        outputs.append((output / "test.bob").read_bytes())
+    assert "1 screens fetched, 0 stored" in result.stderr
+    assert "1 hits, of which 1 shared" in result.stderr
+    assert outputs[0] == outputs[1]
@@ -0,0 +1,112 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from epicsdb2bob import cache as cache_module
+from epicsdb2bob.cache import ParseCache, default_cache_dir, get_parse_variant
+
+
+@pytest.fixture
+def db_file(tmp_path: Path) -> Path:
+    db_file = tmp_path / "test.template"
+    db_file.write_text('record(ai, "test_ai_1") {\n    field(DESC, "AI")\n}\n')
+    return db_file
+
+
+def test_default_cache_dir_follows_xdg(monkeypatch, tmp_path: Path):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert default_cache_dir() == tmp_path / "epicsdb2bob"
+
+
+def test_parse_cache_round_trip(tmp_path: Path, db_file: Path, simple_db):
+    cache = ParseCache(tmp_path / "cache")
+    assert cache.load(db_file) is None
+    cache.store(db_file, simple_db)
+
+    loaded = cache.load(db_file)
+    assert loaded is not None
+    assert list(loaded.keys()) == list(simple_db.keys())
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+def test_parse_cache_key_changes_with_content(tmp_path: Path, db_file: Path, simple_db):
+    cache = ParseCache(tmp_path / "cache")
+    cache.store(db_file, simple_db)
+    db_file.write_text('record(ao, "test_ao_1") {}\n')
+    assert cache.load(db_file) is None
+
+
+def test_parse_cache_key_changes_with_parser_version(
+    tmp_path: Path, db_file: Path, simple_db
+):
+    cache = ParseCache(tmp_path / "cache")
+    cache.store(db_file, simple_db)
+    cache.parser_version = "0.0.0-other"
+    assert cache.load(db_file) is None
+
+
+def test_parse_cache_key_changes_with_version_and_settings(
+    tmp_path: Path, db_file: Path, simple_db
+):
+    cache = ParseCache(tmp_path / "cache")
+    cache.store(db_file, simple_db, get_parse_variant(True))
+    assert cache.load(db_file, get_parse_variant(False)) is None
+    cache.version = "0.0.0-other"
+    assert cache.load(db_file, get_parse_variant(True)) is None
+
+
+def test_parse_cache_hashes_files_once(
+    monkeypatch, tmp_path: Path, db_file: Path, simple_db
+):
+    hashed = []
+    monkeypatch.setattr(
+        cache_module,
+        "hash_file_contents",
+        lambda path: hashed.append(path) or "digest",
+    )
+    cache = ParseCache(tmp_path / "cache")
+    assert cache.load(db_file) is None
+    cache.store(db_file, simple_db)
+    assert hashed == [db_file]
+
+
+def test_parse_cache_discards_corrupt_entries(tmp_path: Path, db_file: Path, simple_db):
+    cache = ParseCache(tmp_path / "cache")
+    cache.store(db_file, simple_db)
+    entry = cache._entry_path(cache.key_for(db_file))
+    entry.write_bytes(b"not a pickle")
+
+    assert cache.load(db_file) is None
+    assert not entry.exists()
+
+
+def test_parse_cache_entries_are_json(
+    tmp_path: Path, db_file: Path, db_with_readbacks, simple_record_factory
+):
+    record = simple_record_factory("ai", "test_aliased")
+    record.infos = {"autosaveFields": "VAL"}
+    record.aliases = ["test_alias"]
+    db_with_readbacks.add_record(record)
+    db_with_readbacks.add_included_template("common.template", database=None)
+    cache = ParseCache(tmp_path / "cache")
+    cache.store(db_file, db_with_readbacks)
+    json.loads(cache._entry_path(cache.key_for(db_file)).read_bytes())
+
+    loaded = cache.load(db_file)
+    assert loaded is not None
+    assert list(loaded) == list(db_with_readbacks)
+    assert loaded.get_included_templates() == ["common.template"]
+    assert loaded["test_aliased"].infos == {"autosaveFields": "VAL"}
+    assert loaded["test_aliased"].aliases == ["test_alias"]
+    assert loaded["test_ao_1"].fields == db_with_readbacks["test_ao_1"].fields
+
+
+def test_read_only_parse_cache(tmp_path: Path, db_file: Path, simple_db):
+    ParseCache(tmp_path / "cache").store(db_file, simple_db, "other")
+    cache = ParseCache(tmp_path / "cache", read_only=True)
+    assert cache.load(db_file) is None
+    cache.store(db_file, simple_db)
+    assert not cache._entry_path(cache.key_for(db_file)).exists()
+    assert list(cache.load(db_file, "other")) == list(simple_db)  # type: ignore
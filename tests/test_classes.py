@@ -0,0 +1,39 @@
+from phoebusgen.widget import Label, TextUpdate
+
+from epicsdb2bob.bobfile_gen import add_widget_for_record, get_widget_class_name
+from epicsdb2bob.classes import generate_widget_class_file
+
+
+def test_widget_class_file_contains_styled_classes(default_config):
+    class_file = generate_widget_class_file(default_config)
+    widgets = {
+        widget.findtext("name"): widget for widget in class_file.root.iter("widget")
+    }
+
+    expected_types = {Label, *default_config.rtyp_to_widget_map.values()}
+    assert set(widgets) == {get_widget_class_name(t) for t in expected_types}
+
+    text_update = widgets[get_widget_class_name(TextUpdate)]
+    foreground = text_update.find("foreground_color")
+    assert foreground is not None
+    assert foreground.get("use_class") == "true"
+    color = foreground.find("color")
+    assert color is not None
+    assert (
+        int(color.get("red", "")),
+        int(color.get("green", "")),
+        int(color.get("blue", "")),
+    ) == default_config.palette.get_widget_fg(TextUpdate)
+
+
+def test_widgets_reference_classes(simple_record_factory, default_config):
+    default_config.use_widget_classes = True
+    record = simple_record_factory("ai", "test_ai")
+    label, widget = add_widget_for_record(record, 0, 0, {}, default_config)
+
+    assert label.get_element_value("class") == get_widget_class_name(Label)
+    assert widget.get_element_value("class") == get_widget_class_name(TextUpdate)
+    for element in (label, widget):
+        assert element.find_element("foreground_color") is None
+        assert element.find_element("background_color") is None
+        assert element.find_element("font") is None
@@ -1,5 +1,6 @@
 import subprocess
 import sys
+from pathlib import Path
 
 from epicsdb2bob import __version__
 
@@ -7,3 +8,70 @@ from epicsdb2bob import __version__
 def test_cli_version():
     cmd = [sys.executable, "-m", "epicsdb2bob", "--version"]
     assert subprocess.check_output(cmd).decode().strip() == __version__
+
+
+def test_cli_version_does_not_import_dependencies():
+    code = (
+        "import sys\n"
+        "from epicsdb2bob.__main__ import main\n"
+        "sys.argv = ['epicsdb2bob', '--version']\n"
+        "try:\n"
+        "    main()\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "print(sorted({'epicsdbtools', 'phoebusgen', 'yaml'} & set(sys.modules)))\n"
+    )
+    output = subprocess.check_output([sys.executable, "-c", code]).decode()
+    assert output.splitlines()[-1] == "[]"
+
+
+def test_cli_gen_writes_screen_and_depfile(tmp_path: Path):
+    (tmp_path / "common.template").write_text(
+        'record(ao, "$(P)Common") {\n    field(DESC, "Common")\n}\n'
+    )
+    (tmp_path / "test.template").write_text(
+        'include "common.template"\n'
+        'record(ao, "$(P)Value") {\n    field(DESC, "Value")\n}\n'
+    )
+    output = tmp_path / "out" / "test.bob"
+    output.parent.mkdir()
+
+    cmd = [sys.executable, "-m", "epicsdb2bob", "gen"]
+    subprocess.check_call(
+        [*cmd, str(tmp_path / "test.template"), "-o", str(output)], cwd=tmp_path
+    )
+
+    assert output.exists()
+    depfile = (tmp_path / "out" / "test.d").read_text()
+    assert depfile.startswith(f"{output}: \\\n")
+    assert f"  {tmp_path / 'test.template'} \\\n" in depfile
+    assert f"  {tmp_path / 'common.template'}\n" in depfile
+
+
+def test_cli_gen_substitution_depends_on_embedded_screens(tmp_path: Path):
+    (tmp_path / "motor.template").write_text(
+        'record(ao, "$(P)Pos") {\n    field(DESC, "Position")\n}\n'
+    )
+    (tmp_path / "ioc.substitutions").write_text(
+        'file "motor.template" {\n    { P=XF:1: }\n}\n'
+    )
+    output = tmp_path / "out"
+    output.mkdir()
+    # Screens elsewhere in the output tree are not referenced by their name alone
+    (output / "other").mkdir()
+    (output / "other" / "unused.bob").write_text("<display/>")
+
+    cmd = [sys.executable, "-m", "epicsdb2bob", "gen"]
+    for input_file, output_file in [
+        ("motor.template", "motor.bob"),
+        ("ioc.substitutions", "ioc.bob"),
+    ]:
+        subprocess.check_call(
+            [*cmd, str(tmp_path / input_file), "-o", str(output / output_file)],
+            cwd=tmp_path,
+        )
+
+    depfile = (output / "ioc.d").read_text()
+    assert f"  {output / 'motor.bob'}\n" in depfile
+    assert "unused.bob" not in depfile
+    assert "motor.bob" in (output / "ioc.bob").read_text()
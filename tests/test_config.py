@@ -1,6 +1,17 @@
+import copy
+from dataclasses import FrozenInstanceError
 from pathlib import Path
 
-from epicsdb2bob.config import EPICSDB2BOBConfig
+import pytest
+from phoebusgen.widget import TextEntry, TextUpdate
+
+from epicsdb2bob.config import (
+    EPICSDB2BOBConfig,
+    MacroSetLevel,
+    TitleBarFormat,
+    resolve_config,
+)
+from epicsdb2bob.palettes import BUILTIN_PALETTES
 
 
 def test_config_to_yaml_equals_from_yaml(
@@ -10,3 +21,86 @@ def test_config_to_yaml_equals_from_yaml(
     default_config.to_yaml(config_path)
     loaded_config = EPICSDB2BOBConfig.from_yaml(config_path, {})
     assert default_config == loaded_config
+
+
+def test_snapshot_is_frozen_and_hashable(default_config: EPICSDB2BOBConfig):
+    snapshot = default_config.snapshot()
+    assert snapshot == EPICSDB2BOBConfig().snapshot()
+    assert hash(snapshot) == hash(EPICSDB2BOBConfig().snapshot())
+    assert len({snapshot, EPICSDB2BOBConfig().snapshot()}) == 1
+    with pytest.raises(FrozenInstanceError):
+        snapshot.font_size = 20  # type: ignore
+    with pytest.raises(TypeError):
+        snapshot.rtyp_to_widget_map["ai"] = TextEntry  # type: ignore
+
+
+def test_snapshot_fingerprint_tracks_settings(default_config: EPICSDB2BOBConfig):
+    fingerprint = default_config.snapshot().fingerprint
+    assert fingerprint == EPICSDB2BOBConfig().snapshot().fingerprint
+    default_config.title_bar_format = TitleBarFormat.FULL
+    assert default_config.snapshot().fingerprint != fingerprint
+
+
+@pytest.mark.parametrize(
+    "setting, value",
+    [
+        ("debug", True),
+        ("use_parse_cache", False),
+        ("parse_cache_dir", Path("/elsewhere")),
+        ("fast_scan", True),
+        ("ignore_globs", ["*.bak"]),
+        ("max_scan_depth", 2),
+        ("scan_workers", 1),
+    ],
+)
+def test_screen_fingerprint_ignores_non_screen_settings(
+    default_config: EPICSDB2BOBConfig, setting: str, value
+):
+    snapshot = default_config.snapshot()
+    setattr(default_config, setting, value)
+    assert default_config.snapshot().fingerprint != snapshot.fingerprint
+    assert default_config.snapshot().screen_fingerprint == snapshot.screen_fingerprint
+
+
+def test_snapshot_precomputes_layout(default_config: EPICSDB2BOBConfig):
+    default_config.title_bar_format = TitleBarFormat.FULL
+    snapshot = default_config.snapshot()
+    assert snapshot.title_bar_height == 40
+    assert snapshot.widget_start_position == (10, 50)
+    assert snapshot.column_pitch == 160
+    assert snapshot.row_pitch == 30
+    assert resolve_config(snapshot) is snapshot
+
+
+def test_snapshot_is_independent_of_config(default_config: EPICSDB2BOBConfig):
+    snapshot = default_config.snapshot()
+    screen_bg = default_config.palette.screen_bg
+    default_config.palette.update_from_dict({"screen_bg": [1, 2, 3]})
+    default_config.rtyp_to_widget_map["ai"] = TextEntry
+    assert snapshot.palette.screen_bg == screen_bg
+    assert snapshot.rtyp_to_widget_map["ai"] is TextUpdate
+
+
+def test_from_yaml_does_not_modify_builtin_palette(tmp_path: Path):
+    config_path = tmp_path / "config.yml"
+    config_path.write_text("custom_palette:\n  screen_bg: [1, 2, 3]\n")
+    builtin = copy.deepcopy(BUILTIN_PALETTES["default"])
+    config = EPICSDB2BOBConfig.from_yaml(config_path, {})
+    assert config.palette.screen_bg == (1, 2, 3)
+    assert BUILTIN_PALETTES["default"] == builtin
+
+
+def test_from_args_coerces_values():
+    config = EPICSDB2BOBConfig.from_args(
+        {
+            "palette": "default",
+            "macro_set_level": "launcher",
+            "bobfile_search_path": ["screens"],
+            "readback_suffix": None,
+            "input": "ignored",
+        }
+    )
+    assert config.macro_set_level == MacroSetLevel.LAUNCHER
+    assert config.bobfile_search_path == [Path("screens")]
+    assert config.readback_suffix == "_RBV"
+    assert config.palette is not BUILTIN_PALETTES["default"]
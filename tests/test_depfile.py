@@ -0,0 +1,75 @@
+from pathlib import Path
+
+import epicsdbtools
+from epicsdbtools import Database
+
+from epicsdb2bob.depfile import (
+    escape_make_path,
+    find_included_templates,
+    format_depfile,
+    get_default_depfile_path,
+)
+
+
+def test_escape_make_path():
+    assert escape_make_path("my dir/$(P).bob") == "my\\ dir/$$(P).bob"
+
+
+def test_format_depfile():
+    depfile = format_depfile("out/a.bob", ["a.template", "inc.template", "a.template"])
+    assert depfile == (
+        "out/a.bob: \\\n"
+        "  a.template \\\n"
+        "  inc.template\n"
+        "\n"
+        "a.template:\n"
+        "\n"
+        "inc.template:\n"
+    )
+
+
+def test_get_default_depfile_path():
+    assert get_default_depfile_path("out/a.bob") == "out/a.d"
+
+
+def test_find_included_templates(tmp_path: Path):
+    include_dir = tmp_path / "include"
+    include_dir.mkdir()
+    (include_dir / "common.template").write_text('include "nested.template"\n')
+    (include_dir / "nested.template").write_text(
+        'record(ao, "$(P)Nested") {\n    field(DESC, "Nested")\n}\n'
+    )
+    (tmp_path / "local.template").write_text(
+        'record(ao, "$(P)Local") {\n    field(DESC, "Local")\n}\n'
+    )
+
+    database = Database()
+    database.add_included_template("common.template")
+    database.add_included_template("local.template")
+    database.add_included_template("missing.template")
+
+    included = find_included_templates(
+        tmp_path / "main.template", database, [include_dir]
+    )
+    assert sorted(included) == [
+        include_dir / "common.template",
+        include_dir / "nested.template",
+        tmp_path / "local.template",
+    ]
+
+
+def test_find_included_templates_lists_unparseable_includes(
+    tmp_path: Path, monkeypatch, caplog
+):
+    (tmp_path / "broken.template").write_text('include "nested.template"\n')
+
+    def fail(*args, **kwargs):
+        raise StopIteration
+
+    monkeypatch.setattr(epicsdbtools, "load_database_file", fail)
+    database = Database()
+    database.add_included_template("broken.template")
+
+    included = find_included_templates(tmp_path / "main.template", database, [])
+    assert included == [tmp_path / "broken.template"]
+    assert "Failed to parse" in caplog.text
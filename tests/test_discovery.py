@@ -0,0 +1,66 @@
+from pathlib import Path
+
+import pytest
+
+from epicsdb2bob.discovery import discover_inputs
+
+
+@pytest.fixture
+def input_tree(tmp_path: Path) -> Path:
+    for relative_path in [
+        "top.db",
+        "ioc.substitutions",
+        "notes.txt",
+        "sub/a.template",
+        "sub/deep/b.db",
+        "O.linux-x86_64/generated.db",
+        ".git/objects/stale.db",
+        "screens/existing.bob",
+        "screens/legacy.opi",
+    ]:
+        full_path = tmp_path / relative_path
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+        full_path.touch()
+    return tmp_path
+
+
+def names(paths: list[Path]) -> list[str]:
+    return sorted(path.name for path in paths)
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_discover_inputs_classifies_files(input_tree: Path, max_workers: int):
+    discovered = discover_inputs(
+        input_tree, [input_tree / "screens"], max_workers=max_workers
+    )
+    assert names(discovered.databases) == ["a.template", "b.db", "top.db"]
+    assert names(discovered.substitutions) == ["ioc.substitutions"]
+    assert names(discovered.screens) == ["existing.bob", "legacy.opi"]
+
+
+def test_discover_inputs_only_collects_screens_from_search_path(input_tree: Path):
+    discovered = discover_inputs(input_tree)
+    assert discovered.screens == []
+
+
+def test_discover_inputs_ignore_globs(input_tree: Path):
+    discovered = discover_inputs(input_tree, ignore_globs=["deep", "*.template"])
+    assert names(discovered.databases) == ["generated.db", "stale.db", "top.db"]
+
+
+@pytest.mark.parametrize(
+    "max_depth, expected",
+    [
+        (0, ["top.db"]),
+        (1, ["a.template", "top.db"]),
+        (None, ["a.template", "b.db", "top.db"]),
+    ],
+)
+def test_discover_inputs_max_depth(input_tree: Path, max_depth, expected):
+    discovered = discover_inputs(input_tree, max_depth=max_depth)
+    assert names(discovered.databases) == expected
+
+
+def test_discover_inputs_single_file(input_tree: Path):
+    discovered = discover_inputs(input_tree / "sub" / "a.template")
+    assert names(discovered.databases) == ["a.template"]
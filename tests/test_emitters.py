@@ -0,0 +1,150 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from xml.etree import ElementTree as ET
+
+import pytest
+from epicsdbtools import Database
+from phoebusgen.widget import Rectangle
+
+from epicsdb2bob.bobfile_gen import layout_database, layout_substitution
+from epicsdb2bob.config import DEFAULT_RTYP_TO_WIDGET_MAP
+from epicsdb2bob.emitters import (
+    BOB_WIDGET_FACTORIES,
+    EMITTERS,
+    OPI_WIDGET_TYPES,
+    retarget_display_file,
+    serialize_bob,
+    serialize_bob_chunked,
+    to_bob_screen,
+    to_bob_widget,
+    to_bob_widget_of,
+    to_opi_display,
+    to_pydm_macros,
+    to_ui_form,
+    write_layout,
+)
+from epicsdb2bob.layout import WidgetSpec
+from epicsdb2bob.substitutions import TemplateInstances
+
+
+def test_layout_is_written_in_every_format(
+    tmp_path: Path, db_with_readbacks, default_config
+):
+    layout = layout_database("test", db_with_readbacks, {}, default_config)
+    written = write_layout(layout, tmp_path / "test", EMITTERS)
+
+    assert [Path(path).name for path in written] == ["test.bob", "test.opi", "test.ui"]
+    for path in written:
+        ET.parse(path)
+
+
+def test_emitters_share_geometry(db_with_readbacks, default_config):
+    layout = layout_database("test", db_with_readbacks, {}, default_config)
+
+    bob = to_bob_screen(layout).root
+    opi = to_opi_display(layout)
+    ui = to_ui_form(layout)
+
+    assert len(bob.findall("widget")) == len(layout.widgets)
+    assert len(opi.findall("widget")) == len(layout.widgets)
+    assert len(ui.findall("widget/widget")) == len(layout.widgets)
+    assert opi.findtext("width") == bob.findtext("width") == str(layout.width)
+    assert [w.findtext("x") for w in opi.iter("widget")] == [
+        w.findtext("x") for w in bob.iter("widget")
+    ]
+
+
+@pytest.mark.parametrize("kind", sorted(BOB_WIDGET_FACTORIES))
+def test_to_bob_widget(kind):
+    spec = WidgetSpec(kind, "abc", 1, 2, 30, 40, "PV", text="Text", file="a.bob")
+    widget = to_bob_widget(spec)
+    assert type(widget).__name__ == kind
+    assert widget.root.findtext("name") == "abc"
+    assert [widget.root.findtext(tag) for tag in ["x", "y", "width", "height"]] == [
+        "1",
+        "2",
+        "30",
+        "40",
+    ]
+
+
+def test_to_bob_widget_rejects_unsupported_kinds():
+    assert {
+        widget_type.__name__ for widget_type in DEFAULT_RTYP_TO_WIDGET_MAP.values()
+    } <= set(BOB_WIDGET_FACTORIES)
+    with pytest.raises(ValueError, match="Unsupported widget type XYPlot"):
+        to_bob_widget(WidgetSpec("XYPlot", "abc", 0, 0, 10, 10))
+
+
+def test_to_bob_widget_rejects_missing_properties():
+    spec = WidgetSpec("Label", "abc", 0, 0, 10, 10, text="Text", line_width=2)
+    with pytest.raises(ValueError, match="Label widgets have no line width"):
+        to_bob_widget(spec)
+    with pytest.raises(ValueError, match="Label is not a Rectangle widget"):
+        to_bob_widget_of(WidgetSpec("Label", "abc", 0, 0, 10, 10), Rectangle)
+
+
+def test_opi_and_ui_widgets(simple_record_factory, default_config):
+    database = Database()
+    database.add_record(simple_record_factory("ai", "$(P)Temp"))
+    layout = layout_database("test", database, {}, default_config)
+    spec = next(widget for widget in layout.widgets if widget.kind == "TextUpdate")
+
+    opi = to_opi_display(layout)
+    opi_widget = next(w for w in opi.iter("widget") if w.findtext("name") == spec.name)
+    assert opi_widget.get("typeId") == OPI_WIDGET_TYPES["TextUpdate"]
+    assert opi_widget.findtext("pv_name") == "$(P)Temp"
+
+    ui = to_ui_form(layout)
+    ui_widget = ui.find(f".//widget[@name='w_{spec.name}']")
+    assert ui_widget is not None
+    assert ui_widget.get("class") == "PyDMLabel"
+    assert ui_widget.findtext("property[@name='channel']/string") == "ca://${P}Temp"
+    assert "PyDMLabel" in [element.text for element in ui.iter("class") if element.text]
+
+
+def test_embedded_displays_reference_same_format(default_config):
+    substitution = {
+        "motor.template": TemplateInstances.from_dicts([{"P": "X:"}]),
+        "valve.template": TemplateInstances.from_dicts([{"P": "A:"}, {"P": "B:"}]),
+    }
+    layout = layout_substitution(
+        "ioc", substitution, {}, default_config, {"motor.bob": (100, 200)}
+    )
+    assert layout.get_embedded_files() == ["motor.bob"]
+
+    opi = to_opi_display(layout)
+    assert [w.findtext("opi_file") for w in opi.iter("widget")][0] == "motor.opi"
+    assert [path.text for path in opi.iter("path")] == ["valve.opi", "valve.opi"]
+
+    ui = to_ui_form(layout)
+    assert ui.findtext(".//property[@name='filename']/string") == "motor.ui"
+    assert [
+        string.text
+        for string in ui.findall(".//property[@name='filenames']/stringlist/string")
+    ] == ["valve.ui", "valve.ui"]
+
+
+@pytest.mark.parametrize(
+    "file, suffix, expected",
+    [
+        ("motor.bob", ".opi", "motor.opi"),
+        ("screens/motor.bob", ".ui", "screens/motor.ui"),
+        ("motor.py", ".ui", "motor.py"),
+    ],
+)
+def test_retarget_display_file(file, suffix, expected):
+    assert retarget_display_file(file, suffix) == expected
+
+
+def test_to_pydm_macros():
+    assert to_pydm_macros("$(P)$(R)Temp_RBV") == "${P}${R}Temp_RBV"
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 1000])
+def test_chunked_bob_matches_whole(db_with_readbacks, default_config, chunk_size):
+    layout = layout_database("test", db_with_readbacks, {"P": "test_"}, default_config)
+    layout.macros = {"P": "test_"}
+    with ThreadPoolExecutor(3) as executor:
+        chunked = serialize_bob_chunked(layout, executor, chunk_size)
+    assert chunked == serialize_bob(layout)
@@ -0,0 +1,79 @@
+from epicsdb2bob.bobfile_gen import generate_bobfile_for_db
+from epicsdb2bob.config import EPICSDB2BOBConfig
+from epicsdb2bob.filters import (
+    RecordRule,
+    compile_record_filter,
+    select_records,
+)
+
+
+def test_no_rules_selects_everything(simple_db):
+    record_filter = compile_record_filter([], [])
+    assert select_records(simple_db, record_filter) == dict(simple_db)
+
+
+def test_exclude_by_name_and_rtyp(simple_db):
+    record_filter = compile_record_filter(
+        [],
+        [RecordRule(name="_ao_"), RecordRule(name="_1$", rtyp=["bi", "bo"])],
+    )
+    selected = select_records(simple_db, record_filter)
+    assert "test_ao_1" not in selected
+    assert "test_bi_1" not in selected
+    assert "test_bo_1" not in selected
+    assert "test_bi_2" in selected
+    assert "test_ai_1" in selected
+
+
+def test_include_rules_are_alternatives(simple_db):
+    record_filter = compile_record_filter(
+        [RecordRule(rtyp=["mbbo"]), RecordRule(name="stringin_2")], []
+    )
+    assert sorted(select_records(simple_db, record_filter)) == [
+        "test_mbbo_1",
+        "test_mbbo_2",
+        "test_stringin_2",
+    ]
+
+
+def test_field_and_info_rules(simple_db):
+    simple_db["test_ai_1"].infos = {"screen": "hide"}
+    simple_db["test_ai_2"].infos = {"screen": "show"}
+    simple_db["test_ao_1"].fields["SCAN"] = "1 second"
+
+    selected = select_records(
+        simple_db,
+        compile_record_filter(
+            [],
+            [RecordRule(infos={"screen": "hide"}), RecordRule(fields={"SCAN": None})],
+        ),
+    )
+    assert "test_ai_1" not in selected
+    assert "test_ao_1" not in selected
+    assert "test_ai_2" in selected
+
+    selected = select_records(
+        simple_db,
+        compile_record_filter([RecordRule(fields={"SCAN": r"\d+ second"})], []),
+    )
+    assert list(selected) == ["test_ao_1"]
+
+
+def test_rule_from_dict_round_trip():
+    rule = RecordRule.from_dict(
+        {"name": "^\\$\\(P\\)_", "rtyp": "calc", "fields": ["INPA"], "infos": {}}
+    )
+    assert rule == RecordRule(name="^\\$\\(P\\)_", rtyp=["calc"], fields={"INPA": None})
+    assert RecordRule.from_dict(rule.to_dict()) == rule
+
+
+def test_generate_bobfile_skips_excluded_readbacks(db_with_readbacks, default_config):
+    default_config.exclude_records = [RecordRule(name="_RBV$")]
+    screen = generate_bobfile_for_db("test", db_with_readbacks, {}, default_config)
+    pv_names = {element.text for element in screen.root.iter("pv_name")}
+    assert not any(str(name).endswith("_RBV") for name in pv_names)
+
+
+def test_config_default_excludes_hidden_records():
+    config = EPICSDB2BOBConfig()
+    assert config.exclude_records == [RecordRule(infos={"screen": "hide"})]
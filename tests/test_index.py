@@ -0,0 +1,129 @@
+from pathlib import Path
+
+import pytest
+
+from epicsdb2bob.index import (
+    IndexEntry,
+    IndexRow,
+    build_index_tree,
+    get_index_name,
+    get_input_directory,
+    layout_index_screen,
+    layout_indexes,
+)
+from epicsdb2bob.substitutions import TemplateInstances
+
+
+def test_build_index_tree():
+    root = build_index_tree(
+        [
+            IndexEntry((), "top", "top.bob", "1 records"),
+            IndexEntry(("a", "b"), "deep", "deep.bob", "2 records"),
+            IndexEntry(("a",), "mid", "mid.bob", "3 records"),
+        ]
+    )
+    assert [entry.title for entry in root.entries] == ["top"]
+    assert root.count_screens() == 3
+    assert root.children["a"].count_screens() == 2
+    assert root.children["a"].children["b"].directory == ("a", "b")
+
+
+def test_get_input_directory(tmp_path: Path):
+    assert get_input_directory(tmp_path / "a" / "b" / "x.db", tmp_path) == ("a", "b")
+    assert get_input_directory(Path("/elsewhere/x.db"), tmp_path) == ()
+
+
+def test_get_index_name():
+    assert get_index_name(()) == "index"
+    assert get_index_name(("a", "b")) == "index_a_b"
+    assert get_index_name(("a_b",)) == "index_a__b"
+
+
+def test_layout_indexes_keep_directories_apart(default_config):
+    layouts = layout_indexes(
+        [
+            IndexEntry(("a", "b"), "nested", "nested.bob", "1 records"),
+            IndexEntry(("a_b",), "flat", "flat.bob", "1 records"),
+        ],
+        default_config,
+    )
+    assert sorted(layouts) == ["index", "index_a", "index_a__b", "index_a_b"]
+
+
+@pytest.mark.parametrize(
+    "entries",
+    [
+        [IndexEntry((), "index", "index.bob", "1 records")],
+        [IndexEntry(("x",), "index_x", "index_x.bob", "1 records")],
+        [
+            IndexEntry((), "ioc", "ioc.bob", "1 instances of 1 templates", {}),
+            IndexEntry((), "ioc_index", "ioc_index.bob", "1 records"),
+        ],
+    ],
+)
+def test_layout_indexes_reject_collisions(entries, default_config):
+    with pytest.raises(ValueError, match="would replace the screen of"):
+        layout_indexes(entries, default_config)
+
+
+def test_layout_indexes_reject_duplicate_indexes(default_config):
+    with pytest.raises(ValueError, match="generated more than once"):
+        layout_indexes(
+            [
+                IndexEntry(("a_", "b"), "x", "x.bob", "1 records"),
+                IndexEntry(("a", "_b"), "y", "y.bob", "1 records"),
+            ],
+            default_config,
+        )
+
+
+def test_layout_indexes_mirror_directories(default_config):
+    layouts = layout_indexes(
+        [
+            IndexEntry((), "top", "top.bob", "1 records"),
+            IndexEntry(("motors",), "motor", "motor.bob", "4 records"),
+        ],
+        default_config,
+    )
+    assert list(layouts) == ["index_motors", "index"]
+
+    buttons = [w for w in layouts["index"].widgets if w.kind == "ActionButton"]
+    assert [button.text for button in buttons] == ["motors", "top"]
+    assert [button.actions[0].file for button in buttons] == [
+        "index_motors.bob",
+        "top.bob",
+    ]
+    summaries = [w.text for w in layouts["index"].widgets if w.kind == "Label"]
+    assert "1 screens" in summaries
+    assert all(not widget.pv_name for widget in layouts["index"].widgets)
+
+
+def test_substitution_index_launches_instances(default_config):
+    substitution = {
+        "motor.template": TemplateInstances.from_dicts([{"M": "1"}, {"M": "2"}]),
+    }
+    layouts = layout_indexes(
+        [IndexEntry((), "ioc", "ioc.bob", "2 instances of 1 templates", substitution)],
+        default_config,
+    )
+    index = next(w for w in layouts["index"].widgets if w.kind == "ActionButton")
+    assert index.actions[0].file == "ioc_index.bob"
+
+    buttons = [w for w in layouts["ioc_index"].widgets if w.kind == "ActionButton"]
+    assert [button.text for button in buttons] == ["All", "motor"]
+    assert buttons[0].actions[0].file == "ioc.bob"
+    assert [(a.file, a.macros) for a in buttons[1].actions] == [
+        ("motor.bob", {"M": "1"}),
+        ("motor.bob", {"M": "2"}),
+    ]
+
+
+def test_index_screen_wraps_columns(default_config):
+    default_config.max_screen_height = 200
+    rows = [IndexRow(str(i), [], "") for i in range(20)]
+    layout = layout_index_screen("Index", rows, default_config)
+
+    columns = {w.x for w in layout.widgets if w.kind == "ActionButton"}
+    assert len(columns) > 1
+    assert layout.height <= 200 + default_config.widget_offset
+    assert max(w.x + w.width for w in layout.widgets) <= layout.width
@@ -0,0 +1,103 @@
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from epicsdb2bob.discovery import InputKind
+from epicsdb2bob.isolation import (
+    IsolatedParser,
+    ParseFailed,
+    ParseLimitExceeded,
+    ParseLimits,
+    Quarantine,
+)
+from epicsdb2bob.parser import load_epics_dbs_and_templates
+
+
+# Parse functions run in the worker processes, picking behavior by file name
+def misbehaving_parse(file_path: Path, kind: InputKind, fast_scan: bool) -> str:
+    if file_path.stem == "slow":
+        time.sleep(60)
+    elif file_path.stem == "crash":
+        os._exit(3)
+    elif file_path.stem == "huge":
+        return "x" * 2**34
+    elif file_path.stem == "broken":
+        raise ValueError("unexpected token")
+    return file_path.read_text()
+
+
+@pytest.fixture
+def db_dir(tmp_path: Path) -> Path:
+    db_dir = tmp_path / "Db"
+    db_dir.mkdir()
+    for name in ["first", "slow", "last"]:
+        (db_dir / f"{name}.template").write_text(
+            f'record(ai, "{name}_ai") {{\n    field(DESC, "{name}")\n}}\n'
+        )
+    return db_dir
+
+
+def test_isolated_parser_survives_misbehaving_files(tmp_path: Path):
+    paths = []
+    for name in ["ok", "slow", "crash", "huge", "broken", "again"]:
+        paths.append(tmp_path / f"{name}.template")
+        paths[-1].write_text(name)
+
+    limits = ParseLimits(timeout=2, max_memory=1024 * 1024 * 1024)
+    with IsolatedParser(limits, workers=2, parse_function=misbehaving_parse) as parser:
+        results = dict(parser.map(paths, InputKind.DATABASE))
+
+    assert results[paths[0]] == "ok"
+    assert results[paths[-1]] == "again"
+    assert "timed out" in str(results[paths[1]])
+    assert "exited with code 3" in str(results[paths[2]])
+    assert "memory limit" in str(results[paths[3]])
+    assert isinstance(results[paths[4]], ParseFailed)
+    assert all(isinstance(results[path], ParseLimitExceeded) for path in paths[1:4])
+
+
+def test_isolated_parser_parses_databases(db_dir: Path):
+    paths = sorted(db_dir.iterdir())
+    with IsolatedParser(ParseLimits(timeout=30)) as parser:
+        databases = load_epics_dbs_and_templates(paths, isolated_parser=parser)
+    assert list(databases) == ["first", "last", "slow"]
+    assert list(databases["slow"]) == ["slow_ai"]
+
+
+def test_quarantine_round_trip(tmp_path: Path, db_dir: Path):
+    slow = db_dir / "slow.template"
+    quarantine = Quarantine(tmp_path / "cache")
+    quarantine.add(slow, "timed out after 1s")
+
+    quarantine = Quarantine(tmp_path / "cache")
+    assert quarantine.is_quarantined(slow)
+    assert not quarantine.is_quarantined(db_dir / "first.template")
+    assert "slow.template: timed out after 1s" in quarantine.report()
+    # Retried when asked to, or once the file changes
+    assert not Quarantine(tmp_path / "cache", skip=False).is_quarantined(slow)
+    slow.write_text('record(ai, "slow_ai") {}\n')
+    assert not quarantine.is_quarantined(slow)
+
+    quarantine.release(slow)
+    assert Quarantine(tmp_path / "cache").entries == {}
+
+
+def test_read_only_quarantine(tmp_path: Path, db_dir: Path):
+    slow = db_dir / "slow.template"
+    quarantine = Quarantine(tmp_path / "cache", read_only=True)
+    quarantine.add(slow, "timed out after 1s")
+    assert quarantine.is_quarantined(slow)
+    assert not quarantine.path.exists()
+
+
+def test_quarantined_files_are_skipped(tmp_path: Path, db_dir: Path):
+    quarantine = Quarantine(tmp_path / "cache")
+    quarantine.add(db_dir / "slow.template", "timed out after 1s")
+
+    databases = load_epics_dbs_and_templates(
+        sorted(db_dir.iterdir()), quarantine=quarantine
+    )
+    assert list(databases) == ["first", "last"]
+    assert list(quarantine.reported) == [str(db_dir / "slow.template")]
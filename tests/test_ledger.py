@@ -0,0 +1,98 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from epicsdb2bob.ledger import (
+    RunLedger,
+    RunRecord,
+    compare_runs,
+    format_comparison,
+    write_prometheus_textfile,
+)
+from epicsdb2bob.profiling import MemoryProfiler
+
+
+def make_run(seconds: float, records: int = 1000, **phases: float) -> RunRecord:
+    return RunRecord(
+        "2026-01-01T00:00:00+00:00",
+        "1.0",
+        "abc123",
+        "/iocs",
+        "/screens",
+        seconds,
+        input_files=10,
+        screens=10,
+        files_written=10,
+        bytes_written=100_000,
+        records=records,
+        widgets=2 * records,
+        phases=phases,
+    )
+
+
+def test_runs_round_trip(tmp_path: Path):
+    path = tmp_path / "data" / "ledger.sqlite"
+    with RunLedger(path) as ledger:
+        first = ledger.record(make_run(1.0, parse=0.5, generate=0.25))
+        ledger.record(make_run(2.0))
+    with RunLedger(path) as ledger:
+        run = ledger.get_run(first)
+        assert run.seconds == 1.0
+        assert run.phases == {"parse": 0.5, "generate": 0.25}
+        assert [run.seconds for run in ledger.get_runs()] == [1.0, 2.0]
+        assert [run.seconds for run in ledger.get_runs(limit=1)] == [2.0]
+        assert ledger.get_runs(input_path="/elsewhere") == []
+
+
+def test_compare_runs_flags_timing_regressions():
+    baseline = make_run(10.0, parse=4.0, generate=5.0, index=0.001)
+    current = make_run(10.5, records=2000, parse=6.0, generate=4.0, index=0.002)
+    changes = {change.metric: change for change in compare_runs(baseline, current)}
+
+    assert changes["phase:parse"].regression
+    assert not changes["phase:generate"].regression
+    # Doubled, but by less than the minimum number of seconds
+    assert not changes["phase:index"].regression
+    assert not changes["seconds"].regression
+    assert not changes["records"].regression
+    assert changes["ms_per_item"].current < changes["ms_per_item"].baseline
+    assert "REGRESSION" in format_comparison(baseline, current, list(changes.values()))
+
+
+def test_prometheus_textfile(tmp_path: Path):
+    path = tmp_path / "epicsdb2bob.prom"
+    write_prometheus_textfile(make_run(1.5, parse=0.5), path)
+
+    lines = path.read_text().splitlines()
+    assert "epicsdb2bob_run_duration_seconds 1.5" in lines
+    assert 'epicsdb2bob_phase_duration_seconds{phase="parse"} 0.5' in lines
+    assert "epicsdb2bob_widgets 2000" in lines
+    assert list(tmp_path.iterdir()) == [path]
+    assert path.stat().st_mode & 0o777 == 0o644
+
+
+def test_profiler_times_phases_when_disabled():
+    profiler = MemoryProfiler(enabled=False)
+    with profiler.phase("parse"):
+        pass
+    with profiler.phase("parse"):
+        pass
+    assert list(profiler.timings) == ["parse"]
+    assert profiler.phases == {}
+
+
+def test_cli_ledger_compare(tmp_path: Path):
+    path = tmp_path / "ledger.sqlite"
+    with RunLedger(path) as ledger:
+        ledger.record(make_run(1.0, parse=0.5))
+        ledger.record(make_run(1.0, parse=1.0))
+
+    cmd = [sys.executable, "-m", "epicsdb2bob", "ledger", "--ledger", str(path)]
+    listed = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    assert len(listed.stdout.splitlines()) == 3
+
+    compared = subprocess.run(
+        [*cmd, "--compare", "--fail_on_regression"], capture_output=True, text=True
+    )
+    assert compared.returncode == 1
+    assert "phase:parse" in compared.stderr
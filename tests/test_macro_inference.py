@@ -0,0 +1,147 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+from xml.etree import ElementTree as ET
+
+from epicsdbtools import Database
+
+from epicsdb2bob.bobfile_gen import layout_database
+from epicsdb2bob.index import IndexEntry, layout_indexes
+from epicsdb2bob.macro_inference import (
+    PrefixTrie,
+    format_inferred_macros,
+    group_reusable_databases,
+    infer_macros,
+    split_name,
+)
+
+
+def prefixed_db(simple_record_factory, prefix: str, desc: str = "") -> Database:
+    db = Database()
+    for rtyp, suffix in [("ao", "Gain"), ("ai", "Gain_RBV"), ("bo", "Acquire")]:
+        record = simple_record_factory(rtyp, f"{prefix}{suffix}")
+        record.fields["DESC"] = desc or suffix
+        db.add_record(record)
+    return db
+
+
+def test_split_name():
+    assert split_name("XF:31ID:Dev1:Pos") == ["XF:", "31ID:", "Dev1:", "Pos"]
+    assert split_name("Pos") == ["Pos"]
+
+
+def test_common_prefix_stops_before_whole_names():
+    trie = PrefixTrie()
+    for name in ["IOC:cam1:Gain", "IOC:cam1:Acquire", "IOC:cam1:"]:
+        trie.insert(name)
+    assert trie.common_prefix() == ["IOC:"]
+    assert trie.common_prefix(min_share=0.5) == ["IOC:"]
+
+
+def test_common_prefix_of_most_names():
+    trie = PrefixTrie()
+    for name in ["IOC:cam1:Gain", "IOC:cam1:Acquire", "IOC:cam2:Gain", "Heartbeat"]:
+        trie.insert(name)
+    assert trie.common_prefix() == []
+    assert trie.common_prefix(min_share=0.5) == ["IOC:", "cam1:"]
+
+
+def test_infer_macros():
+    names = ["13SIM1:cam1:Gain", "13SIM1:cam1:Gain_RBV", "13SIM1:cam1:Acquire"]
+    assert infer_macros(names) == {"P": "13SIM1:", "R": "cam1:"}
+    assert infer_macros(names, ["DEV"]) == {"DEV": "13SIM1:cam1:"}
+    assert infer_macros(["IOC:Gain", "IOC:Acquire"]) == {"P": "IOC:"}
+    assert infer_macros(["Gain", "Acquire"]) == {}
+    assert infer_macros(["$(P)$(R)Gain", "$(P)$(R)Acquire"]) == {}
+
+
+def test_group_reusable_databases(simple_record_factory, default_config):
+    databases = {
+        "sim1": prefixed_db(simple_record_factory, "13SIM1:cam1:"),
+        "sim2": prefixed_db(simple_record_factory, "13SIM2:cam1:"),
+        "other": prefixed_db(simple_record_factory, "13SIM3:cam1:", "Other"),
+    }
+    inferred = group_reusable_databases(databases)
+
+    assert [screen.screen for screen in inferred.values()] == ["sim1", "sim1", "other"]
+    assert inferred["sim2"].reused
+    assert inferred["sim2"].macros == {"P": "13SIM2:", "R": "cam1:"}
+    report = format_inferred_macros(inferred)
+    assert "3 of 3 databases, 1 reuse" in report
+    assert "sim2 -> sim1.bob: P=13SIM2:, R=cam1:" in report
+
+    layout = layout_database(
+        "sim1", databases["sim1"], inferred["sim1"].macros, default_config
+    )
+    pv_names = {widget.pv_name for widget in layout.widgets if widget.pv_name}
+    assert "$(P)$(R)Gain" in pv_names
+    assert not any("13SIM" in pv_name for pv_name in pv_names)
+
+
+def test_index_opens_reused_screen_with_macros(default_config):
+    entries = [
+        IndexEntry((), "sim1", "sim1.bob", "3 records", macros={"P": "13SIM1:"}),
+        IndexEntry((), "sim2", "sim1.bob", "3 records", macros={"P": "13SIM2:"}),
+    ]
+    index = layout_indexes(entries, default_config)["index"]
+    actions = [
+        action
+        for widget in index.widgets
+        for action in getattr(widget, "actions", None) or []
+    ]
+    assert [(action.file, action.macros) for action in actions] == [
+        ("sim1.bob", {"P": "13SIM1:"}),
+        ("sim1.bob", {"P": "13SIM2:"}),
+    ]
+
+
+def test_cli_substitution_opens_reused_screen(tmp_path: Path):
+    input_path = tmp_path / "in"
+    input_path.mkdir()
+    for name, prefix in [("sim1", "13SIM1:cam1:"), ("sim2", "13SIM2:cam1:")]:
+        (input_path / f"{name}.db").write_text(
+            f'record(ao, "{prefix}Gain") {{\n    field(DESC, "Gain")\n}}\n'
+            f'record(bo, "{prefix}Acquire") {{\n    field(DESC, "Acquire")\n}}\n'
+        )
+    (input_path / "ioc.substitutions").write_text(
+        'file "sim2.db" {\n    { N=1 }\n    { N=2 }\n}\n'
+    )
+    output_path = tmp_path / "out"
+    output_path.mkdir()
+    subprocess.check_call(
+        [
+            sys.executable,
+            "-m",
+            "epicsdb2bob",
+            str(input_path),
+            str(output_path),
+            "--infer_macros",
+            "--macro_set_level",
+            "launcher",
+            "--pv_manifest",
+            "--no_cache",
+        ]
+    )
+
+    assert not (output_path / "sim2.bob").exists()
+    # Opened on its own, the shared screen shows the PVs of the first database
+    shared = ET.parse(output_path / "sim1.bob").getroot()
+    assert shared.findtext("macros/P") == "13SIM1:"
+    assert shared.findtext("macros/R") == "cam1:"
+    launcher = ET.parse(output_path / "ioc.bob").getroot()
+    actions = launcher.findall(".//action")
+    assert [action.findtext("file") for action in actions] == ["sim1.bob"] * 2
+    assert [action.findtext("macros/P") for action in actions] == ["13SIM2:"] * 2
+    assert [action.findtext("macros/N") for action in actions] == ["1", "2"]
+
+    pvs = [
+        json.loads(line)["pv"]
+        for line in (output_path / "pvs.jsonl").read_text().splitlines()
+    ]
+    assert sorted(pvs) == [
+        "13SIM1:cam1:Acquire",
+        "13SIM1:cam1:Gain",
+        "13SIM2:cam1:Acquire",
+        "13SIM2:cam1:Gain",
+    ]
@@ -0,0 +1,97 @@
+from pathlib import Path
+
+import pytest
+
+from epicsdb2bob.bobfile_gen import layout_database
+from epicsdb2bob.emitters import write_bob
+from epicsdb2bob.parser import load_epics_dbs_and_templates
+from epicsdb2bob.profiling import MemoryProfiler
+
+TREE_SIZES = [50, 200, 800]
+
+# Peak traced bytes allowed per record in each phase. These are several times the
+# values measured when they were introduced, so they only trip on real regressions.
+PER_RECORD_BUDGETS = {
+    "parse": 16 * 1024,
+    "generate": 16 * 1024,
+    "write": 64 * 1024,
+}
+# Bytes retained for each screen by the maps of written screens and their sizes
+PER_SCREEN_BUDGET = 4 * 1024
+# Growth of the process' peak RSS allowed per record in any phase. Much looser,
+# as it includes the allocator's own overhead and is not traced.
+PER_RECORD_RSS_BUDGET = 256 * 1024
+
+
+def write_synthetic_tree(root: Path, num_records: int, records_per_file: int = 200):
+    for file_index in range(0, num_records, records_per_file):
+        db_path = root / f"dir{file_index // 1000}" / f"synthetic{file_index}.template"
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(db_path, "w") as fp:
+            for i in range(file_index, min(file_index + records_per_file, num_records)):
+                rtyp = "ao" if i % 2 else "ai"
+                fp.write(
+                    f'record({rtyp}, "$(P)$(R)Synthetic{i}") {{\n'
+                    f'    field(DESC, "Synthetic record {i}")\n'
+                    '    field(DTYP, "asynFloat64")\n'
+                    "}\n"
+                )
+
+
+def profile_tree(root: Path, num_records: int, config) -> MemoryProfiler:
+    write_synthetic_tree(root, num_records)
+    profiler = MemoryProfiler(top_n=5)
+    profiler.start()
+    try:
+        with profiler.phase("parse", snapshot=True, items=num_records):
+            databases = load_epics_dbs_and_templates(sorted(root.rglob("*.template")))
+        # Kept for the whole run, as by the command line for launchers
+        written_bobfiles: dict[str, Path] = {}
+        screen_sizes: dict[str, tuple[int, int]] = {}
+        for name, database in databases.items():
+            with profiler.phase("generate", items=len(database)):
+                layout = layout_database(name, database, {}, config)
+            with profiler.phase("write", items=len(database)):
+                write_bob(layout, str(root / f"{name}.bob"))
+            with profiler.phase("written_bobfiles"):
+                written_bobfiles[f"{name}.bob"] = root / f"{name}.bob"
+                screen_sizes[f"{name}.bob"] = (layout.height, layout.width)
+    finally:
+        profiler.stop()
+    return profiler
+
+
+@pytest.mark.parametrize("num_records", TREE_SIZES)
+def test_memory_per_record_within_budget(tmp_path: Path, num_records, default_config):
+    profiler = profile_tree(tmp_path, num_records, default_config)
+
+    for phase_name, budget in PER_RECORD_BUDGETS.items():
+        # The worst single call, by the records it handled
+        per_record = profiler.phases[phase_name].peak_per_item
+        assert 0 < per_record < budget, (
+            f"{phase_name} used {per_record:.0f} B/record, budget is {budget} "
+            f"B/record. Top allocation sites:\n{profiler.report()}"
+        )
+        rss_increase = profiler.phases[phase_name].peak_rss_increase
+        assert rss_increase < PER_RECORD_RSS_BUDGET * num_records, (
+            f"{phase_name} raised the peak RSS by {rss_increase} B\n{profiler.report()}"
+        )
+    written = profiler.phases["written_bobfiles"]
+    per_screen = written.retained / written.calls
+    assert per_screen < PER_SCREEN_BUDGET, (
+        f"written screens retained {per_screen:.0f} B/screen, budget is "
+        f"{PER_SCREEN_BUDGET} B/screen"
+    )
+    assert profiler.phases["parse"].top_allocations
+
+
+def test_memory_scales_linearly(tmp_path: Path, default_config):
+    small, large = TREE_SIZES[0], TREE_SIZES[-1]
+    small_profile = profile_tree(tmp_path / "small", small, default_config)
+    large_profile = profile_tree(tmp_path / "large", large, default_config)
+
+    # Databases are retained for the whole run, so parse memory should grow
+    # linearly with the number of records rather than faster.
+    small_per_record = small_profile.phases["parse"].retained / small
+    large_per_record = large_profile.phases["parse"].retained / large
+    assert large_per_record < 1.5 * small_per_record
@@ -0,0 +1,180 @@
+import subprocess
+import sys
+from pathlib import Path
+from xml.etree import ElementTree as ET
+
+import pytest
+
+from epicsdb2bob.bobfile_gen import layout_database
+from epicsdb2bob.config import resolve_config
+from epicsdb2bob.emitters import write_bob
+from epicsdb2bob.patch import PatchNotPossible, patch_screen_file
+
+
+@pytest.fixture
+def screen_file(tmp_path: Path, simple_db, default_config) -> Path:
+    screen_file = tmp_path / "test.bob"
+    write_bob(layout_database("test", simple_db, {}, default_config), str(screen_file))
+    return screen_file
+
+
+def find_widget(root: ET.Element, pv_name: str) -> ET.Element:
+    [widget] = [w for w in root.findall("widget") if w.findtext("pv_name") == pv_name]
+    return widget
+
+
+def position(widget: ET.Element) -> tuple[str | None, str | None]:
+    return widget.findtext("x"), widget.findtext("y")
+
+
+def widget_names(root: ET.Element) -> set[str | None]:
+    return {widget.findtext("name") for widget in root.findall("widget")}
+
+
+def test_unchanged_screen_is_not_rewritten(
+    screen_file: Path, simple_db, default_config
+):
+    before = screen_file.read_bytes()
+    result = patch_screen_file(screen_file, "test", simple_db, {}, default_config)
+    assert not result.changed
+    assert screen_file.read_bytes() == before
+
+
+def test_patch_updates_label(screen_file: Path, simple_db, default_config):
+    before = ET.parse(screen_file).getroot()
+    simple_db["test_ao_1"].fields["DESC"] = "Gain"
+
+    result = patch_screen_file(screen_file, "test", simple_db, {}, default_config)
+    assert result.updated == ["test_ao_1"]
+    after = ET.parse(screen_file).getroot()
+    assert "Gain" in [label.findtext("text") for label in after.findall("widget")]
+    # Only the label's text changed, widgets keep their names and positions
+    assert widget_names(after) == widget_names(before)
+    assert position(find_widget(after, "test_ao_1")) == position(
+        find_widget(before, "test_ao_1")
+    )
+
+
+def test_patch_keeps_moved_widgets(screen_file: Path, simple_db, default_config):
+    root = ET.parse(screen_file).getroot()
+    for widget in root.findall("widget"):
+        if widget.findtext("y") == find_widget(root, "test_ai_2").findtext("y"):
+            widget.find("y").text = "500"  # type: ignore
+    ET.ElementTree(root).write(screen_file)
+    simple_db["test_ai_2"].fields["DESC"] = "Moved"
+
+    result = patch_screen_file(screen_file, "test", simple_db, {}, default_config)
+    assert result.updated == ["test_ai_2"]
+    after = ET.parse(screen_file).getroot()
+    assert find_widget(after, "test_ai_2").findtext("y") == "500"
+    [label] = [w for w in after.findall("widget") if w.findtext("text") == "Moved"]
+    assert label.findtext("y") == "500"
+
+
+def test_new_record_takes_slot_of_removed(
+    screen_file: Path, simple_db, simple_record_factory, default_config
+):
+    before = ET.parse(screen_file).getroot()
+    del simple_db["test_bo_1"]
+    simple_db.add_record(simple_record_factory("ao", "test_ao_3"))
+
+    result = patch_screen_file(screen_file, "test", simple_db, {}, default_config)
+    assert (result.removed, result.added) == (["test_bo_1"], ["test_ao_3"])
+    after = ET.parse(screen_file).getroot()
+    assert position(find_widget(after, "test_ao_3")) == position(
+        find_widget(before, "test_bo_1")
+    )
+    assert len(after.findall("widget")) == len(before.findall("widget"))
+
+
+def test_new_record_is_appended(
+    screen_file: Path, simple_db, simple_record_factory, default_config
+):
+    simple_db.add_record(simple_record_factory("ai", "test_ai_3"))
+    result = patch_screen_file(screen_file, "test", simple_db, {}, default_config)
+    assert result.added == ["test_ai_3"]
+
+    # Where a full regeneration would have put it
+    layout = layout_database("test", simple_db, {}, default_config)
+    [expected] = [w for w in layout.widgets if w.pv_name == "test_ai_3"]
+    after = ET.parse(screen_file).getroot()
+    assert position(find_widget(after, "test_ai_3")) == (
+        str(expected.x),
+        str(expected.y),
+    )
+    assert int(after.findtext("height")) == result.height == layout.height  # type: ignore
+
+
+def test_changed_record_type_replaces_widget(
+    screen_file: Path, simple_db, default_config
+):
+    before = ET.parse(screen_file).getroot()
+    simple_db["test_ao_1"].rtyp = "ai"
+
+    result = patch_screen_file(screen_file, "test", simple_db, {}, default_config)
+    assert result.updated == ["test_ao_1"]
+    widget = find_widget(ET.parse(screen_file).getroot(), "test_ao_1")
+    assert widget.get("type") == "textupdate"
+    assert position(widget) == position(find_widget(before, "test_ao_1"))
+
+
+def test_new_readback_needs_regeneration(
+    screen_file: Path, simple_db, readback_record_factory, default_config
+):
+    simple_db.add_record(readback_record_factory(simple_db["test_ao_1"]))
+    with pytest.raises(PatchNotPossible, match="readback of test_ao_1"):
+        patch_screen_file(screen_file, "test", simple_db, {}, default_config)
+
+
+def test_screen_generated_with_other_settings_needs_regeneration(
+    screen_file: Path, simple_db, default_config
+):
+    fingerprint = resolve_config(default_config).screen_fingerprint
+    result = patch_screen_file(
+        screen_file,
+        "test",
+        simple_db,
+        {},
+        default_config,
+        screen_fingerprint=fingerprint,
+    )
+    assert not result.changed
+    with pytest.raises(PatchNotPossible, match="different settings"):
+        patch_screen_file(
+            screen_file, "test", simple_db, {}, default_config, screen_fingerprint="0"
+        )
+
+
+def get_colors(screen_file: Path) -> set[tuple[str | None, ...]]:
+    return {
+        (color.get("red"), color.get("green"), color.get("blue"))
+        for color in ET.parse(screen_file).getroot().iter("color")
+    }
+
+
+def test_cli_patch_applies_palette_changes(tmp_path: Path):
+    input_path = tmp_path / "in"
+    input_path.mkdir()
+    (input_path / "motor.template").write_text(
+        'record(ao, "$(P)Pos") {\n    field(DESC, "Position")\n}\n'
+    )
+    cmd = [sys.executable, "-m", "epicsdb2bob", str(input_path)]
+    for output_path in ["patched", "expected"]:
+        (tmp_path / output_path).mkdir()
+    subprocess.check_call([*cmd, str(tmp_path / "patched"), "--no_cache"])
+    default_colors = get_colors(tmp_path / "patched" / "motor.bob")
+
+    for output_path in ["patched", "expected"]:
+        subprocess.check_call(
+            [
+                *cmd,
+                str(tmp_path / output_path),
+                "--palette",
+                "nsls2",
+                "--patch",
+                "--no_cache",
+            ]
+        )
+    colors = get_colors(tmp_path / "patched" / "motor.bob")
+    assert colors == get_colors(tmp_path / "expected" / "motor.bob")
+    assert colors != default_colors
@@ -0,0 +1,140 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from epicsdb2bob.bobfile_gen import layout_database
+from epicsdb2bob.emitters import serialize_bob
+from epicsdb2bob.fingerprints import (
+    SCREEN_FINGERPRINTS_FILE_NAME,
+    ScreenFingerprints,
+    layout_digest,
+)
+from epicsdb2bob.plan import (
+    PlanStatus,
+    format_plan,
+    plan_database_screen,
+)
+
+
+def write_screen(tmp_path: Path, layout) -> Path:
+    output_path = tmp_path / f"{layout.name}.bob"
+    output_path.write_bytes(serialize_bob(layout))
+    fingerprints = ScreenFingerprints(tmp_path)
+    fingerprints.record(output_path.name, "settings", layout)
+    fingerprints.write()
+    return output_path
+
+
+def test_layout_digest_ignores_widget_names(simple_db, default_config):
+    first = layout_database("test", simple_db, {}, default_config)
+    second = layout_database("test", simple_db, {}, default_config)
+    assert layout_digest(first) == layout_digest(second)
+
+
+def test_plan_database_screen(
+    tmp_path: Path, simple_db, simple_record_factory, default_config
+):
+    simple_db.add_record(simple_record_factory("calc", "test_calc_1"))
+    layout = layout_database("test", simple_db, {}, default_config)
+    output_path = tmp_path / "test.bob"
+
+    plan = plan_database_screen("test", simple_db, layout, output_path, default_config)
+    assert plan.status == PlanStatus.NEW
+    assert plan.record_count == len(simple_db) - 1
+    assert plan.skipped_rtyps == ["calc"]
+    assert plan.widget_count == len(layout.widgets)
+    assert (plan.width, plan.height) == (layout.width, layout.height)
+    assert not output_path.exists()
+
+
+def test_plan_status_compares_with_existing_output(
+    tmp_path: Path, simple_db, simple_record_factory, default_config
+):
+    output_path = write_screen(
+        tmp_path, layout_database("test", simple_db, {}, default_config)
+    )
+
+    layout = layout_database("test", simple_db, {}, default_config)
+    plan = plan_database_screen(
+        "test",
+        simple_db,
+        layout,
+        output_path,
+        default_config,
+        fingerprints=ScreenFingerprints(tmp_path),
+    )
+    assert plan.status == PlanStatus.UNCHANGED
+    # Without a fingerprint the existing screen can't be compared
+    plan = plan_database_screen("test", simple_db, layout, output_path, default_config)
+    assert plan.status == PlanStatus.CHANGED
+
+    simple_db.add_record(simple_record_factory("ai", "test_ai_new"))
+    layout = layout_database("test", simple_db, {}, default_config)
+    plan = plan_database_screen(
+        "test",
+        simple_db,
+        layout,
+        output_path,
+        default_config,
+        fingerprints=ScreenFingerprints(tmp_path),
+    )
+    assert plan.status == PlanStatus.CHANGED
+
+
+def test_plan_status_detects_edited_screens(tmp_path: Path, simple_db, default_config):
+    layout = layout_database("test", simple_db, {}, default_config)
+    output_path = write_screen(tmp_path, layout)
+    output_path.write_text(output_path.read_text().replace("test_ai_1", "edited"))
+
+    plan = plan_database_screen(
+        "test",
+        simple_db,
+        layout,
+        output_path,
+        default_config,
+        fingerprints=ScreenFingerprints(tmp_path),
+    )
+    assert plan.status == PlanStatus.CHANGED
+
+
+def test_format_plan_json(tmp_path: Path, simple_db, default_config):
+    layout = layout_database("test", simple_db, {}, default_config)
+    plan = plan_database_screen(
+        "test", simple_db, layout, tmp_path / "test.bob", default_config
+    )
+    data = json.loads(format_plan([plan], "json"))
+    assert data[0]["name"] == "test"
+    assert data[0]["status"] == "new"
+    assert "test.bob" in format_plan([plan], "text")
+
+
+def test_cli_plan_writes_nothing(tmp_path: Path):
+    input_path = tmp_path / "in"
+    input_path.mkdir()
+    (input_path / "motor.template").write_text(
+        'record(ao, "$(P)Pos") {\n    field(DESC, "Position")\n}\n'
+    )
+    output_path = tmp_path / "out"
+    output_path.mkdir()
+    cmd = [
+        sys.executable,
+        "-m",
+        "epicsdb2bob",
+        str(input_path),
+        str(output_path),
+        "--cache_dir",
+        str(tmp_path / "cache"),
+    ]
+
+    planned = subprocess.check_output([*cmd, "--plan"], text=True)
+    assert "motor.bob" in planned and "new" in planned
+    assert list(output_path.iterdir()) == []
+    assert not (tmp_path / "cache").exists()
+
+    subprocess.check_call(cmd)
+    assert (output_path / SCREEN_FINGERPRINTS_FILE_NAME).exists()
+    cache_entries = sorted((tmp_path / "cache").rglob("*"))
+    planned = subprocess.check_output([*cmd, "--plan"], text=True)
+    assert "1 screens planned, 0 new or changed." in planned
+    assert sorted((tmp_path / "cache").rglob("*")) == cache_entries
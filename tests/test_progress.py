@@ -0,0 +1,103 @@
+import io
+import logging
+
+from epicsdbtools import Database
+
+from epicsdb2bob.bobfile_gen import layout_database
+from epicsdb2bob.layout import LayoutStats
+from epicsdb2bob.progress import ProgressReporter, format_duration
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_layout_stats_are_counted(simple_db, simple_record_factory, default_config):
+    simple_db.add_record(simple_record_factory("calc", "test_calc"))
+    stats = LayoutStats()
+    layout = layout_database("test", simple_db, {}, default_config, stats=stats)
+
+    assert stats.screens == 1
+    assert stats.records == len(simple_db)
+    assert stats.widgets == len(layout.widgets)
+    assert stats.unsupported == {"calc": 1}
+    assert stats.skipped == 1
+
+
+def test_per_record_messages_are_debug(simple_db, default_config, caplog):
+    with caplog.at_level(logging.INFO, logger="epicsdb2bob"):
+        layout_database("test", simple_db, {}, default_config)
+    assert not [r for r in caplog.records if r.levelno == logging.INFO]
+
+
+def test_progress_is_logged_periodically(caplog):
+    clock = FakeClock()
+    progress = ProgressReporter(3, mode="log", interval=10, clock=clock)
+    with caplog.at_level(logging.INFO, logger="epicsdb2bob"):
+        for i, seconds in enumerate([1, 20, 1]):
+            with progress.track(f"db{i}") as stats:
+                stats.records += 100
+                clock.now += seconds
+
+    messages = [r.getMessage() for r in caplog.records]
+    # Reported once the interval has passed, and when the last file is done
+    assert len(messages) == 2
+    assert messages[0].startswith("[2/3] 67% | 200 records")
+    assert messages[0].endswith("ETA 0:00:10")
+    assert messages[1].startswith("[3/3] 100% | 300 records")
+
+
+def test_progress_is_redrawn_on_tty():
+    stream = io.StringIO()
+    clock = FakeClock()
+    progress = ProgressReporter(2, mode="tty", stream=stream, clock=clock)
+    for name in ["a", "b"]:
+        with progress.track(name):
+            clock.now += 1
+    progress.close()
+
+    output = stream.getvalue()
+    assert output.count("\r") == 2
+    assert "\n" not in output
+    assert "[2/2] 100%" in output
+
+
+def test_summary_table():
+    clock = FakeClock()
+    progress = ProgressReporter(3, mode="none", clock=clock)
+    for name, seconds in [("fast", 1), ("slow", 5), ("medium", 2)]:
+        with progress.track(name) as stats:
+            stats.records += 10
+            stats.widgets += 20
+            stats.unsupported["calc"] += 1
+            clock.now += seconds
+
+    lines = progress.summary(top_n=2).splitlines()
+    assert lines[0].split() == [
+        "File",
+        "Records",
+        "Instances",
+        "Widgets",
+        "Skipped",
+        "Seconds",
+    ]
+    assert [line.split()[0] for line in lines[1:3]] == ["slow", "medium"]
+    assert lines[3].startswith("... 1 more")
+    assert lines[4].split() == ["Total", "(3", "files)", "30", "0", "60", "3", "8.000"]
+    assert lines[5] == "Unsupported record types: calc (3)"
+
+
+def test_format_duration():
+    assert format_duration(3725.5) == "1:02:05"
+
+
+def test_empty_database_progress(default_config):
+    progress = ProgressReporter(1, mode="none")
+    with progress.track("empty") as stats:
+        layout_database("empty", Database(), {}, default_config, stats=stats)
+    assert progress.totals.screens == 1
+    assert "Total (1 files)" in progress.summary()
@@ -0,0 +1,76 @@
+import logging
+
+from epicsdbtools import Database
+
+from epicsdb2bob.bobfile_gen import generate_bobfile_for_db
+from epicsdb2bob.filters import RecordRule, compile_record_filter
+from epicsdb2bob.pv_index import PVIndex
+
+
+def make_db(simple_record_factory, *records: tuple[str, str]) -> Database:
+    database = Database()
+    for rtyp, name in records:
+        database.add_record(simple_record_factory(rtyp, name))
+    return database
+
+
+def test_build_indexes_all_records(simple_db_factory):
+    databases = {"a": simple_db_factory("a"), "b": simple_db_factory("b")}
+    index = PVIndex.build(databases)
+    assert len(index) == len(databases["a"]) + len(databases["b"])
+    assert "a_ao_1" in index
+    assert index.get_definitions("b_ai_2") == [("b", databases["b"]["b_ai_2"])]
+    assert index.get_duplicates() == {}
+
+
+def test_duplicates_are_reported(simple_record_factory, caplog):
+    databases = {
+        "a": make_db(simple_record_factory, ("ao", "XF:Val"), ("ao", "$(P)Val")),
+        "b": make_db(simple_record_factory, ("ai", "XF:Val"), ("ai", "$(P)Val")),
+    }
+    index = PVIndex.build(databases)
+    assert index.get_duplicates() == {"XF:Val": ["a", "b"], "$(P)Val": ["a", "b"]}
+
+    with caplog.at_level(logging.INFO, logger="epicsdb2bob"):
+        index.report_duplicates()
+    warnings = [r.message for r in caplog.records if r.levelno == logging.WARNING]
+    assert warnings == ["PV XF:Val is defined more than once: ['a', 'b']"]
+
+
+def test_find_record_prefers_related_databases(simple_record_factory):
+    databases = {
+        "main": make_db(simple_record_factory, ("ao", "Val")),
+        "readbacks": make_db(simple_record_factory, ("ai", "Val_RBV")),
+        "other": make_db(simple_record_factory, ("ai", "Val_RBV")),
+        "unrelated": make_db(simple_record_factory, ("ao", "Other")),
+    }
+    databases["main"].add_included_template("readbacks.template")
+    index = PVIndex.build(databases)
+
+    assert index.find_record("Val_RBV", "main") is databases["readbacks"]["Val_RBV"]
+    assert index.find_record("Val_RBV", "other") is databases["other"]["Val_RBV"]
+    # Neither definition is related to this database, so it is ambiguous
+    assert index.find_record("Val_RBV", "unrelated") is None
+    assert index.find_record("Missing", "main") is None
+
+
+def test_readbacks_are_paired_across_databases(simple_record_factory, default_config):
+    setpoints = make_db(simple_record_factory, ("ao", "Val"), ("bo", "Enable"))
+    readbacks = make_db(simple_record_factory, ("ai", "Val_RBV"), ("bi", "Enable_RBV"))
+    index = PVIndex.build({"setpoints": setpoints, "readbacks": readbacks})
+
+    def pv_names(**kwargs) -> set[str | None]:
+        screen = generate_bobfile_for_db(
+            "setpoints", setpoints, {}, default_config, **kwargs
+        )
+        return {element.text for element in screen.root.iter("pv_name")}
+
+    assert pv_names() == {"Val", "Enable"}
+    assert pv_names(pv_index=index) == {"Val", "Val_RBV", "Enable", "Enable_RBV"}
+
+    record_filter = compile_record_filter([], [RecordRule(rtyp=["bi"])])
+    assert pv_names(pv_index=index, record_filter=record_filter) == {
+        "Val",
+        "Val_RBV",
+        "Enable",
+    }
@@ -0,0 +1,142 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from epicsdb2bob.bobfile_gen import (
+    generate_bobfile_for_db,
+    generate_bobfile_for_substitution,
+    layout_database,
+)
+from epicsdb2bob.config import EmbedLevel
+from epicsdb2bob.pv_manifest import PVEntry, PVManifest, expand_macros
+
+
+def test_expand_macros():
+    macros = {"P": "XF:1:", "R": "M1:"}
+    assert expand_macros("$(P)${R}Pos", macros) == "XF:1:M1:Pos"
+    assert expand_macros("$(P)$(Q)Pos", macros) == "XF:1:$(Q)Pos"
+    assert expand_macros("$(Q=D1:)Pos", macros) == "D1:Pos"
+    assert expand_macros("$(P=XF:9:)Pos", macros) == "XF:1:Pos"
+
+
+def test_database_pvs(db_with_readbacks, default_config):
+    pv_manifest = PVManifest()
+    generate_bobfile_for_db(
+        "test", db_with_readbacks, {}, default_config, pv_manifest=pv_manifest
+    )
+    entries = pv_manifest.get_entries("test")
+    # One for each record, readbacks included
+    assert len(entries) == len(db_with_readbacks)
+    assert PVEntry("test", "test_ao_1", "TextEntry", "ao") in entries
+    assert PVEntry("test", "test_ao_1_RBV", "TextUpdate", "ai") in entries
+
+
+def test_screen_macros_are_expanded(simple_db, default_config):
+    pv_manifest = PVManifest()
+    generate_bobfile_for_db(
+        "test", simple_db, {"P": "test_"}, default_config, pv_manifest=pv_manifest
+    )
+    assert {entry.pv for entry in pv_manifest} == set(simple_db)
+
+
+def test_embedded_screen_pvs(simple_db_factory, default_config):
+    default_config.embed = EmbedLevel.ALL
+    pv_manifest = PVManifest()
+    template = simple_db_factory("$(P)")
+    generate_bobfile_for_db(
+        "template", template, {}, default_config, pv_manifest=pv_manifest
+    )
+    substitution = {"template.db": [{"P": "A"}, {"P": "B"}]}
+    generate_bobfile_for_substitution(
+        "ioc",
+        substitution,
+        {},
+        default_config,
+        {"template.bob": (100, 100)},
+        pv_manifest=pv_manifest,
+    )
+
+    entries = pv_manifest.get_entries("ioc")
+    assert len(entries) == 2 * len(template)
+    assert {entry.embedded_screen for entry in entries} == {"template"}
+    assert {entry.pv for entry in entries} == {
+        *(name.replace("$(P)", "A") for name in template),
+        *(name.replace("$(P)", "B") for name in template),
+    }
+
+
+def test_screen_shown_with_other_macros(simple_db_factory, default_config):
+    pv_manifest = PVManifest()
+    template = simple_db_factory("$(P)")
+    layout = layout_database("shared", template, {}, default_config)
+    layout.macros = {"P": "A"}
+    pv_manifest.add_layout(layout)
+    pv_manifest.add_shown_with("shared", {"P": "B"})
+
+    entries = pv_manifest.get_entries("shared")
+    assert len(entries) == 2 * len(template)
+    assert {entry.pv for entry in entries} == {
+        *(name.replace("$(P)", "A") for name in template),
+        *(name.replace("$(P)", "B") for name in template),
+    }
+
+
+def test_write(tmp_path: Path, simple_db, default_config):
+    pv_manifest = PVManifest()
+    generate_bobfile_for_db(
+        "test", simple_db, {}, default_config, pv_manifest=pv_manifest
+    )
+    pv_manifest.write(tmp_path / "pvs.jsonl")
+    pv_manifest.write(tmp_path / "pvs.csv")
+
+    lines = (tmp_path / "pvs.jsonl").read_text().splitlines()
+    assert [PVEntry(**json.loads(line)) for line in lines] == list(pv_manifest)
+    csv_lines = (tmp_path / "pvs.csv").read_text().splitlines()
+    assert csv_lines[0] == "screen,pv,widget,record_type,embedded_screen"
+    assert csv_lines[1] == "test,test_mbbo_1,ComboBox,mbbo,"
+    assert (tmp_path / "pvs.csv").stat().st_mode & 0o777 == 0o644
+
+
+def test_cli_writes_pv_manifest(tmp_path: Path):
+    input_path = tmp_path / "in"
+    input_path.mkdir()
+    (input_path / "motor.template").write_text(
+        'record(ao, "$(P)Pos") {\n    field(DESC, "Position")\n}\n'
+    )
+    (input_path / "ioc.substitutions").write_text(
+        'file "motor.template" {\n    { P=XF:1: }\n}\n'
+    )
+    output_path = tmp_path / "out"
+    output_path.mkdir()
+    subprocess.check_call(
+        [
+            sys.executable,
+            "-m",
+            "epicsdb2bob",
+            str(input_path),
+            str(output_path),
+            "--pv_manifest",
+            "--no_cache",
+        ]
+    )
+    entries = [
+        json.loads(line)
+        for line in (output_path / "pvs.jsonl").read_text().splitlines()
+    ]
+    assert entries == [
+        {
+            "screen": "motor",
+            "pv": "$(P)Pos",
+            "widget": "TextEntry",
+            "record_type": "ao",
+            "embedded_screen": None,
+        },
+        {
+            "screen": "ioc",
+            "pv": "XF:1:Pos",
+            "widget": "TextEntry",
+            "record_type": "ao",
+            "embedded_screen": "motor",
+        },
+    ]
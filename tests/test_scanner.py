@@ -0,0 +1,108 @@
+from pathlib import Path
+
+import pytest
+from epicsdbtools import Database, LoadIncludesStrategy, load_database_file
+
+from epicsdb2bob import scanner
+from epicsdb2bob.scanner import UnsupportedSyntax, scan_database, scan_database_file
+
+TEST_DIR = Path(__file__).parent
+DATABASE_FILES = sorted(
+    path for pattern in ("*.db", "*.template") for path in TEST_DIR.rglob(pattern)
+)
+
+
+@pytest.mark.parametrize("db_file", DATABASE_FILES, ids=lambda path: path.name)
+def test_fast_scan_matches_full_parser(db_file: Path):
+    full = load_database_file(
+        db_file, load_includes_strategy=LoadIncludesStrategy.IGNORE
+    )
+    # Scanned directly, so that falling back to the full parser can't hide a mismatch
+    fast = scan_database(db_file.read_bytes())
+
+    assert list(fast.keys()) == list(full.keys())
+    assert fast.get_included_templates() == full.get_included_templates()
+    for name, record in full.items():
+        assert fast[name].name == record.name
+        assert fast[name].rtyp == record.rtyp
+        assert dict(fast[name].fields) == dict(record.fields)
+        assert dict(fast[name].infos) == dict(record.infos)
+
+
+def scan_test_file(file_name: str) -> Database:
+    return scan_database((TEST_DIR / "test_inputs" / file_name).read_bytes())
+
+
+def test_fast_scan_escaped_quotes():
+    database = scan_test_file("escaped_quotes.db")
+    assert list(database) == ["test:Quoted", "test:After"]
+    assert database["test:Quoted"].fields["DESC"] == r"Escaped \"quote\""
+    assert database["test:Quoted"].fields["VAL"] == r"Ends with \\"
+    assert database["test:After"].fields["DESC"] == r"Still \"parsed\", after } and )"
+
+
+def test_fast_scan_keeps_macros_in_values():
+    fields = scan_test_file("macros_in_values.template")["$(P)$(R)Calc"].fields
+    assert fields["DESC"] == "$(DESC=Calculation) for ${R}"
+    assert fields["INPA"] == "$(P)$(R)Input CP MS"
+    assert fields["CALC"] == "A*$(SCALE=1)"
+
+
+def test_fast_scan_info_and_alias():
+    database = scan_test_file("info_and_alias.db")
+    # Aliases don't add records of their own
+    assert list(database) == ["test:Motor"]
+    record = database["test:Motor"]
+    assert dict(record.fields) == {"DESC": "Motor"}
+    assert dict(record.infos) == {
+        "autosaveFields": "VAL DESC",
+        "archive": "Monitor 1",
+    }
+
+
+def test_fast_scan_comments_in_strings():
+    database = scan_test_file("comments_in_strings.db")
+    assert list(database) == ["test:Hash"]
+    record = database["test:Hash"]
+    assert dict(record.fields) == {"DESC": "Channel #1", "EGU": "#"}
+    assert dict(record.infos) == {"note": "# kept"}
+
+
+def test_fast_scan_multi_line_records():
+    database = scan_test_file("multi_line.db")
+    assert list(database) == ["test:Mode", "test:Compact"]
+    assert database["test:Mode"].rtyp == "mbbo"
+    assert dict(database["test:Mode"].fields) == {
+        "DESC": "Mode",
+        "ZRST": "Off",
+        "ONST": "On",
+        "TWST": "Auto",
+    }
+    assert dict(database["test:Compact"].fields) == {"DESC": "Compact", "ZNAM": "Off"}
+
+
+@pytest.mark.parametrize(
+    "unsupported",
+    [
+        'alias("$(P)A", "$(P)B")',
+        'record(ai, "$(P)A") { field(DESC, "A") ',
+        'record(ai, "$(P)A") { field(INP, $(P)B) }',
+        'record(ai, "$(P)A")\nrecord(ai, "$(P)A")',
+        'substitute "P=X"',
+    ],
+)
+def test_fast_scan_rejects_unsupported_syntax(unsupported: str):
+    with pytest.raises(UnsupportedSyntax):
+        scan_database(unsupported.encode())
+
+
+def test_fast_scan_falls_back_to_full_parser(monkeypatch, tmp_path: Path):
+    db_file = tmp_path / "unsupported.db"
+    db_file.write_text('substitute "P=X"\nrecord(ai, "$(P)A") {}\n')
+
+    fallback_calls = []
+    monkeypatch.setattr(
+        scanner, "_load_database_file_full", lambda path: fallback_calls.append(path)
+    )
+    scan_database_file(db_file)
+    assert fallback_calls == [db_file]
@@ -0,0 +1,131 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from epicsdbtools import Database
+
+from epicsdb2bob.shard import (
+    ShardManifest,
+    assign_shards,
+    get_shard_manifest_name,
+    merge_manifests,
+    parse_shard_spec,
+    stable_shard,
+)
+
+
+@pytest.mark.parametrize("spec, expected", [("1/1", (1, 1)), ("3/4", (3, 4))])
+def test_parse_shard_spec(spec, expected):
+    assert parse_shard_spec(spec) == expected
+
+
+@pytest.mark.parametrize("spec", ["0/4", "5/4", "1/0", "1", "a/b", "1/2/3"])
+def test_parse_shard_spec_invalid(spec):
+    with pytest.raises(ValueError):
+        parse_shard_spec(spec)
+
+
+def test_stable_shard_is_deterministic_and_in_range():
+    shards = [stable_shard(f"db_{i}", 4) for i in range(100)]
+    assert shards == [stable_shard(f"db_{i}", 4) for i in range(100)]
+    assert set(shards) == {1, 2, 3, 4}
+
+
+def test_assign_shards_keeps_includes_together():
+    databases = {f"db_{i}": Database() for i in range(20)}
+    databases["db_3"].add_included_template("db_17.db")
+    databases["db_17"].add_included_template("db_9.template")
+
+    shards, _ = assign_shards(databases, {}, 8)
+    assert shards["db_3"] == shards["db_9"] == shards["db_17"]
+    assert set(shards) == set(databases)
+
+
+def test_assign_shards_puts_substitutions_with_embedded_databases():
+    databases = {f"db_{i}": Database() for i in range(20)}
+    substitutions = {
+        f"ioc_{i}": [f"db_{i}.template", f"../db/db_{i + 10}.db", "missing.db"]
+        for i in range(10)
+    }
+    substitutions["other"] = ["missing.db"]
+
+    database_shards, substitution_shards = assign_shards(databases, substitutions, 8)
+    for i in range(10):
+        assert (
+            substitution_shards[f"ioc_{i}"]
+            == database_shards[f"db_{i}"]
+            == database_shards[f"db_{i + 10}"]
+        )
+    assert substitution_shards["other"] == stable_shard("other", 8)
+
+
+def test_manifest_round_trip_and_merge(tmp_path: Path):
+    paths = []
+    for i in (1, 2):
+        manifest = ShardManifest(shard_count=2, shard_index=i)
+        manifest.add_screen(f"screen_{i}.bob", 100 * i, 200 * i)
+        path = tmp_path / get_shard_manifest_name(i, 2)
+        manifest.write(path)
+        paths.append(path)
+
+    merged = merge_manifests(ShardManifest.read(path) for path in paths)
+    assert merged.shard_index is None
+    assert merged.screens == {
+        "screen_1.bob": (100, 200),
+        "screen_2.bob": (200, 400),
+    }
+
+
+def test_merge_manifests_rejects_mixed_shard_counts():
+    with pytest.raises(ValueError):
+        merge_manifests([ShardManifest(shard_count=2), ShardManifest(shard_count=3)])
+
+
+def test_cli_merge_reports_bad_manifests(tmp_path: Path):
+    ShardManifest(shard_count=2, shard_index=1).write(tmp_path / "a.json")
+    ShardManifest(shard_count=3, shard_index=1).write(tmp_path / "b.json")
+    cmd = [sys.executable, "-m", "epicsdb2bob", "merge", "-o", str(tmp_path / "m.json")]
+
+    for manifests in [["a.json", "b.json"], ["a.json", "missing.json"]]:
+        result = subprocess.run(
+            [*cmd, *(str(tmp_path / name) for name in manifests)],
+            capture_output=True,
+            text=True,
+        )
+        assert result.returncode != 0
+        assert "Failed to merge manifests" in result.stderr
+        assert "Traceback" not in result.stderr
+    assert not (tmp_path / "m.json").exists()
+
+
+def test_cli_shard_generates_substitutions_with_embedded_screens(tmp_path: Path):
+    input_path = tmp_path / "in"
+    input_path.mkdir()
+    (input_path / "axis.template").write_text(
+        'record(ao, "$(P)Pos") {\n    field(DESC, "Position")\n}\n'
+    )
+    (input_path / "ioc.substitutions").write_text(
+        'file "axis.template" {\n    { P=XF:1: }\n}\n'
+    )
+    for shard in (1, 2):
+        output_path = tmp_path / f"shard_{shard}"
+        output_path.mkdir()
+        subprocess.check_call(
+            [
+                sys.executable,
+                "-m",
+                "epicsdb2bob",
+                str(input_path),
+                str(output_path),
+                "--shard",
+                f"{shard}/2",
+                "--no_cache",
+            ]
+        )
+
+    screens = {
+        shard: sorted(path.name for path in (tmp_path / f"shard_{shard}").glob("*.bob"))
+        for shard in (1, 2)
+    }
+    assert sorted(screens.values()) == [[], ["axis.bob", "ioc.bob"]]
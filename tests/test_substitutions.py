@@ -0,0 +1,119 @@
+from pathlib import Path
+
+import epicsdbtools
+import pytest
+
+from epicsdb2bob.scanner import UnsupportedSyntax
+from epicsdb2bob.substitutions import (
+    TemplateInstances,
+    read_substitution_file,
+    scan_substitutions,
+)
+
+PATTERN_SUBSTITUTIONS = b"""
+# Motors
+file "motor.template" {
+    pattern { P, M, DESC }
+    { "XF:1:", "Mtr1", "Slit top" }
+    { XF:1:, Mtr2, "Slit, bottom" }
+}
+
+file $(TOP)/db/detector.template {
+    { P=XF:1:, R=Det1: }
+    { P = "XF:1:", R = "Det2:" }
+}
+
+file "motor.template" {
+    pattern { P M DESC }
+    { XF:2: Mtr1 "" }
+}
+"""
+
+
+def test_scan_substitutions():
+    templates = list(scan_substitutions(PATTERN_SUBSTITUTIONS))
+    assert [template for template, _ in templates] == [
+        "motor.template",
+        "$(TOP)/db/detector.template",
+        "motor.template",
+    ]
+    assert templates[0][1] == [
+        {"P": "XF:1:", "M": "Mtr1", "DESC": "Slit top"},
+        {"P": "XF:1:", "M": "Mtr2", "DESC": "Slit, bottom"},
+    ]
+    assert templates[1][1] == [
+        {"P": "XF:1:", "R": "Det1:"},
+        {"P": "XF:1:", "R": "Det2:"},
+    ]
+
+
+def test_read_substitution_file_merges_blocks(tmp_path: Path):
+    subs_file = tmp_path / "ioc.substitutions"
+    subs_file.write_bytes(PATTERN_SUBSTITUTIONS)
+
+    substitution = read_substitution_file(subs_file)
+    assert list(substitution) == ["motor.template", "$(TOP)/db/detector.template"]
+
+    motors = substitution["motor.template"]
+    assert len(motors) == 3
+    assert motors[-1] == {"P": "XF:2:", "M": "Mtr1", "DESC": ""}
+    # Rows with the same macro names share one block
+    assert len(motors.blocks) == 1
+
+
+def test_rows_are_stored_columnar_with_interned_strings():
+    ((_, instances),) = scan_substitutions(
+        b"file a.template { pattern { P, R } { X, Y1 } { X, Y2 } }"
+    )
+    ((keys, rows),) = instances.blocks
+    assert keys == ("P", "R")
+    assert rows == [("X", "Y1"), ("X", "Y2")]
+    assert rows[0][0] is rows[1][0]
+
+
+def test_scan_substitutions_yields_blocks_before_reading_the_rest():
+    blocks = scan_substitutions(b"file a.template { { P=X } }\nglobal { P=Y }\n")
+    template, instances = next(blocks)
+    assert template == "a.template"
+    assert instances == [{"P": "X"}]
+    with pytest.raises(UnsupportedSyntax):
+        next(blocks)
+
+
+@pytest.mark.parametrize(
+    "unsupported",
+    [
+        b"global { P=X }",
+        b"file a.template { pattern { P, R } { X } }",
+        b"file a.template { { P } }",
+        b"file a.template { { P=X }",
+    ],
+)
+def test_scan_substitutions_rejects_unsupported_syntax(unsupported: bytes):
+    with pytest.raises(UnsupportedSyntax):
+        list(scan_substitutions(unsupported))
+
+
+def test_read_substitution_file_falls_back_to_epicsdbtools(monkeypatch, tmp_path):
+    subs_file = tmp_path / "ioc.substitutions"
+    subs_file.write_text("global { P=X }\nfile a.template { { R=Y } }\n")
+
+    monkeypatch.setattr(
+        epicsdbtools,
+        "load_template_file",
+        lambda path: [("a.template", {"P": "X", "R": "Y"})],
+    )
+    assert read_substitution_file(subs_file) == {"a.template": [{"P": "X", "R": "Y"}]}
+
+
+def test_template_instances_sequence():
+    instances = TemplateInstances.from_dicts(
+        [{"P": "A"}, {"P": "B"}, {"P": "C", "R": "D"}]
+    )
+    assert len(instances) == 3
+    assert len(instances.blocks) == 2
+    assert instances[1] == {"P": "B"}
+    assert instances[-1] == {"P": "C", "R": "D"}
+    assert instances[:2] == [{"P": "A"}, {"P": "B"}]
+    with pytest.raises(IndexError):
+        instances[3]
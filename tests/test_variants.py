@@ -0,0 +1,129 @@
+import subprocess
+import sys
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import pytest
+
+from epicsdb2bob.bobfile_gen import layout_database
+from epicsdb2bob.config import MacroSetLevel
+from epicsdb2bob.variants import (
+    MacroSet,
+    apply_macro_set,
+    load_macro_sets,
+    macroize_pv_name,
+)
+
+
+def test_load_macro_sets_from_csv(tmp_path: Path):
+    path = tmp_path / "axes.csv"
+    path.write_text("name,P,R\nx,XF:1:,M1:\n,XF:2:,M2:\n")
+    assert load_macro_sets(path) == [
+        MacroSet("x", {"P": "XF:1:", "R": "M1:"}),
+        MacroSet("2", {"P": "XF:2:", "R": "M2:"}),
+    ]
+
+
+def test_load_macro_sets_from_yaml(tmp_path: Path):
+    as_list = tmp_path / "list.yml"
+    as_list.write_text("- {P: 'XF:1:', R: 1}\n- {name: y, P: 'XF:2:'}\n")
+    assert load_macro_sets(as_list) == [
+        MacroSet("1", {"P": "XF:1:", "R": "1"}),
+        MacroSet("y", {"P": "XF:2:"}),
+    ]
+
+    as_mapping = tmp_path / "mapping.yaml"
+    as_mapping.write_text("x: {P: 'XF:1:'}\ny: {P: 'XF:2:'}\n")
+    assert [macro_set.name for macro_set in load_macro_sets(as_mapping)] == ["x", "y"]
+
+
+def test_load_macro_sets_rejects_duplicate_names(tmp_path: Path):
+    path = tmp_path / "axes.csv"
+    path.write_text("name,P\nx,A\nx,B\n")
+    with pytest.raises(ValueError, match="not unique"):
+        load_macro_sets(path)
+
+
+def test_macroize_pv_name():
+    assert macroize_pv_name("XF:1:M1:Pos", {"P": "XF:1:", "R": "M1:"}) == (
+        "$(P)$(R)Pos"
+    )
+
+
+def test_apply_macro_set_only_copies_pv_widgets(simple_db_factory, default_config):
+    database = simple_db_factory("XF:1:")
+    layout = layout_database("test", database, {}, default_config)
+
+    variant = apply_macro_set(layout, {"P": "XF:1:"}, default_config)
+
+    assert (variant.width, variant.height) == (layout.width, layout.height)
+    assert variant.macros == {"P": "XF:1:"}
+    assert layout.macros == {}
+    for base, derived in zip(layout.widgets, variant.widgets, strict=True):
+        if base.pv_name:
+            assert derived is not base
+            assert derived.pv_name == base.pv_name.replace("XF:1:", "$(P)")
+            assert (derived.x, derived.y) == (base.x, base.y)
+        else:
+            assert derived is base
+
+
+def test_apply_macro_set_matches_direct_layout(simple_db_factory, default_config):
+    database = simple_db_factory("XF:1:")
+    macros = {"P": "XF:1:"}
+    direct = layout_database("test", database, macros, default_config)
+    derived = apply_macro_set(
+        layout_database("test", database, {}, default_config), macros, default_config
+    )
+    assert [w.pv_name for w in derived.widgets] == [w.pv_name for w in direct.widgets]
+    assert derived.macros == direct.macros
+
+
+def test_apply_macro_set_at_launcher_level(simple_db_factory, default_config):
+    default_config.macro_set_level = MacroSetLevel.LAUNCHER
+    layout = layout_database("test", simple_db_factory("XF:1:"), {}, default_config)
+    variant = apply_macro_set(layout, {"P": "XF:1:"}, default_config)
+    assert variant.macros == {"P": "XF:1:"}
+    assert all(
+        widget.pv_name.startswith("$(P)")
+        for widget in variant.widgets
+        if widget.pv_name
+    )
+
+
+def test_apply_macro_set_at_widget_level(simple_db_factory, default_config):
+    default_config.macro_set_level = MacroSetLevel.WIDGET
+    layout = layout_database("test", simple_db_factory("XF:1:"), {}, default_config)
+    variant = apply_macro_set(layout, {"P": "XF:1:"}, default_config)
+    assert variant.widgets is layout.widgets
+    assert variant.macros == {}
+
+
+def test_cli_macro_sets_at_default_level(tmp_path: Path):
+    input_path = tmp_path / "in"
+    input_path.mkdir()
+    (input_path / "motor.template").write_text(
+        'record(ao, "$(P)$(R)Pos") {\n    field(DESC, "Position")\n}\n'
+    )
+    macro_sets = tmp_path / "axes.csv"
+    macro_sets.write_text("name,P,R\nx,XF:1:,M1:\ny,XF:1:,M2:\n")
+    output_path = tmp_path / "out"
+    output_path.mkdir()
+    subprocess.check_call(
+        [
+            sys.executable,
+            "-m",
+            "epicsdb2bob",
+            str(input_path),
+            str(output_path),
+            "--macro_sets",
+            str(macro_sets),
+            "--no_cache",
+        ]
+    )
+
+    for name, axis in [("x", "M1:"), ("y", "M2:")]:
+        screen = ET.parse(output_path / f"motor_{name}.bob").getroot()
+        assert screen.findtext("macros/P") == "XF:1:"
+        assert screen.findtext("macros/R") == axis
+        assert screen.find(".//widget[pv_name='$(P)$(R)Pos']") is not None
@@ -0,0 +1,41 @@
+from pathlib import Path
+
+import pytest
+
+from epicsdb2bob.bobfile_gen import layout_database
+from epicsdb2bob.layout import ScreenLayout
+from epicsdb2bob.writer import ParallelWriter
+
+
+@pytest.mark.parametrize("workers", [0, 1, 4])
+def test_parallel_writer_writes_all_formats(tmp_path: Path, workers):
+    with ParallelWriter(workers) as writer:
+        for i in range(10):
+            writer.submit(
+                ScreenLayout(f"screen{i}", 100, 100),
+                tmp_path / f"screen{i}",
+                ["bob", "opi"],
+            )
+    assert len(list(tmp_path.glob("*.bob"))) == 10
+    assert len(list(tmp_path.glob("*.opi"))) == 10
+
+
+def test_parallel_writer_raises_write_errors(tmp_path: Path):
+    writer = ParallelWriter(2)
+    writer.submit(ScreenLayout("screen"), tmp_path / "missing" / "screen", ["bob"])
+    with pytest.raises(OSError):
+        writer.close()
+
+
+def test_large_screens_are_serialized_in_chunks(
+    tmp_path: Path, db_with_readbacks, default_config
+):
+    layout = layout_database("test", db_with_readbacks, {}, default_config)
+    with ParallelWriter(0) as writer:
+        writer.submit(layout, tmp_path / "whole", ["bob"])
+    with ParallelWriter(2, chunk_workers=2, chunk_size=4) as writer:
+        writer.submit(layout, tmp_path / "chunked", ["bob", "opi"])
+
+    assert writer._chunk_executor is not None
+    chunked = (tmp_path / "chunked.bob").read_bytes()
+    assert chunked == (tmp_path / "whole.bob").read_bytes()